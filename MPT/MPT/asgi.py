@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MPT.settings')
 
 application = get_asgi_application()
+
+# With WARMUP_ON_STARTUP the server process preloads the numeric stack before
+# taking traffic. Only servers import this module (runserver included).
+from analysis.warmup import warmup_on_startup  # noqa: E402
+warmup_on_startup()
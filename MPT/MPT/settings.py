@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'analysis.metrics.ServerTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'MPT.urls'
@@ -126,6 +127,109 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Frontier plots are cached in MEDIA_ROOT under a hash of the frontier data.
+# Files older than MAX_AGE seconds, or beyond MAX_FILES / MAX_BYTES (least
+# recently used first), are evicted; set a limit to None to disable it.
+FRONTIER_PLOT_CACHE = {
+    'MAX_FILES': 500,
+    'MAX_BYTES': 200 * 1024 * 1024,
+    'MAX_AGE': 7 * 24 * 3600,
+}
+
+# Memory-mapped columnar price store shared by all worker processes.
+# Populate it with `manage.py build_price_store`; fetch_prices keeps it current.
+PRICE_STORE_ENABLED = False
+PRICE_STORE_DIR = BASE_DIR / 'price_store'
+# Superseded generations are deleted this long after being replaced (the
+# previous one is always kept), so readers in other processes can finish.
+PRICE_STORE_GRACE_SECONDS = 300
+
+# Source used by fetch_prices: 'yfinance', 'local' (CSV files under
+# PRICE_PROVIDER_OPTIONS['path']) or a dotted path to a PriceProvider subclass.
+PRICE_PROVIDER = 'yfinance'
+PRICE_PROVIDER_OPTIONS = {}
+# Rows per upsert statement when fetch_prices writes downloaded prices.
+PRICE_INSERT_BATCH_SIZE = 1000
+
+# Cache for annualized return/covariance estimates. BACKEND is 'local'
+# (per-process LRU) or 'django' (uses the cache named by ALIAS, which may be
+# shared: clearing the estimates leaves other keys alone).
+ESTIMATE_CACHE = {
+    'BACKEND': 'local',
+    'MAX_ENTRIES': 128,
+    'MAX_BYTES': 256 * 1024 * 1024,
+}
+
+# Process pool used by the 'parallel' frontier engine. FRONTIER_POOL_SIZE
+# defaults to the CPU count; a single request uses at most
+# FRONTIER_MAX_WORKERS_PER_REQUEST workers of it.
+FRONTIER_POOL_SIZE = None
+FRONTIER_MAX_WORKERS_PER_REQUEST = 4
+
+# When True, fetch-prices and optimize requests are queued as jobs (run by
+# `manage.py run_jobs`) unless the request sends "async": false.
+JOBS_ASYNC_DEFAULT = False
+# A running job's worker refreshes its heartbeat every JOB_LEASE_SECONDS / 3.
+# A job without a heartbeat for JOB_LEASE_SECONDS is treated as lost (worker
+# killed): it is queued again, or failed after JOB_MAX_ATTEMPTS runs.
+JOB_LEASE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 2
+
+# Per-stage timing: Server-Timing response headers and the /api/metrics
+# Prometheus endpoint. Off by default; a disabled stage is one flag check.
+TIMING_ENABLED = False
+
+# Persistent optimize result cache (analysis.result_cache). Entries unused for
+# MAX_AGE seconds are dropped, and only the MAX_ENTRIES most recently used kept.
+RESULT_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'MAX_AGE': 30 * 24 * 3600,
+}
+
+# Portfolios per page of /api/portfolios/ when a client pages with ?cursor=
+# but no ?page_size= (which may go up to 500). Without either the list is unpaginated.
+PORTFOLIO_PAGE_SIZE = 50
+
+# Default number of PCA factors when a request asks for cov_model='factor'.
+FACTOR_MODEL_FACTORS = 10
+
+# Random-portfolio cloud (optimize "monte_carlo": N). Samples are drawn in
+# chunks of at most MONTE_CARLO_CHUNK_BYTES; runs of a million samples or more
+# are sharded over MONTE_CARLO_WORKERS processes of the frontier pool.
+MONTE_CARLO_CHUNK_BYTES = 32 * 1024 * 1024
+MONTE_CARLO_MAX_SAMPLES = 5_000_000
+MONTE_CARLO_WORKERS = 1
+
+# Long-only problems up to this many assets use the built-in NumPy active-set
+# QP instead of cvxpy when no method is requested explicitly.
+QP_DENSE_MAX_ASSETS = 50
+
+# Process pool for the async endpoints (/api/async/...). At most
+# OFFLOAD_POOL_SIZE + OFFLOAD_QUEUE_SIZE requests are accepted at once;
+# further ones get 429. None means one worker per CPU.
+OFFLOAD_POOL_SIZE = 2
+OFFLOAD_QUEUE_SIZE = 8
+OFFLOAD_POOL_START_METHOD = 'spawn'
+
+# cvxpy solver profile ('fast', 'balanced' or 'precise'; see analysis.solvers).
+# Above SOLVER_LARGE_ASSETS assets OSQP is tried first unless the profile is
+# 'precise'. Solver attempts are logged to SolveLog in batches of
+# SOLVE_LOG['BATCH']; summarize with `manage.py solver_stats`. Only a
+# FRONTIER_SAMPLE fraction of frontier sweeps is logged, and entries older
+# than MAX_AGE seconds are deleted automatically.
+SOLVER_PROFILE = 'balanced'
+SOLVER_LARGE_ASSETS = 500
+SOLVE_LOG = {'ENABLED': True, 'BATCH': 200, 'MAX_AGE': 14 * 24 * 3600, 'FRONTIER_SAMPLE': 0.1}
+
+# Preload the numeric stack and solve a tiny template problem with each
+# solver when a server process starts from MPT/wsgi.py or MPT/asgi.py
+# (analysis.warmup; `manage.py warmup` runs it on demand). WARMUP_PLOT also renders a throwaway plot; WARMUP_OFFLOAD_POOL
+# starts the async endpoints' worker processes.
+WARMUP_ON_STARTUP = False
+WARMUP_PLOT = True
+WARMUP_OFFLOAD_POOL = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
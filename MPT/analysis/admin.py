@@ -1,3 +1,21 @@
 from django.contrib import admin
+from .models import Job, OptimizationResult, SolveLog
 
-# Register your models here.
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('dedup_key', 'created_at', 'started_at', 'finished_at', 'heartbeat_at', 'attempts')
+
+
+@admin.register(OptimizationResult)
+class OptimizationResultAdmin(admin.ModelAdmin):
+    list_display = ('id', '__str__', 'expected_return', 'volatility', 'hits', 'last_used_at')
+    readonly_fields = ('key', 'created_at', 'last_used_at', 'hits')
+
+
+@admin.register(SolveLog)
+class SolveLogAdmin(admin.ModelAdmin):
+    list_display = ('id', 'solver', 'profile', 'context', 'status', 'n_assets', 'iterations', 'solve_time', 'created_at')
+    list_filter = ('solver', 'profile', 'context', 'status')
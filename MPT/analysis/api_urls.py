@@ -1,9 +1,18 @@
 from django.urls import path
-from .views import StockListCreateAPIView, FetchPricesAPIView, OptimizeAPIView, PortfolioListAPIView
+from .views import (StockListCreateAPIView, FetchPricesAPIView, OptimizeAPIView, OptimizeStreamAPIView, PortfolioListAPIView,
+                    JobDetailAPIView, BatchOptimizeAPIView, BacktestAPIView, metrics_view, optimize_async_view,
+                    frontier_async_view)
 
 urlpatterns = [
     path('stocks/', StockListCreateAPIView.as_view(), name='api-stocks'),
     path('fetch-prices/', FetchPricesAPIView.as_view(), name='api-fetch-prices'),
     path('optimize/', OptimizeAPIView.as_view(), name='api-optimize'),
+    path('optimize/stream/', OptimizeStreamAPIView.as_view(), name='api-optimize-stream'),
+    path('async/optimize/', optimize_async_view, name='api-async-optimize'),
+    path('async/frontier/', frontier_async_view, name='api-async-frontier'),
+    path('optimize/batch/', BatchOptimizeAPIView.as_view(), name='api-optimize-batch'),
+    path('backtest/', BacktestAPIView.as_view(), name='api-backtest'),
     path('portfolios/', PortfolioListAPIView.as_view(), name='api-portfolios'),
+    path('metrics', metrics_view, name='api-metrics'),
+    path('jobs/<int:pk>/', JobDetailAPIView.as_view(), name='api-job-detail'),
 ]
@@ -0,0 +1,194 @@
+"""Walk-forward backtest of the min-variance strategy.
+
+The price matrix is loaded once. At each rebalance date the estimation
+window (rolling or expanding) is advanced by adding the new return rows to,
+and removing the expired ones from, running sums, so the mean and
+covariance cost O(days moved * n^2) instead of a full recomputation. Each
+rebalance is warm-started from the previous weights, and between rebalances
+the holdings drift with the asset returns.
+"""
+import numpy as np
+import pandas as pd
+
+from .qp import active_set_min_variance
+from .services import (load_price_df, compute_daily_returns, annualize_return, annualize_cov,
+                       optimize_min_variance, choose_method)
+
+PERIODS = {'weekly': 'W', 'monthly': 'M', 'quarterly': 'Q', 'yearly': 'Y'}
+WINDOWS = ('rolling', 'expanding')
+
+
+class RollingMoments:
+    """Sample mean and covariance of a window of rows, updated in place.
+
+    Rows are shifted by a fixed ``center`` before accumulating so the
+    sum-of-squares update stays accurate; covariance is shift-invariant.
+    """
+
+    def __init__(self, n, center=None):
+        self.center = np.zeros(n) if center is None else np.asarray(center, dtype=float)
+        self.count = 0
+        self._sum = np.zeros(n)
+        self._cross = np.zeros((n, n))
+
+    def add(self, rows):
+        rows = np.atleast_2d(rows) - self.center
+        self.count += len(rows)
+        self._sum += rows.sum(axis=0)
+        self._cross += rows.T @ rows
+
+    def remove(self, rows):
+        rows = np.atleast_2d(rows) - self.center
+        self.count -= len(rows)
+        self._sum -= rows.sum(axis=0)
+        self._cross -= rows.T @ rows
+
+    @property
+    def mean(self):
+        return self._sum / self.count + self.center
+
+    @property
+    def cov(self):
+        m = self._sum / self.count
+        cov = (self._cross - self.count * np.outer(m, m)) / (self.count - 1)
+        return (cov + cov.T) / 2
+
+
+def rebalance_positions(index, rebalance, start):
+    """Row positions (>= start) at which the portfolio is rebalanced.
+
+    ``rebalance`` is a period name (``'monthly'``...) meaning the first
+    trading day of each period, or a number of trading days.
+    """
+    if isinstance(rebalance, (int, np.integer)) or str(rebalance).isdigit():
+        step = int(rebalance)
+        if step < 1:
+            raise ValueError('rebalance interval must be at least one day')
+        return list(range(start, len(index), step))
+    if rebalance not in PERIODS:
+        raise ValueError(f"rebalance must be a number of days or one of: {', '.join(PERIODS)}")
+    periods = pd.DatetimeIndex(index).to_period(PERIODS[rebalance])
+    new_period = np.r_[True, periods[1:] != periods[:-1]]
+    positions = [i for i in np.flatnonzero(new_period) if i >= start]
+    if not positions or positions[0] != start:
+        positions.insert(0, start)
+    return positions
+
+
+def _solve(mu, cov, target, allow_short, previous):
+    if not allow_short and choose_method(len(mu)) == 'active_set':
+        return active_set_min_variance(mu, cov, target_return=target, x0=previous)
+    return optimize_min_variance(mu, cov, target_return=target, allow_short=allow_short)
+
+
+def max_drawdown(values):
+    values = np.asarray(values, dtype=float)
+    peaks = np.maximum.accumulate(values)
+    return float((1 - values / peaks).max()) if len(values) else 0.0
+
+
+def run_backtest(symbols, start=None, end=None, lookback=252, rebalance='monthly', window='rolling',
+                 target=None, allow_short=False, cost_bps=0.0, initial_value=1.0, min_history=None):
+    """Walk the min-variance strategy forward over ``[start, end]``.
+
+    Returns a dict with the daily ``values`` series, one entry per
+    rebalance (weights and turnover, the sum of absolute weight changes)
+    and summary ``stats`` with realized return, risk and drawdown. At each
+    rebalance only symbols with a return on every day of the estimation
+    window are invested in (e.g. a symbol listed after ``start`` joins once
+    a full window of its history is available); while held, a day without
+    a price leaves a position unchanged and the next priced day carries the
+    move over the gap.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"window must be one of: {', '.join(WINDOWS)}")
+    lookback = int(lookback)
+    min_history = int(min_history or lookback)
+    if lookback < 2 or min_history < 2:
+        raise ValueError('lookback must be at least 2 days')
+
+    prices = load_price_df(symbols, start, end)
+    if prices.empty:
+        return None
+    rets = compute_daily_returns(prices)
+    # Missing returns are zero-filled for the running sums, but a symbol with
+    # a gap in a window is left out of that rebalance, so the fill never
+    # reaches the moments that are used. missing[k] counts each symbol's gaps
+    # in the rows before k.
+    missing = np.r_[np.zeros((1, rets.shape[1]), dtype=int), np.cumsum(rets.isna().to_numpy(), axis=0)]
+    data = rets.fillna(0.0).to_numpy()
+    # Holdings earn the move over a gap on the first day after it.
+    held = prices.ffill().pct_change(fill_method=None).reindex(rets.index).fillna(0.0).to_numpy()
+    days, n = data.shape
+    if days <= min_history:
+        raise ValueError(f'need more than {min_history} days of returns, have {days}')
+
+    positions = rebalance_positions(rets.index, rebalance, min_history)
+    moments = RollingMoments(n, center=data.mean(axis=0))
+    lo = hi = 0  # rows [lo, hi) are in the estimation window
+    weights = None
+    value = float(initial_value)
+    values = np.empty(days - positions[0])
+    rebalances = []
+    cost = float(cost_bps) / 1e4
+
+    for k, pos in enumerate(positions):
+        new_lo = pos - lookback if window == 'rolling' else 0
+        new_lo = max(new_lo, 0)
+        moments.add(data[hi:pos])
+        if new_lo > lo:
+            moments.remove(data[lo:new_lo])
+        lo, hi = new_lo, pos
+
+        complete = np.flatnonzero(missing[hi] == missing[lo])
+        if not len(complete):
+            raise ValueError(f'no symbol has a complete price history in the window before '
+                             f'{rets.index[pos].date().isoformat()}')
+        mu = annualize_return(moments.mean[complete])
+        cov = annualize_cov(moments.cov[np.ix_(complete, complete)])
+        previous = None
+        if weights is not None and weights[complete].sum() > 0:
+            previous = weights[complete] / weights[complete].sum()
+        try:
+            solved = _solve(mu, cov, target, allow_short, previous)
+        except RuntimeError:
+            # Target unreachable in this window: keep minimum variance instead.
+            solved = _solve(mu, cov, None, allow_short, previous)
+        new_weights = np.zeros(n)
+        new_weights[complete] = solved / solved.sum()
+
+        drifted = weights if weights is not None else np.zeros(n)
+        turnover = float(np.abs(new_weights - drifted).sum())
+        value *= 1 - cost * turnover
+        weights = new_weights
+        rebalances.append({'date': rets.index[pos].date().isoformat(), 'weights': [float(w) for w in weights],
+                           'turnover': turnover})
+
+        # Hold until the next rebalance, letting the weights drift.
+        stop = positions[k + 1] if k + 1 < len(positions) else days
+        growth = np.cumprod(1 + held[pos:stop], axis=0)
+        path = value * (growth @ weights)
+        values[pos - positions[0]:stop - positions[0]] = path
+        value = float(path[-1])
+        weights = weights * growth[-1]
+        weights = weights / weights.sum()
+
+    dates = rets.index[positions[0]:]
+    daily = np.diff(np.r_[initial_value, values]) / np.r_[initial_value, values[:-1]]
+    years = len(values) / 252
+    total = values[-1] / initial_value - 1
+    stats = {
+        'total_return': float(total),
+        'annualized_return': float((1 + total) ** (1 / years) - 1) if years > 0 else 0.0,
+        'annualized_volatility': float(daily.std(ddof=1) * np.sqrt(252)) if len(daily) > 1 else 0.0,
+        'max_drawdown': max_drawdown(np.r_[initial_value, values]),
+        'rebalances': len(rebalances),
+        'average_turnover': float(np.mean([r['turnover'] for r in rebalances[1:]])) if len(rebalances) > 1 else 0.0,
+    }
+    return {
+        'symbols': list(rets.columns),
+        'dates': [d.date().isoformat() for d in dates],
+        'values': [float(v) for v in values],
+        'rebalances': rebalances,
+        'stats': stats,
+    }
@@ -0,0 +1,219 @@
+"""Critical Line Algorithm for the long-only, fully-invested frontier.
+
+Markowitz's CLA walks the frontier from the highest-return portfolio down to
+the global minimum-variance portfolio. Between two consecutive *corner*
+portfolios the set of free (not at a bound) assets is fixed, so every
+efficient portfolio in that segment is a convex combination of the two
+corners. The implementation follows Bailey & Lopez de Prado (2013), with
+bounds 0 <= w <= 1 and sum(w) == 1.
+"""
+import numpy as np
+
+
+class SingularCovariance(ValueError):
+    """The covariance matrix is rank-deficient; the corner equations have no unique solution."""
+
+
+def _inv(a):
+    try:
+        return np.linalg.inv(a)
+    except np.linalg.LinAlgError:
+        raise SingularCovariance('CLA needs a positive definite covariance matrix')
+
+
+class CriticalLine:
+    def __init__(self, mu, cov, tol=1e-10):
+        self.mu = np.asarray(mu, dtype=float).reshape(-1)
+        self.cov = np.asarray(cov, dtype=float)
+        self.tol = tol
+        self.n = len(self.mu)
+        # Every free set must have an invertible covariance block, which holds
+        # for all of them exactly when the full matrix is positive definite.
+        eig = np.linalg.eigvalsh(self.cov)
+        if eig[0] <= max(eig[-1], 0.0) * 1e-12:
+            raise SingularCovariance('CLA needs a positive definite covariance matrix')
+        # Tied means leave the turning points undefined; separate them by a
+        # negligible amount so the walk stays well posed. Among tied assets the
+        # lower-variance one gets the larger nudge, so the walk starts from the
+        # efficient one.
+        self._mu = self.mu.copy()
+        if len(np.unique(self.mu)) < self.n:
+            scale = max(np.abs(self.mu).max(), 1.0) * 1e-9
+            rank = np.empty(self.n)
+            rank[np.argsort(-np.diag(self.cov), kind='stable')] = np.arange(self.n)
+            self._mu = self.mu + scale * rank / self.n
+        self.lb = np.zeros(self.n)
+        self.ub = np.ones(self.n)
+        self.corners, self.lambdas, self.gammas, self.free_sets = [], [], [], []
+        self._solve()
+        self._purge()
+        self.corners = np.array(self.corners)
+        self.returns = self.corners @ self.mu
+        self.vols = np.sqrt(np.einsum('ij,jk,ik->i', self.corners, self.cov, self.corners))
+
+    # -- algorithm ---------------------------------------------------------
+
+    def _init_weights(self):
+        # Start from the highest-return asset(s): fill upper bounds in order of
+        # decreasing mean until the budget is used; the last one is free.
+        order = np.argsort(-self._mu, kind='stable')
+        w = self.lb.copy()
+        i = 0
+        while w.sum() < 1 and i < self.n:
+            j = order[i]
+            w[j] = self.ub[j]
+            i += 1
+        j = order[i - 1]
+        w[j] += 1 - w.sum()
+        return [int(j)], w
+
+    def _matrices(self, f, w):
+        b = [i for i in range(self.n) if i not in f]
+        cov_f = self.cov[np.ix_(f, f)]
+        mean_f = self._mu[f]
+        cov_fb = self.cov[np.ix_(f, b)] if b else None
+        w_b = w[b] if b else None
+        return cov_f, cov_fb, mean_f, w_b
+
+    def _lambda(self, cov_f_inv, cov_fb, mean_f, w_b, i, bi):
+        ones_f = np.ones(len(mean_f))
+        c1 = ones_f @ cov_f_inv @ ones_f
+        c2 = cov_f_inv @ mean_f
+        c3 = ones_f @ cov_f_inv @ mean_f
+        c4 = cov_f_inv @ ones_f
+        c = -c1 * c2[i] + c3 * c4[i]
+        if abs(c) < self.tol:
+            return None, None
+        if isinstance(bi, tuple):
+            bi = bi[1] if c > 0 else bi[0]
+        if w_b is None:
+            return float((c4[i] - c1 * bi) / c), bi
+        l1 = w_b.sum()
+        l3 = cov_f_inv @ cov_fb @ w_b
+        l2 = ones_f @ l3
+        return float(((1 - l1 + l2) * c4[i] - c1 * (bi + l3[i])) / c), bi
+
+    def _weights(self, cov_f_inv, cov_fb, mean_f, w_b, lam):
+        ones_f = np.ones(len(mean_f))
+        g1 = ones_f @ cov_f_inv @ mean_f
+        g2 = ones_f @ cov_f_inv @ ones_f
+        if w_b is None:
+            g = -lam * g1 / g2 + 1 / g2
+            w1 = 0
+        else:
+            g3 = w_b.sum()
+            w1 = cov_f_inv @ cov_fb @ w_b
+            g4 = ones_f @ w1
+            g = -lam * g1 / g2 + (1 - g3 + g4) / g2
+        w2 = cov_f_inv @ ones_f
+        w3 = cov_f_inv @ mean_f
+        return -w1 + g * w2 + lam * w3, g
+
+    def _solve(self):
+        f, w = self._init_weights()
+        self.corners.append(w.copy())
+        self.lambdas.append(None)
+        self.gammas.append(None)
+        self.free_sets.append(f[:])
+
+        for _ in range(4 * self.n + 10):
+            # 1) a free weight moves to one of its bounds
+            l_in = i_in = bi_in = None
+            if len(f) > 1:
+                cov_f, cov_fb, mean_f, w_b = self._matrices(f, w)
+                cov_f_inv = _inv(cov_f)
+                for j, i in enumerate(f):
+                    lam, bi = self._lambda(cov_f_inv, cov_fb, mean_f, w_b, j, (self.lb[i], self.ub[i]))
+                    if lam is not None and (l_in is None or lam > l_in):
+                        l_in, i_in, bi_in = lam, i, bi
+
+            # 2) a bounded weight becomes free
+            l_out = i_out = None
+            if len(f) < self.n:
+                for i in range(self.n):
+                    if i in f:
+                        continue
+                    cov_f, cov_fb, mean_f, w_b = self._matrices(f + [i], w)
+                    cov_f_inv = _inv(cov_f)
+                    lam, _ = self._lambda(cov_f_inv, cov_fb, mean_f, w_b, len(mean_f) - 1, w[i])
+                    if lam is None:
+                        continue
+                    if (self.lambdas[-1] is None or lam < self.lambdas[-1]) and (l_out is None or lam > l_out):
+                        l_out, i_out = lam, i
+
+            if (l_in is None or l_in < 0) and (l_out is None or l_out < 0):
+                # 3) no more turning points: finish at the minimum-variance portfolio
+                lam = 0.0
+                cov_f, cov_fb, mean_f, w_b = self._matrices(f, w)
+                cov_f_inv = _inv(cov_f)
+                mean_f = np.zeros_like(mean_f)
+            else:
+                # 4) take the larger lambda, i.e. the nearest turning point
+                if l_in is not None and (l_out is None or l_in > l_out):
+                    lam = l_in
+                    f.remove(i_in)
+                    w[i_in] = bi_in
+                else:
+                    lam = l_out
+                    f.append(i_out)
+                cov_f, cov_fb, mean_f, w_b = self._matrices(f, w)
+                cov_f_inv = _inv(cov_f)
+
+            w_f, g = self._weights(cov_f_inv, cov_fb, mean_f, w_b, lam)
+            w[f] = w_f
+            self.corners.append(w.copy())
+            self.lambdas.append(lam)
+            self.gammas.append(g)
+            self.free_sets.append(f[:])
+            if lam == 0:
+                break
+
+    def _purge(self):
+        # Drop corners that violate the bounds or budget through numerical error.
+        keep = []
+        for k, w in enumerate(self.corners):
+            if abs(w.sum() - 1) > 1e-8 or (w < self.lb - 1e-8).any() or (w > self.ub + 1e-8).any():
+                continue
+            keep.append(k)
+        self.corners = [np.clip(self.corners[k], self.lb, self.ub) for k in keep]
+        self.lambdas = [self.lambdas[k] for k in keep]
+        self.gammas = [self.gammas[k] for k in keep]
+        self.free_sets = [self.free_sets[k] for k in keep]
+
+    # -- queries -----------------------------------------------------------
+
+    @property
+    def min_variance(self):
+        return self.corners[-1]
+
+    def weights_for(self, target):
+        """Minimum-variance weights with expected return >= ``target``.
+
+        Returns None when the target exceeds the highest attainable return;
+        targets below the minimum-variance return yield that portfolio.
+        """
+        rets = self.returns
+        tol = 1e-12 * max(np.abs(rets).max(), 1.0)
+        if target > rets[0] + tol:
+            return None
+        # Corner returns do not increase and variances decrease along the
+        # line, so the last corner reaching the target is the cheapest one.
+        # With tied means several corners share a return; interpolating
+        # between them would land on an inefficient one.
+        k = int(np.nonzero(rets >= target - tol)[0][-1])
+        if k == len(rets) - 1 or rets[k] <= target + tol:
+            return self.corners[k].copy()
+        hi, lo = rets[k], rets[k + 1]
+        a = (target - lo) / (hi - lo)
+        return a * self.corners[k] + (1 - a) * self.corners[k + 1]
+
+
+def cla_frontier(mu, cov, targets, allow_short=False):
+    if allow_short:
+        raise ValueError("The 'cla' frontier engine only supports long-only portfolios")
+    try:
+        line = CriticalLine(mu, cov)
+    except SingularCovariance:
+        from .qp import active_set_frontier
+        return active_set_frontier(mu, cov, targets)
+    return [line.weights_for(float(t)) for t in targets]
@@ -0,0 +1,91 @@
+"""Analytic mean-variance frontier when short selling is allowed.
+
+With only the budget (sum(w) == 1) and return constraints, the minimum
+variance portfolio for a target return is a closed-form combination of
+inv(cov) @ 1 and inv(cov) @ mu. One Cholesky factorization of the covariance
+gives the whole frontier, the global minimum-variance portfolio and the
+maximum-Sharpe tangency portfolio.
+"""
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+
+
+class ClosedFormFrontier:
+    def __init__(self, mu, cov, ridge=1e-12):
+        self.mu = np.asarray(mu, dtype=float).reshape(-1)
+        n = len(self.mu)
+        ones = np.ones(n)
+        if hasattr(cov, 'solve'):
+            # Factor-model covariance: Woodbury solves, no n x n matrix.
+            self.cov = cov
+            self._inv_ones = cov.solve(ones)
+            self._inv_mu = cov.solve(self.mu)
+        else:
+            self.cov = np.asarray(cov, dtype=float)
+            try:
+                factor = cho_factor(self.cov, lower=True, check_finite=False)
+            except np.linalg.LinAlgError:
+                # Singular sample covariance (e.g. fewer days than assets).
+                scale = max(float(np.trace(self.cov)) / max(n, 1), 1.0)
+                factor = cho_factor(self.cov + ridge * scale * np.eye(n), lower=True, check_finite=False)
+            self._inv_ones = cho_solve(factor, ones, check_finite=False)
+            self._inv_mu = cho_solve(factor, self.mu, check_finite=False)
+        # Merton's frontier constants.
+        self.a = float(ones @ self._inv_ones)
+        self.b = float(ones @ self._inv_mu)
+        self.c = float(self.mu @ self._inv_mu)
+        self.d = self.a * self.c - self.b ** 2
+
+    @property
+    def min_variance_return(self):
+        return self.b / self.a
+
+    def min_variance(self):
+        """Global minimum-variance portfolio."""
+        return self._inv_ones / self.a
+
+    def weights_for(self, target):
+        """Minimum-variance weights with expected return exactly ``target``."""
+        if self.d <= 0:
+            return self.min_variance()
+        lam = (self.c - self.b * target) / self.d
+        gam = (self.a * target - self.b) / self.d
+        return lam * self._inv_ones + gam * self._inv_mu
+
+    def variance_for(self, target):
+        if self.d <= 0:
+            return 1.0 / self.a
+        return (self.a * target ** 2 - 2 * self.b * target + self.c) / self.d
+
+    def tangency(self, risk_free=0.0):
+        """Maximum-Sharpe portfolio for the given risk-free rate.
+
+        Only defined when the risk-free rate is below the minimum-variance
+        return; otherwise the tangent line touches the inefficient branch.
+        """
+        if risk_free >= self.min_variance_return:
+            raise ValueError('risk-free rate must be below the minimum-variance portfolio return')
+        raw = self._inv_mu - risk_free * self._inv_ones
+        return raw / raw.sum()
+
+    def curve(self, targets):
+        """Return (returns, volatilities) along the frontier for ``targets``."""
+        targets = np.asarray(targets, dtype=float)
+        return targets, np.sqrt(np.maximum(self.variance_for(targets), 0.0))
+
+
+def closed_form_min_variance(mu, cov, target_return=None):
+    # The optimizer's return constraint is w @ mu >= target: below the
+    # minimum-variance return it is slack and the global minimum is optimal.
+    frontier = ClosedFormFrontier(mu, cov)
+    if target_return is None or target_return <= frontier.min_variance_return:
+        return frontier.min_variance()
+    return frontier.weights_for(float(target_return))
+
+
+def closed_form_frontier(mu, cov, targets, allow_short=True):
+    if not allow_short:
+        raise ValueError("The 'closed_form' frontier engine requires allow_short=True")
+    frontier = ClosedFormFrontier(mu, cov)
+    gmv_ret = frontier.min_variance_return
+    return [frontier.min_variance() if t <= gmv_ret else frontier.weights_for(float(t)) for t in targets]
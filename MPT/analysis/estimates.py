@@ -0,0 +1,180 @@
+"""Cached return/covariance estimates for a (symbols, start, end) universe.
+
+Entries are keyed by the universe plus the ``prices_version`` of every stock
+in it. fetch_prices bumps that version when it writes rows, so only entries
+that involve a refreshed symbol stop matching; everything else stays valid.
+
+The backend is chosen by ``settings.ESTIMATE_CACHE``::
+
+    ESTIMATE_CACHE = {'BACKEND': 'local', 'MAX_ENTRIES': 128, 'MAX_BYTES': 256 * 1024 * 1024}
+    ESTIMATE_CACHE = {'BACKEND': 'django', 'ALIAS': 'default', 'TIMEOUT': 3600}
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from stocks.models import Stock
+from .metrics import stage
+from .services import load_price_df, compute_daily_returns, annualize_return, annualize_cov, estimate_cov, default_n_factors
+
+
+Estimates = namedtuple('Estimates', ['symbols', 'mu', 'cov', 'n_obs'])
+
+
+def _nbytes(est):
+    return est.mu.nbytes + est.cov.nbytes + 64 * len(est.symbols)
+
+
+class LocalEstimateCache:
+    """In-process LRU bounded by entry count and by total array bytes."""
+
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            est = self._entries.get(key)
+            if est is not None:
+                self._entries.move_to_end(key)
+            return est
+
+    def set(self, key, est):
+        size = _nbytes(est)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= _nbytes(old)
+            self._entries[key] = est
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class DjangoEstimateCache:
+    """Shares estimates across processes through a Django cache alias.
+
+    The alias may be shared with other apps: entries are stored under a key
+    prefix and a generation number, and ``clear()`` bumps the generation
+    instead of flushing the alias. Entries of old generations are never read
+    again and expire after ``timeout``.
+    """
+
+    prefix = 'mpt:estimates:'
+
+    def __init__(self, alias='default', timeout=3600):
+        self.alias = alias
+        self.timeout = timeout
+
+    def _generation(self):
+        cache = caches[self.alias]
+        generation = cache.get(self.prefix + 'generation')
+        if generation is None:
+            cache.add(self.prefix + 'generation', 1, None)
+            generation = cache.get(self.prefix + 'generation', 1)
+        return generation
+
+    def get(self, key):
+        return caches[self.alias].get(self.prefix + key, version=self._generation())
+
+    def set(self, key, est):
+        caches[self.alias].set(self.prefix + key, est, self.timeout, version=self._generation())
+
+    def clear(self):
+        cache = caches[self.alias]
+        try:
+            cache.incr(self.prefix + 'generation')
+        except ValueError:
+            # No generation stored (evicted or never set): entries used 1.
+            cache.set(self.prefix + 'generation', 2, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_estimate_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                conf = dict(getattr(settings, 'ESTIMATE_CACHE', {}))
+                backend = conf.pop('BACKEND', 'local')
+                if backend == 'django':
+                    _cache = DjangoEstimateCache(alias=conf.get('ALIAS', 'default'), timeout=conf.get('TIMEOUT', 3600))
+                elif backend == 'local':
+                    _cache = LocalEstimateCache(max_entries=conf.get('MAX_ENTRIES', 128),
+                                                max_bytes=conf.get('MAX_BYTES', 256 * 1024 * 1024))
+                else:
+                    raise ValueError(f'Unknown ESTIMATE_CACHE backend: {backend}')
+    return _cache
+
+
+def estimate_key(symbols, start, end, versions, cov_model='sample', n_factors=None):
+    parts = [sorted(symbols), str(start or ''), str(end or ''), [versions.get(s) for s in sorted(symbols)]]
+    if cov_model != 'sample':
+        parts.append([cov_model, n_factors])
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+
+async def astock_versions(symbols):
+    """``{symbol: prices_version}`` via the async ORM."""
+    return {symbol: version async for symbol, version in
+            Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'prices_version')}
+
+
+def get_estimates(symbols, start=None, end=None, cache=None, cov_model='sample', n_factors=None):
+    """Return annualized (mu, cov) for the universe, or None if there are no prices.
+
+    With ``cov_model='factor'`` the covariance is a ``FactorCovariance`` with
+    ``n_factors`` PCA factors (``settings.FACTOR_MODEL_FACTORS`` by default).
+    """
+    symbols = sorted(set(symbols))
+    cache = cache or get_estimate_cache()
+    n_factors = int(n_factors or default_n_factors()) if cov_model == 'factor' else None
+    versions = dict(Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'prices_version'))
+    key = estimate_key(symbols, start, end, versions, cov_model, n_factors)
+    est = cache.get(key)
+    if est is not None:
+        return est
+
+    est = build_estimates(load_price_df(symbols, start, end), cov_model, n_factors)
+    if est is not None:
+        store_estimates(key, est, cache)
+    return est
+
+
+def store_estimates(key, est, cache=None):
+    # Cached arrays are shared between requests; keep callers from mutating them.
+    est.mu.setflags(write=False)
+    est.cov.setflags(write=False)
+    (cache or get_estimate_cache()).set(key, est)
+
+
+def build_estimates(price_df, cov_model='sample', n_factors=None):
+    """Estimates from a price matrix; pure computation, no database access."""
+    if price_df.empty:
+        return None
+    daily_rets = compute_daily_returns(price_df)
+    with stage('covariance'):
+        est = Estimates(
+            symbols=list(price_df.columns),
+            mu=annualize_return(daily_rets.mean()).values,
+            cov=annualize_cov(estimate_cov(daily_rets, cov_model, n_factors)),
+            n_obs=len(daily_rets),
+        )
+    return est
@@ -0,0 +1,132 @@
+"""Statistical factor-model covariance for large universes.
+
+The sample covariance of n assets is a dense n x n matrix, and it is rank
+deficient whenever there are fewer return days than assets. A k-factor model
+keeps only the top principal components of the returns::
+
+    cov = B F B' + diag(d)
+
+with B the n x k loadings, F the k x k factor covariance and d the
+asset-specific variances. It takes O(n k) memory, is positive definite as
+long as every d > 0, and lets the optimizer work with the factors directly
+instead of all n^2 covariance entries.
+"""
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+
+
+class FactorCovariance:
+    """Low-rank-plus-diagonal covariance ``B F B' + diag(d)``.
+
+    Behaves like a matrix where the code needs one: ``np.asarray(cov)``
+    builds the dense matrix, and ``cov @ x`` / ``x @ cov`` multiply without
+    forming it.
+    """
+
+    # Keep NumPy from densifying us in ``weights @ cov``; use __rmatmul__.
+    __array_ufunc__ = None
+
+    def __init__(self, loadings, factor_cov, specific):
+        self.loadings = np.asarray(loadings, dtype=float)
+        self.factor_cov = np.asarray(factor_cov, dtype=float)
+        self.specific = np.asarray(specific, dtype=float).reshape(-1)
+        n, k = self.loadings.shape
+        if self.factor_cov.shape != (k, k) or self.specific.shape != (n,):
+            raise ValueError('loadings, factor_cov and specific have inconsistent shapes')
+
+    @property
+    def shape(self):
+        n = len(self.specific)
+        return (n, n)
+
+    @property
+    def n_factors(self):
+        return self.loadings.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.loadings.nbytes + self.factor_cov.nbytes + self.specific.nbytes
+
+    def __len__(self):
+        return len(self.specific)
+
+    def __array__(self, dtype=None, copy=None):
+        B = self.loadings
+        dense = B @ self.factor_cov @ B.T
+        dense[np.diag_indices_from(dense)] += self.specific
+        return dense if dtype is None else dense.astype(dtype)
+
+    def __mul__(self, scalar):
+        # Scaling by a number, as annualize_cov does.
+        return FactorCovariance(self.loadings, self.factor_cov * scalar, self.specific * scalar)
+
+    __rmul__ = __mul__
+
+    def __matmul__(self, x):
+        x = np.asarray(x, dtype=float)
+        d = self.specific if x.ndim == 1 else self.specific[:, None]
+        return self.loadings @ (self.factor_cov @ (self.loadings.T @ x)) + d * x
+
+    def __rmatmul__(self, x):
+        # The matrix is symmetric, so x @ cov == (cov @ x.T).T.
+        x = np.asarray(x, dtype=float)
+        return (self @ x.T).T
+
+    def setflags(self, write):
+        for a in (self.loadings, self.factor_cov, self.specific):
+            a.setflags(write=write)
+
+    def diagonal(self):
+        B = self.loadings
+        return np.einsum('ij,jk,ik->i', B, self.factor_cov, B) + self.specific
+
+    def take(self, idx):
+        """Covariance of the sub-universe ``idx`` (still in factor form)."""
+        idx = np.asarray(idx)
+        return FactorCovariance(self.loadings[idx], self.factor_cov, self.specific[idx])
+
+    def factor_sqrt(self):
+        """Return L with L L' == F, so that w' cov w == |L' B' w|^2 + sum(d w^2)."""
+        try:
+            return np.linalg.cholesky(self.factor_cov)
+        except np.linalg.LinAlgError:
+            vals, vecs = np.linalg.eigh(self.factor_cov)
+            return vecs * np.sqrt(np.maximum(vals, 0.0))
+
+    def solve(self, b):
+        """Return inv(cov) @ b via the Woodbury identity in O(n k^2)."""
+        b = np.asarray(b, dtype=float)
+        d = self.specific if b.ndim == 1 else self.specific[:, None]
+        B = self.loadings
+        db = b / d
+        dB = B / self.specific[:, None]
+        # Capacitance matrix inv(F) + B' inv(D) B, with F = L L'.
+        L = self.factor_sqrt()
+        k = B.shape[1]
+        inner = np.eye(k) + L.T @ (B.T @ dB) @ L
+        factor = cho_factor(inner, lower=True, check_finite=False)
+        return db - dB @ (L @ cho_solve(factor, L.T @ (B.T @ db), check_finite=False))
+
+
+def pca_factor_covariance(returns, n_factors):
+    """Fit a k-factor model to a (days x assets) array of daily returns.
+
+    Factors are the top principal components of the demeaned returns and
+    have unit variance; the specific variances make the diagonal match the
+    sample variances. Missing returns are treated as zero deviations.
+    """
+    X = np.asarray(returns, dtype=float)
+    t, n = X.shape
+    if t < 2:
+        raise ValueError('at least two return observations are required')
+    mean = np.nanmean(X, axis=0)
+    X = np.nan_to_num(X - mean)
+    var = np.nanvar(np.asarray(returns, dtype=float), axis=0, ddof=1)
+    k = max(1, min(int(n_factors), n, t - 1))
+    # Thin SVD costs O(t n min(t, n)) and never forms the n x n matrix.
+    _, s, vt = np.linalg.svd(X, full_matrices=False)
+    loadings = vt[:k].T * (s[:k] / np.sqrt(t - 1))
+    specific = var - np.einsum('ij,ij->i', loadings, loadings)
+    floor = 1e-6 * max(float(np.nanmean(var)), 1e-300)
+    specific = np.maximum(np.nan_to_num(specific, nan=floor), floor)
+    return FactorCovariance(loadings, np.eye(k), specific)
@@ -0,0 +1,106 @@
+"""Frontier engines used by ``plotting.efficient_frontier``.
+
+Each engine takes ``(mu, cov, targets, allow_short)`` and returns a list with
+one weight vector per target, or ``None`` where that target has no solution.
+``iter_frontier`` yields the same weights one target at a time.
+"""
+import numpy as np
+from . import solvers
+from .cla import cla_frontier
+from .closed_form import closed_form_frontier
+from .parallel import parallel_frontier
+from .qp import active_set_frontier, iter_active_set_frontier
+
+
+class ParametricFrontier:
+    """Min-variance problem compiled once, with the target return as a parameter.
+
+    cvxpy canonicalizes the problem on the first solve and caches the result,
+    so every later target only refreshes the parameter value and re-enters the
+    solver, warm-started from the previous point's solution. The solver comes
+    from the profile in analysis.solvers.
+    """
+
+    def __init__(self, mu, cov, allow_short=False, profile=None):
+        import cvxpy as cp
+        from .services import cvxpy_variance
+
+        n = len(mu)
+        self.n = n
+        self.profile = profile
+        self.solvers = solvers.candidates(n, profile)
+        self.log = solvers.sample_frontier()
+        self.w = cp.Variable(n)
+        self.target = cp.Parameter()
+        objective, constraints = cvxpy_variance(self.w, cov, psd_wrap=True)
+        constraints += [cp.sum(self.w) == 1, self.w @ np.asarray(mu) >= self.target]
+        if not allow_short:
+            constraints.append(self.w >= 0)
+        self.problem = cp.Problem(cp.Minimize(objective), constraints)
+
+    def solve(self, target, initial=None):
+        self.target.value = float(target)
+        if initial is not None:
+            self.w.value = np.asarray(initial, dtype=float)
+        solver = solvers.solve(self.problem, self.n, profile=self.profile, context='frontier', warm_start=True,
+                               order=self.solvers, log=self.log)
+        if solver is None or self.w.value is None:
+            return None
+        if solver != self.solvers[0]:
+            # Stick with the solver that worked so later points warm-start.
+            self.solvers.remove(solver)
+            self.solvers.insert(0, solver)
+        return np.array(self.w.value).flatten()
+
+
+def iter_parametric_frontier(mu, cov, targets, allow_short=False):
+    frontier = ParametricFrontier(mu, cov, allow_short=allow_short)
+    previous = None
+    for t in targets:
+        w = frontier.solve(t, initial=previous)
+        if w is not None:
+            previous = w
+        yield w
+
+
+def parametric_frontier(mu, cov, targets, allow_short=False):
+    return list(iter_parametric_frontier(mu, cov, targets, allow_short=allow_short))
+
+
+ENGINES = {
+    'parametric': parametric_frontier,
+    'cla': cla_frontier,
+    'closed_form': closed_form_frontier,
+    'parallel': parallel_frontier,
+    'active_set': active_set_frontier,
+}
+
+
+def default_engine(allow_short=False, n_assets=None):
+    if allow_short:
+        return 'closed_form'
+    from .services import choose_method
+    return 'active_set' if n_assets is not None and choose_method(n_assets) == 'active_set' else 'parametric'
+
+
+# Engines that solve point by point; the others produce the whole grid at once.
+ITER_ENGINES = {
+    'parametric': iter_parametric_frontier,
+    'active_set': iter_active_set_frontier,
+}
+
+
+def iter_frontier(mu, cov, targets, allow_short=False, engine=None):
+    """Yield the weights for each target as soon as it is solved."""
+    engine = engine or default_engine(allow_short, len(mu))
+    if engine in ITER_ENGINES:
+        yield from ITER_ENGINES[engine](mu, cov, targets, allow_short=allow_short)
+    else:
+        yield from get_engine(engine)(mu, cov, targets, allow_short=allow_short)
+
+
+def get_engine(name):
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown frontier engine '{name}'. Choose from: {', '.join(sorted(ENGINES))}")
@@ -0,0 +1,181 @@
+"""Background job queue backed by the Job model.
+
+The API enqueues work and returns immediately; `manage.py run_jobs` claims
+queued jobs one at a time and runs them. Identical in-flight requests (same
+kind and parameters, with symbol lists compared regardless of case, order and
+repeats) share a single job.
+
+While a job runs, its worker refreshes ``heartbeat_at``. A running job whose
+heartbeat is older than ``JOB_LEASE_SECONDS`` lost its worker (OOM, deploy,
+SIGKILL): it is queued again, or failed once it has been started
+``JOB_MAX_ATTEMPTS`` times. A worker whose job was taken over this way does
+not overwrite the outcome.
+"""
+import hashlib
+import json
+import threading
+import traceback
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import solvers
+from .models import Job
+
+
+def _symbol_set(symbols):
+    # Same parsing as optimization.parse_symbols, which is not imported here
+    # to keep numpy out of the URLconf.
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    if not isinstance(symbols, (list, tuple)):
+        return symbols
+    return sorted({str(s).strip().upper() for s in symbols if str(s).strip()})
+
+
+def _normalized(params):
+    # Symbol lists differing only in case, order or repeats name the same work.
+    if not isinstance(params, dict):
+        return params
+    params = {k: _symbol_set(v) if k in ('symbols', 'universe') else v for k, v in params.items()}
+    if isinstance(params.get('jobs'), list):
+        params['jobs'] = [_normalized(job) for job in params['jobs']]
+    return params
+
+
+def dedup_key(kind, params):
+    payload = json.dumps([kind, _normalized(params)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def lease_seconds():
+    return getattr(settings, 'JOB_LEASE_SECONDS', 300)
+
+
+def expire_stale(dedup_key=None):
+    """Requeue (or fail) running jobs whose worker stopped heartbeating; return how many."""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=lease_seconds())
+    stale = Job.objects.filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+                               status=Job.RUNNING)
+    if dedup_key is not None:
+        stale = stale.filter(dedup_key=dedup_key)
+    max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 2)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=Job.FAILED, finished_at=now, message='worker lost',
+        error=f'No heartbeat for {lease_seconds()} s after {max_attempts} attempts; the worker was probably killed.')
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status=Job.QUEUED, started_at=None, heartbeat_at=None, progress=0.0, message='requeued: worker lost')
+    return failed + requeued
+
+
+def enqueue(kind, params):
+    """Return (job, created); an identical queued or running job is reused."""
+    key = dedup_key(kind, params)
+    expire_stale(dedup_key=key)
+    for attempt in range(3):
+        existing = Job.objects.filter(dedup_key=key, status__in=Job.IN_FLIGHT).first()
+        if existing is not None:
+            return existing, False
+        try:
+            with transaction.atomic():
+                return Job.objects.create(kind=kind, params=params, dedup_key=key), True
+        except IntegrityError:
+            # Lost the race against a concurrent identical request, which may
+            # even have finished by now: look again.
+            if attempt == 2:
+                raise
+
+
+def claim_next():
+    """Atomically move the oldest queued job to running and return it."""
+    expire_stale()
+    for job_id in Job.objects.filter(status=Job.QUEUED).order_by('created_at').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1)
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _owned(job):
+    # The job as long as this worker still holds it.
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, attempts=job.attempts)
+
+
+def _heartbeat(job, stop):
+    try:
+        while not stop.wait(lease_seconds() / 3):
+            _owned(job).update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def _progress_updater(job):
+    def update(fraction, message=''):
+        _owned(job).update(progress=float(fraction), message=str(message)[:255], heartbeat_at=timezone.now())
+    return update
+
+
+def _run_fetch_prices(params, progress):
+    out = StringIO()
+    kwargs = {k: v for k, v in params.items() if k in ('symbols', 'start', 'end', 'incremental') and v is not None}
+    call_command('fetch_prices', stdout=out, progress_callback=progress, **kwargs)
+    return {'detail': 'fetch completed', 'log': out.getvalue().splitlines()}
+
+
+def _run_optimize(params, progress):
+    from .optimization import run_optimization
+    return run_optimization(params, progress=progress)
+
+
+def _run_optimize_batch(params, progress):
+    from .optimization import run_batch_optimization
+    return run_batch_optimization(params, progress=progress)
+
+
+def _run_backtest(params, progress):
+    from .optimization import run_backtest_request
+    return run_backtest_request(params, progress=progress)
+
+
+HANDLERS = {
+    Job.KIND_FETCH_PRICES: _run_fetch_prices,
+    Job.KIND_OPTIMIZE: _run_optimize,
+    Job.KIND_OPTIMIZE_BATCH: _run_optimize_batch,
+    Job.KIND_BACKTEST: _run_backtest,
+}
+
+
+def run_job(job):
+    progress = _progress_updater(job)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job, stop), daemon=True)
+    beat.start()
+    try:
+        result = HANDLERS[job.kind](job.params, progress)
+    except Exception as e:
+        job.status = Job.FAILED
+        job.error = f'{e}\n\n{traceback.format_exc()}'
+        job.message = str(e)[:255]
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.progress = 1.0
+        job.message = 'done'
+    finally:
+        stop.set()
+        beat.join()
+    job.finished_at = timezone.now()
+    fields = ['status', 'error', 'message', 'result', 'progress', 'finished_at']
+    if not _owned(job).update(**{f: getattr(job, f) for f in fields}):
+        # The lease expired and the job was requeued or failed meanwhile.
+        job.refresh_from_db()
+    solvers.flush()
+    return job
@@ -0,0 +1,173 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from io import StringIO
+
+import django
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases, override_settings
+
+from stocks.models import Stock, Price
+from stocks.synthetic import ORIGIN, synthetic_close
+from analysis.services import (price_df_from_prices, compute_daily_returns, annualize_return, annualize_cov,
+                               optimize_min_variance)
+from analysis.plotting import efficient_frontier
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+class Command(BaseCommand):
+    help = ('Time the optimizer and ingestion hot paths on synthetic correlated prices and write the results '
+            'as JSON. Database stages run against a scratch test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=_ints, default=[10, 100, 1000, 5000], help='Comma-separated universe sizes')
+        parser.add_argument('--years', type=_ints, default=[1, 5, 20], help='Comma-separated history lengths in years')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage (best and median are kept)')
+        parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed')
+        parser.add_argument('--max-db-rows', type=int, default=2_000_000,
+                            help='Skip database stages for cases with more price rows than this')
+        parser.add_argument('--max-solver-assets', type=int, default=1000,
+                            help='Skip optimize/frontier stages for larger universes')
+        parser.add_argument('--output', type=str, default='benchmark.json', help='Where to write the JSON results')
+        parser.add_argument('--compare', type=str, required=False,
+                            help='Earlier results file; report stages that got slower than --threshold')
+        parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio counted as a regression')
+
+    def handle(self, *args, **options):
+        self.repeat = max(1, options['repeat'])
+        results = []
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Never write benchmark data into the shared price store, and keep
+            # synthetic solves out of the solve log.
+            with override_settings(PRICE_STORE_ENABLED=False, SOLVE_LOG={'ENABLED': False}):
+                for years in options['years']:
+                    for n in options['sizes']:
+                        results += self.run_case(n, years, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        report = {'meta': self.meta(options), 'results': results}
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+        if options.get('compare'):
+            self.compare(options['compare'], results, options['threshold'])
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                    cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': commit,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'versions': {'django': django.__version__, 'numpy': np.__version__, 'pandas': pd.__version__},
+            'options': {k: options[k] for k in ('sizes', 'years', 'repeat', 'seed', 'max_db_rows', 'max_solver_assets')},
+        }
+
+    def timed(self, fn, setup=None):
+        if setup is None:
+            # One untimed call so imports and solver caches don't skew run 1.
+            fn()
+        times = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        return times
+
+    def record(self, stage, n, years, times=None, skipped=None, **extra):
+        entry = {'stage': stage, 'assets': n, 'years': years, **extra}
+        if skipped:
+            entry['skipped'] = skipped
+            self.stdout.write(f'  {stage:<24} n={n:<5} years={years:<3} skipped ({skipped})')
+        else:
+            entry.update(times=times, best=min(times), median=statistics.median(times))
+            self.stdout.write(f'  {stage:<24} n={n:<5} years={years:<3} best {min(times):.4f}s')
+        return entry
+
+    def run_case(self, n, years, options):
+        symbols = [f'SYN{i:05d}' for i in range(n)]
+        start = ORIGIN.date().isoformat()
+        end = (ORIGIN + pd.DateOffset(years=years)).date().isoformat()
+        prices = synthetic_close(symbols, start, end, seed=options['seed'])
+        rows = prices.size
+        out = []
+
+        daily = compute_daily_returns(prices)
+        out.append(self.record('returns_cov', n, years, self.timed(
+            lambda: annualize_cov(compute_daily_returns(prices).cov())), rows=rows))
+        mu = annualize_return(daily.mean()).values
+        cov = annualize_cov(daily.cov()).values
+
+        if n > options['max_solver_assets']:
+            reason = f"more than {options['max_solver_assets']} assets"
+            out.append(self.record('optimize_min_variance', n, years, skipped=reason))
+            out.append(self.record('efficient_frontier', n, years, skipped=reason))
+        else:
+            target = float(np.median(mu))
+            out.append(self.record('optimize_min_variance', n, years, self.timed(
+                lambda: optimize_min_variance(mu, cov, target_return=target))))
+            out.append(self.record('efficient_frontier', n, years, self.timed(
+                lambda: efficient_frontier(mu, cov, n_points=20)), points=20))
+
+        if rows > options['max_db_rows']:
+            reason = f"more than {options['max_db_rows']} rows"
+            out.append(self.record('fetch_prices_insert', n, years, skipped=reason))
+            out.append(self.record('price_df_from_prices', n, years, skipped=reason))
+            return out
+
+        Stock.objects.bulk_create([Stock(symbol=s) for s in symbols])
+
+        def clear():
+            Price.objects.all().delete()
+
+        def fetch():
+            call_command('fetch_prices', symbols=','.join(symbols), start=start, end=end, provider='synthetic',
+                         stdout=StringIO(), stderr=StringIO())
+
+        out.append(self.record('fetch_prices_insert', n, years, self.timed(fetch, setup=clear), rows=rows))
+        if Price.objects.count() != rows:
+            raise CommandError(f'expected {rows} price rows, found {Price.objects.count()}')
+        qs = Price.objects.filter(stock__symbol__in=symbols, date__gte=start, date__lt=end)
+        out.append(self.record('price_df_from_prices', n, years, self.timed(lambda: price_df_from_prices(qs)), rows=rows))
+        Price.objects.all().delete()
+        Stock.objects.all().delete()
+        return out
+
+    def compare(self, path, results, threshold):
+        with open(path) as f:
+            baseline = {(r['stage'], r['assets'], r['years']): r for r in json.load(f)['results'] if 'best' in r}
+        regressions = 0
+        for r in results:
+            old = baseline.get((r['stage'], r['assets'], r['years']))
+            if old is None or 'best' not in r:
+                continue
+            ratio = r['best'] / old['best'] if old['best'] else float('inf')
+            line = f"{r['stage']:<24} n={r['assets']:<5} years={r['years']:<3} {old['best']:.4f}s -> {r['best']:.4f}s ({ratio:.2f}x)"
+            if ratio > threshold:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'{regressions} stage(s) slower than {threshold:.2f}x the baseline')
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ('numpy', 'pandas', 'scipy', 'cvxpy', 'matplotlib', 'yfinance')
+
+
+def parse_importtime(text):
+    """``[(module, cumulative_us, chain)]`` from ``python -X importtime`` output.
+
+    ``chain`` lists the modules whose import triggered this one, outermost
+    first.
+    """
+    entries, stack = [], []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(cumulative), depth))
+    # importtime prints children before their parent: walk backwards to
+    # recover each module's chain of importers.
+    result = [None] * len(entries)
+    for i in range(len(entries) - 1, -1, -1):
+        name, cumulative, depth = entries[i]
+        del stack[depth:]
+        result[i] = (name, cumulative, list(stack))
+        stack.append(name)
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Measure what importing a module (the URLconf by default) costs in a fresh interpreter after '
+            'django.setup(), and report heavy numeric modules it pulls in')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', type=str, default=settings.ROOT_URLCONF, help='Module to import')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+        parser.add_argument('--heavy', type=str, default=','.join(HEAVY_MODULES),
+                            help='Comma-separated top-level packages that should stay lazy')
+        parser.add_argument('--fail-on-heavy', action='store_true',
+                            help='Exit with an error if any heavy package is imported')
+
+    def handle(self, *args, **options):
+        module = options['module']
+        if not all(part.isidentifier() for part in module.split('.')):
+            raise CommandError(f'invalid module name: {module}')
+        # A plain import statement: -X importtime does not time importlib.import_module().
+        code = f'import django; django.setup(); import {module}'
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'MPT.settings')}
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, env=env)
+        if proc.returncode:
+            raise CommandError(f'import failed:\n{proc.stderr[-2000:]}')
+        entries = parse_importtime(proc.stderr)
+
+        total = sum(cumulative for _, cumulative, chain in entries if not chain)
+        target = next((cumulative for name, cumulative, _ in entries if name == module), 0)
+        self.stdout.write(f'django.setup() + import {module}: {total / 1000:.1f} ms ({module}: {target / 1000:.1f} ms)')
+        self.stdout.write('Slowest imports (cumulative):')
+        for name, cumulative, chain in sorted(entries, key=lambda e: -e[1])[:options['top']]:
+            self.stdout.write(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+        heavy = {h.strip() for h in options['heavy'].split(',') if h.strip()}
+        found = [(name, cumulative, chain) for name, cumulative, chain in entries
+                 if name in heavy and not any(c.split('.')[0] == name for c in chain)]
+        if not found:
+            self.stdout.write(self.style.SUCCESS('No heavy modules imported.'))
+            return
+        for name, cumulative, chain in found:
+            self.stdout.write(self.style.WARNING(f"{name} ({cumulative / 1000:.1f} ms) via {' > '.join(chain) or '-'}"))
+        if options['fail_on_heavy']:
+            raise CommandError(f"heavy modules imported: {', '.join(name for name, _, _ in found)}")
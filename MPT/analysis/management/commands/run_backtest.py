@@ -0,0 +1,42 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from analysis import solvers
+from analysis.backtest import run_backtest, PERIODS, WINDOWS
+
+
+class Command(BaseCommand):
+    help = 'Walk-forward backtest of the min-variance portfolio over a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=str, required=True, help='Comma-separated symbols')
+        parser.add_argument('--start', type=str, required=False, help='YYYY-MM-DD start date')
+        parser.add_argument('--end', type=str, required=False, help='YYYY-MM-DD end date')
+        parser.add_argument('--lookback', type=int, default=252, help='Estimation window in trading days')
+        parser.add_argument('--rebalance', type=str, default='monthly',
+                            help=f"{', '.join(PERIODS)} or a number of trading days")
+        parser.add_argument('--window', type=str, default='rolling', choices=WINDOWS)
+        parser.add_argument('--target', type=float, required=False, help='Target annual return (decimal)')
+        parser.add_argument('--allow-short', action='store_true', help='Allow negative weights')
+        parser.add_argument('--cost-bps', type=float, default=0.0, help='Transaction cost per unit of turnover, in bps')
+        parser.add_argument('--output', type=str, required=False, help='Write the full result as JSON to this file')
+
+    def handle(self, *args, **options):
+        symbols = [s.strip().upper() for s in options['symbols'].split(',') if s.strip()]
+        try:
+            result = run_backtest(symbols, options.get('start'), options.get('end'), lookback=options['lookback'],
+                                  rebalance=options['rebalance'], window=options['window'], target=options.get('target'),
+                                  allow_short=options['allow_short'], cost_bps=options['cost_bps'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            solvers.flush()
+        if result is None:
+            raise CommandError('No price data found for given symbols/date range.')
+
+        if options.get('output'):
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+        stats = result['stats']
+        self.stdout.write(f"{result['dates'][0]} .. {result['dates'][-1]}, {stats['rebalances']} rebalances")
+        for key in ('total_return', 'annualized_return', 'annualized_volatility', 'max_drawdown', 'average_turnover'):
+            self.stdout.write(f'  {key}: {stats[key]:.4f}')
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from analysis.jobs import claim_next, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued fetch/optimize jobs submitted through the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty instead of polling')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, required=False, help='Exit after running this many jobs')
+
+    def handle(self, *args, **options):
+        done = 0
+        while options.get('max_jobs') is None or done < options['max_jobs']:
+            job = claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'Running {job}')
+            job = run_job(job)
+            done += 1
+            style = self.style.SUCCESS if job.status == job.SUCCEEDED else self.style.ERROR
+            self.stdout.write(style(f'Finished {job}'))
@@ -0,0 +1,74 @@
+import json
+from datetime import timedelta
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analysis import solvers
+from analysis.models import SolveLog
+
+SIZE_BUCKETS = [0, 50, 200, 1000, 5000, float('inf')]
+SIZE_LABELS = ['<=50', '51-200', '201-1000', '1001-5000', '>5000']
+
+
+class Command(BaseCommand):
+    help = 'Summarize the cvxpy solve log per solver, profile and universe size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, required=False, help='Only attempts from the last N days')
+        parser.add_argument('--profile', type=str, required=False, choices=sorted(solvers.PROFILES))
+        parser.add_argument('--context', type=str, required=False, choices=['optimize', 'frontier'])
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+        parser.add_argument('--prune-days', type=float, required=False,
+                            help='Delete log entries older than N days before summarizing')
+
+    def handle(self, *args, **options):
+        solvers.flush()
+        if options.get('prune_days') is not None:
+            deleted = solvers.prune(options['prune_days'] * 24 * 3600)
+            self.stdout.write(f'Deleted {deleted} entries older than {options["prune_days"]:g} days')
+
+        qs = SolveLog.objects.all()
+        if options.get('days') is not None:
+            qs = qs.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        for field in ('profile', 'context'):
+            if options.get(field):
+                qs = qs.filter(**{field: options[field]})
+        rows = list(qs.values('solver', 'profile', 'status', 'attempt', 'n_assets', 'iterations',
+                              'solve_time', 'wall_time'))
+        if not rows:
+            self.stdout.write('No solves logged.')
+            return
+
+        df = pd.DataFrame(rows)
+        df['size'] = pd.cut(df['n_assets'], SIZE_BUCKETS, labels=SIZE_LABELS)
+        df['ok'] = df['status'].isin(solvers.OPTIMAL_OR_INACCURATE)
+        df['fallback_win'] = df['ok'] & (df['attempt'] > 0)
+        summary = df.groupby(['profile', 'size', 'solver'], observed=True).agg(
+            attempts=('ok', 'size'),
+            success=('ok', 'mean'),
+            fallback_wins=('fallback_win', 'sum'),
+            iterations=('iterations', 'mean'),
+            solve_median=('solve_time', 'median'),
+            solve_p95=('solve_time', lambda s: s.quantile(0.95)),
+            wall_median=('wall_time', 'median'),
+        ).reset_index()
+
+        if options['json']:
+            records = summary.astype(object).where(summary.notna(), None).to_dict('records')
+            self.stdout.write(json.dumps(records, indent=2, default=str))
+            return
+
+        self.stdout.write(f'{len(df)} attempts')
+        self.stdout.write(f"{'profile':<9}{'assets':<11}{'solver':<10}{'n':>7}{'ok%':>7}{'fb':>5}"
+                          f"{'iters':>8}{'solve p50':>11}{'solve p95':>11}{'wall p50':>10}")
+        for r in summary.itertuples():
+            self.stdout.write(
+                f'{r.profile:<9}{r.size:<11}{r.solver:<10}{r.attempts:>7}{100 * r.success:>6.1f}%'
+                f'{r.fallback_wins:>5}{_num(r.iterations, ".0f"):>8}{_num(r.solve_median, ".4f"):>11}'
+                f'{_num(r.solve_p95, ".4f"):>11}{_num(r.wall_median, ".4f"):>10}')
+
+
+def _num(value, fmt):
+    return '-' if pd.isna(value) else format(value, fmt)
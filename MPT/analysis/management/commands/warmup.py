@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = 'Preload the numeric stack and solve a template problem with each solver; print step timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-plot', action='store_true', help='Skip rendering the template plot')
+        parser.add_argument('--pool', action='store_true', help='Also start the offload pool workers')
+
+    def handle(self, *args, **options):
+        timings = warmup(plot=not options['no_plot'], pool=options['pool'])
+        failed = [name for name, seconds in timings.items() if seconds is None]
+        for name, seconds in timings.items():
+            shown = 'failed' if seconds is None else f'{seconds * 1000:8.1f} ms'
+            self.stdout.write(f'  {name:<20}{shown}')
+        if failed:
+            raise CommandError(f"warmup steps failed: {', '.join(failed)}")
@@ -0,0 +1,195 @@
+"""Per-stage timing: Server-Timing headers and Prometheus histograms.
+
+Wrap a stage with ``stage(name)``, either as a decorator or a context
+manager::
+
+    @stage('optimize')
+    def optimize_min_variance(...): ...
+
+    with stage('covariance'):
+        cov = daily.cov()
+
+With ``settings.TIMING_ENABLED = False`` (the default) a stage costs one flag
+check. When enabled, every duration goes into a process-wide histogram
+(served by ``/api/metrics`` in Prometheus text format) and, inside a request,
+is reported by ``ServerTimingMiddleware`` in the ``Server-Timing`` header.
+Histograms are per process; scrape each worker separately.
+"""
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = None
+# Durations recorded during the current request: list of (stage, seconds).
+_request_timings = ContextVar('request_timings', default=None)
+
+
+def enabled():
+    global _enabled
+    if _enabled is None:
+        _enabled = bool(getattr(settings, 'TIMING_ENABLED', False))
+    return _enabled
+
+
+@receiver(setting_changed)
+def _reset(setting, **kwargs):
+    global _enabled
+    if setting in ('TIMING_ENABLED', 'TIMING_BUCKETS'):
+        _enabled = None
+        REGISTRY.buckets = None
+
+
+class Histograms:
+    """Cumulative duration histograms keyed by stage name."""
+
+    def __init__(self):
+        self.buckets = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _bounds(self):
+        if self.buckets is None:
+            self.buckets = tuple(sorted(getattr(settings, 'TIMING_BUCKETS', DEFAULT_BUCKETS)))
+        return self.buckets
+
+    def observe(self, name, seconds):
+        bounds = self._bounds()
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None or len(entry[0]) != len(bounds):
+                entry = self._data[name] = [[0] * len(bounds), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(bounds):
+                if seconds <= bound:
+                    counts[i] += 1
+            entry[1] += 1
+            entry[2] += seconds
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def render(self):
+        bounds = self._bounds()
+        lines = [
+            '# HELP mpt_stage_duration_seconds Time spent in instrumented stages.',
+            '# TYPE mpt_stage_duration_seconds histogram',
+        ]
+        with self._lock:
+            items = sorted((name, list(e[0]), e[1], e[2]) for name, e in self._data.items())
+        for name, counts, count, total in items:
+            for bound, c in zip(bounds, counts):
+                lines.append(f'mpt_stage_duration_seconds_bucket{{stage="{name}",le="{bound:g}"}} {c}')
+            lines.append(f'mpt_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'mpt_stage_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'mpt_stage_duration_seconds_count{{stage="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Histograms()
+
+
+def observe(name, seconds):
+    """Record an externally measured duration (e.g. a solver's own timer)."""
+    if not enabled():
+        return
+    REGISTRY.observe(name, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+class stage:
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        if enabled():
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            observe(self.name, time.perf_counter() - self._start)
+            self._start = None
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not (_enabled if _enabled is not None else enabled()):
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+
+
+def server_timing(timings):
+    # Repeated stages (e.g. one solve per frontier point) are summed.
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in totals.items())
+
+
+class ServerTimingMiddleware:
+    """Adds a ``Server-Timing`` header listing the stages of each request."""
+
+    # Async-capable so async views under ASGI are not pushed onto a thread.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        token = _request_timings.set([])
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            timings = _request_timings.get()
+        finally:
+            _request_timings.reset(token)
+        return self._finish(response, timings, start)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        token = _request_timings.set([])
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            timings = _request_timings.get()
+        finally:
+            _request_timings.reset(token)
+        return self._finish(response, timings, start)
+
+    def _finish(self, response, timings, start):
+        total = time.perf_counter() - start
+        REGISTRY.observe('request', total)
+        timings.append(('total', total))
+        response['Server-Timing'] = server_timing(timings)
+        return response
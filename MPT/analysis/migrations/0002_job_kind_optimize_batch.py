@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('fetch_prices', 'Fetch prices'), ('optimize', 'Optimize'), ('optimize_batch', 'Batch optimize')], max_length=32),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0003_job_kind_backtest'),
+        ('portfolios', '0002_portfolio_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptimizationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('params', models.JSONField(default=dict)),
+                ('symbols', models.JSONField(default=list)),
+                ('weights', models.JSONField(default=list)),
+                ('expected_return', models.FloatField()),
+                ('volatility', models.FloatField()),
+                ('extra', models.JSONField(blank=True, default=dict)),
+                ('frontier_points', models.JSONField(blank=True, null=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('portfolio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolios.portfolio')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0004_optimizationresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolveLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('solver', models.CharField(max_length=32)),
+                ('profile', models.CharField(max_length=16)),
+                ('context', models.CharField(max_length=16)),
+                ('status', models.CharField(max_length=32)),
+                ('attempt', models.PositiveSmallIntegerField(default=0)),
+                ('n_assets', models.PositiveIntegerField()),
+                ('iterations', models.PositiveIntegerField(blank=True, null=True)),
+                ('setup_time', models.FloatField(blank=True, null=True)),
+                ('solve_time', models.FloatField(blank=True, null=True)),
+                ('wall_time', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,103 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
-# Create your models here.
+
+class Job(models.Model):
+    """A fetch or optimize request run by the `run_jobs` worker."""
+
+    KIND_FETCH_PRICES = 'fetch_prices'
+    KIND_OPTIMIZE = 'optimize'
+    KIND_OPTIMIZE_BATCH = 'optimize_batch'
+    KIND_BACKTEST = 'backtest'
+    KIND_CHOICES = [
+        (KIND_FETCH_PRICES, 'Fetch prices'),
+        (KIND_OPTIMIZE, 'Optimize'),
+        (KIND_OPTIMIZE_BATCH, 'Batch optimize'),
+        (KIND_BACKTEST, 'Backtest'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    IN_FLIGHT = (QUEUED, RUNNING)
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict)
+    # Hash of (kind, params); at most one queued/running job per key.
+    dedup_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.FloatField(default=0.0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by the worker while the job runs; see analysis.jobs.expire_stale.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'], condition=Q(status__in=['queued', 'running']),
+                                    name='unique_in_flight_job'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class OptimizationResult(models.Model):
+    """A memoized optimize result; see analysis.result_cache."""
+
+    # Hash of the normalized request and the prices_version of its stocks.
+    key = models.CharField(max_length=64, unique=True)
+    params = models.JSONField(default=dict)
+    symbols = models.JSONField(default=list)
+    weights = models.JSONField(default=list)
+    expected_return = models.FloatField()
+    volatility = models.FloatField()
+    # Optional response fields, e.g. tangency_weights.
+    extra = models.JSONField(default=dict, blank=True)
+    frontier_points = models.JSONField(null=True, blank=True)
+    portfolio = models.ForeignKey('portfolios.Portfolio', null=True, blank=True, on_delete=models.SET_NULL,
+                                  related_name='+')
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{'+'.join(self.symbols)} ({self.key[:12]})"
+
+
+class SolveLog(models.Model):
+    """One cvxpy solver attempt; see analysis.solvers."""
+
+    solver = models.CharField(max_length=32)
+    profile = models.CharField(max_length=16)
+    # 'optimize' or 'frontier'.
+    context = models.CharField(max_length=16)
+    status = models.CharField(max_length=32)
+    # 0 for the first solver tried, 1 for the first fallback, ...
+    attempt = models.PositiveSmallIntegerField(default=0)
+    n_assets = models.PositiveIntegerField()
+    iterations = models.PositiveIntegerField(null=True, blank=True)
+    setup_time = models.FloatField(null=True, blank=True)
+    solve_time = models.FloatField(null=True, blank=True)
+    wall_time = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.solver} {self.status} n={self.n_assets}"
@@ -0,0 +1,198 @@
+"""Random-portfolio (Monte Carlo) cloud with bounded memory.
+
+Weights are drawn in chunks whose size depends only on the number of assets
+(``MONTE_CARLO_CHUNK_BYTES``). Each chunk is scored with one matmul against
+the covariance and folded into a ``CloudAccumulator``, which keeps running
+statistics, a fixed 2-D histogram and a fixed-size uniform sample of points
+for plotting. Peak memory is therefore the same for 10k or 10M samples.
+
+Long-only weights are Dirichlet(alpha). Long/short weights are
+``(1 + s) * a - s * b`` with ``a``, ``b`` Dirichlet and the short fraction
+``s`` uniform on ``[0, max_short]``, so they still sum to one and the gross
+exposure is at most ``1 + 2 * max_short``.
+
+With ``workers > 1`` the samples are split into shards with independent
+``SeedSequence`` streams and run on the shared frontier process pool; the
+shard accumulators are merged in the parent.
+"""
+import numpy as np
+from django.conf import settings
+
+from .factor_model import FactorCovariance
+
+
+def chunk_rows(n_assets):
+    budget = getattr(settings, 'MONTE_CARLO_CHUNK_BYTES', 32 * 1024 * 1024)
+    # Weight chunk, its product with the covariance and (long/short) the
+    # second Dirichlet draw dominate memory.
+    return max(1, min(100_000, budget // (24 * max(n_assets, 1))))
+
+
+def cloud_bounds(mu, cov, allow_short=False, max_short=0.5):
+    """Return/volatility ranges that contain every possible sample."""
+    mu = np.asarray(mu, dtype=float)
+    diag = cov.diagonal() if isinstance(cov, FactorCovariance) else np.diag(np.asarray(cov))
+    max_sd = float(np.sqrt(np.max(diag)))
+    lo, hi = float(mu.min()), float(mu.max())
+    if not allow_short:
+        return (lo, hi), (0.0, max_sd)
+    s = float(max_short)
+    return ((1 + s) * lo - s * hi, (1 + s) * hi - s * lo), (0.0, (1 + 2 * s) * max_sd)
+
+
+def draw_weights(rng, m, n, allow_short=False, alpha=1.0, max_short=0.5):
+    w = rng.standard_gamma(alpha, size=(m, n))
+    w /= w.sum(axis=1, keepdims=True)
+    if not allow_short:
+        return w
+    b = rng.standard_gamma(alpha, size=(m, n))
+    b /= b.sum(axis=1, keepdims=True)
+    s = rng.uniform(0.0, max_short, size=(m, 1))
+    w *= 1 + s
+    w -= s * b
+    return w
+
+
+def score(weights, mu, cov):
+    """(returns, volatilities) of a chunk of weight rows."""
+    rets = weights @ mu
+    var = np.einsum('ij,ij->i', weights @ cov, weights)
+    return rets, np.sqrt(np.maximum(var, 0.0))
+
+
+class CloudAccumulator:
+    def __init__(self, ret_range, vol_range, bins=60, keep=2000, risk_free=0.0):
+        self.ret_edges = np.linspace(ret_range[0], ret_range[1] + 1e-12, bins + 1)
+        self.vol_edges = np.linspace(vol_range[0], vol_range[1] + 1e-12, bins + 1)
+        self.hist = np.zeros((bins, bins), dtype=np.int64)
+        self.keep = int(keep)
+        self.risk_free = float(risk_free)
+        self.count = 0
+        self.ret_sum = self.vol_sum = 0.0
+        self.min_vol = (np.inf, None, None)  # (vol, ret, weights)
+        self.max_sharpe = (-np.inf, None, None, None)  # (sharpe, ret, vol, weights)
+        # Uniform sample: keep the points with the smallest random keys.
+        self._keys = np.empty(0)
+        self._rets = np.empty(0)
+        self._vols = np.empty(0)
+
+    def update(self, weights, rets, vols, rng):
+        self.count += len(rets)
+        self.ret_sum += float(rets.sum())
+        self.vol_sum += float(vols.sum())
+        hist, _, _ = np.histogram2d(rets, vols, bins=(self.ret_edges, self.vol_edges))
+        self.hist += hist.astype(np.int64)
+
+        i = int(np.argmin(vols))
+        if vols[i] < self.min_vol[0]:
+            self.min_vol = (float(vols[i]), float(rets[i]), weights[i].copy())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(vols > 0, (rets - self.risk_free) / vols, -np.inf)
+        j = int(np.argmax(sharpe))
+        if sharpe[j] > self.max_sharpe[0]:
+            self.max_sharpe = (float(sharpe[j]), float(rets[j]), float(vols[j]), weights[j].copy())
+
+        self._add_sample(rng.random(len(rets)), rets, vols)
+
+    def _add_sample(self, keys, rets, vols):
+        keys = np.concatenate([self._keys, keys])
+        rets = np.concatenate([self._rets, rets])
+        vols = np.concatenate([self._vols, vols])
+        if len(keys) > self.keep:
+            idx = np.argpartition(keys, self.keep - 1)[:self.keep]
+            keys, rets, vols = keys[idx], rets[idx], vols[idx]
+        self._keys, self._rets, self._vols = keys, rets, vols
+
+    def merge(self, other):
+        self.count += other.count
+        self.ret_sum += other.ret_sum
+        self.vol_sum += other.vol_sum
+        self.hist += other.hist
+        if other.min_vol[0] < self.min_vol[0]:
+            self.min_vol = other.min_vol
+        if other.max_sharpe[0] > self.max_sharpe[0]:
+            self.max_sharpe = other.max_sharpe
+        self._add_sample(other._keys, other._rets, other._vols)
+        return self
+
+    def result(self):
+        order = np.argsort(self._keys)
+        out = {
+            'samples': self.count,
+            'mean_return': self.ret_sum / self.count if self.count else None,
+            'mean_volatility': self.vol_sum / self.count if self.count else None,
+            'points': {'returns': self._rets[order].tolist(), 'volatilities': self._vols[order].tolist()},
+            'histogram': {'counts': self.hist.tolist(), 'return_edges': self.ret_edges.tolist(),
+                          'volatility_edges': self.vol_edges.tolist()},
+        }
+        if self.min_vol[2] is not None:
+            out['min_volatility'] = {'volatility': self.min_vol[0], 'return': self.min_vol[1],
+                                     'weights': self.min_vol[2].tolist()}
+        if self.max_sharpe[3] is not None:
+            out['max_sharpe'] = {'sharpe': self.max_sharpe[0], 'return': self.max_sharpe[1],
+                                 'volatility': self.max_sharpe[2], 'weights': self.max_sharpe[3].tolist()}
+        return out
+
+
+def _run_shard(mu, cov, n_samples, seed, bounds, options):
+    rng = np.random.default_rng(seed)
+    acc = CloudAccumulator(*bounds, bins=options['bins'], keep=options['keep'], risk_free=options['risk_free'])
+    rows = chunk_rows(len(mu))
+    done = 0
+    while done < n_samples:
+        m = min(rows, n_samples - done)
+        w = draw_weights(rng, m, len(mu), options['allow_short'], options['alpha'], options['max_short'])
+        rets, vols = score(w, mu, cov)
+        acc.update(w, rets, vols, rng)
+        done += m
+    return acc
+
+
+def _shard_task(cov_ref, n, n_samples, seed, bounds, options):
+    # cov_ref is a shared-memory block name (dense) or a FactorCovariance.
+    if isinstance(cov_ref, str):
+        from .parallel import call_attached
+        return call_attached(cov_ref, n, _run_shard, n_samples, seed, bounds, options)
+    mu, cov = cov_ref
+    return _run_shard(mu, cov, n_samples, seed, bounds, options)
+
+
+def simulate_portfolios(mu, cov, n_samples=100_000, allow_short=False, alpha=1.0, max_short=0.5,
+                        bins=60, keep=2000, risk_free=0.0, seed=None, workers=1):
+    """Score ``n_samples`` random portfolios and summarize the cloud.
+
+    Returns a dict with the sample count, mean return/volatility, the
+    lowest-volatility and highest-Sharpe samples, a ``bins`` x ``bins``
+    return/volatility histogram and a uniform sample of ``keep`` points.
+    """
+    mu = np.asarray(mu, dtype=float).reshape(-1)
+    if not isinstance(cov, FactorCovariance):
+        cov = np.asarray(cov, dtype=float)
+    n_samples = int(n_samples)
+    if n_samples < 1:
+        raise ValueError('n_samples must be positive')
+    bounds = cloud_bounds(mu, cov, allow_short, max_short)
+    options = {'allow_short': allow_short, 'alpha': float(alpha), 'max_short': float(max_short),
+               'bins': int(bins), 'keep': int(keep), 'risk_free': float(risk_free)}
+    seeds = np.random.SeedSequence(seed).spawn(max(1, int(workers)))
+    if len(seeds) == 1:
+        return _run_shard(mu, cov, n_samples, seeds[0], bounds, options).result()
+
+    from .parallel import get_pool, worker_budget, SharedArrays
+    shards = min(len(seeds), worker_budget())
+    counts = [n_samples // shards + (i < n_samples % shards) for i in range(shards)]
+    pool = get_pool()
+    if isinstance(cov, FactorCovariance):
+        # Already O(n k): pickling it per shard is cheap.
+        futures = [pool.submit(_shard_task, (mu, cov), len(mu), c, s, bounds, options)
+                   for c, s in zip(counts, seeds) if c]
+        accs = [f.result() for f in futures]
+    else:
+        with SharedArrays(mu, cov) as shared:
+            futures = [pool.submit(_shard_task, shared.name, shared.n, c, s, bounds, options)
+                       for c, s in zip(counts, seeds) if c]
+            accs = [f.result() for f in futures]
+    total = accs[0]
+    for acc in accs[1:]:
+        total.merge(acc)
+    return total.result()
@@ -0,0 +1,137 @@
+"""Bounded process pool for the CPU-heavy stages of async views.
+
+Async views await ``run(fn, *args)``; the call runs on a process pool of
+``OFFLOAD_POOL_SIZE`` workers, so the event loop keeps serving other
+requests. At most ``OFFLOAD_POOL_SIZE + OFFLOAD_QUEUE_SIZE`` calls are
+accepted at once; beyond that ``run`` raises ``PoolBusy`` straight away and
+the view answers 429. A call whose request is cancelled before a worker
+picked it up is dropped; one already running finishes and still holds its
+slot until then. If a worker dies (e.g. killed for running out of memory)
+the executor is unusable: calls on it raise ``PoolBroken`` (503) and the next
+call starts a fresh pool.
+
+Workers are started with ``OFFLOAD_POOL_START_METHOD`` ('spawn' by default,
+which is safe in a threaded ASGI server) and set Django up themselves. Solve
+log entries recorded in a worker are returned with the result and written by
+the parent.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import solvers
+from .metrics import stage
+
+
+class PoolBusy(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+class PoolBroken(Exception):
+    """A worker process died; the pool is replaced on the next call."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+# True in pool workers, so a startup warmup there does not start a pool of its own.
+_worker = False
+
+
+def pool_size():
+    return getattr(settings, 'OFFLOAD_POOL_SIZE', None) or os.cpu_count() or 1
+
+
+def capacity():
+    return pool_size() + getattr(settings, 'OFFLOAD_QUEUE_SIZE', 8)
+
+
+def in_flight():
+    return _in_flight
+
+
+def in_worker():
+    return _worker
+
+
+def _init_worker():
+    global _worker
+    _worker = True
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    solvers.hold()
+
+
+def _call(fn, args):
+    return fn(*args), solvers.drain()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                context = multiprocessing.get_context(getattr(settings, 'OFFLOAD_POOL_START_METHOD', 'spawn'))
+                _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=context, initializer=_init_worker)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _discard(pool):
+    # Drop a broken pool so get_pool() builds a new one.
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _release(future):
+    global _in_flight
+    with _pool_lock:
+        _in_flight -= 1
+
+
+async def run(fn, *args):
+    """Run ``fn(*args)`` on the pool; raise PoolBusy when it is saturated."""
+    global _in_flight
+    with _pool_lock:
+        if _in_flight >= capacity():
+            raise PoolBusy()
+        _in_flight += 1
+    pool = get_pool()
+    try:
+        future = pool.submit(_call, fn, args)
+    except BaseException as e:
+        _release(None)
+        if isinstance(e, BrokenProcessPool):
+            _discard(pool)
+            raise PoolBroken() from e
+        raise
+    # The slot is freed when the work ends, not when the caller stops waiting.
+    future.add_done_callback(_release)
+    try:
+        with stage('offload'):
+            result, log = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BrokenProcessPool as e:
+        _discard(pool)
+        raise PoolBroken() from e
+    solvers.extend(log)
+    return result
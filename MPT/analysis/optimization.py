@@ -0,0 +1,495 @@
+"""Optimize request handling shared by the API views and the job worker."""
+import os
+from datetime import date
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import offload, result_cache
+from .params import OptimizationError, flag, number
+from .services import optimize_min_variance, subset_cov, aprice_source, COV_MODELS, default_n_factors
+from .estimates import (Estimates, get_estimates, get_estimate_cache, estimate_key, build_estimates, store_estimates,
+                        astock_versions)
+
+FRONTIER_POINTS = 40
+
+
+def parse_symbols(symbols):
+    if not symbols:
+        raise OptimizationError('symbols required')
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    return [s.strip().upper() for s in symbols if s.strip()]
+
+
+def cov_options(params):
+    """Validated (cov_model, n_factors) from a request payload."""
+    cov_model = params.get('cov_model') or 'sample'
+    if cov_model not in COV_MODELS:
+        raise OptimizationError(f"cov_model must be one of: {', '.join(COV_MODELS)}")
+    n_factors = params.get('n_factors')
+    if n_factors is not None:
+        try:
+            n_factors = int(n_factors)
+        except (TypeError, ValueError):
+            n_factors = 0
+        if n_factors < 1:
+            raise OptimizationError('n_factors must be a positive integer')
+    return cov_model, n_factors
+
+
+def plot_option(params):
+    """True, False or 'points' from ``params['plot']`` (default True)."""
+    if params.get('plot') == 'points':
+        return 'points'
+    return flag(params, 'plot', True)
+
+
+def parse_points(params):
+    try:
+        return min(max(int(params.get('points') or FRONTIER_POINTS), 2), 200)
+    except (TypeError, ValueError):
+        raise OptimizationError('points must be a number')
+
+
+def parse_seed(params):
+    seed = params.get('seed')
+    if seed is None or seed == '':
+        return None
+    if isinstance(seed, str) and seed.strip().isdigit():
+        seed = int(seed)
+    if isinstance(seed, bool) or not isinstance(seed, int) or seed < 0:
+        raise OptimizationError('seed must be a non-negative integer')
+    return seed
+
+
+def simulate_cloud(est, params, workers=None):
+    """Random-portfolio cloud for ``params['monte_carlo']`` samples."""
+    from .montecarlo import simulate_portfolios
+    try:
+        n_samples = int(params['monte_carlo'])
+    except (TypeError, ValueError):
+        raise OptimizationError('monte_carlo must be a number of samples')
+    limit = getattr(settings, 'MONTE_CARLO_MAX_SAMPLES', 5_000_000)
+    if not 0 < n_samples <= limit:
+        raise OptimizationError(f'monte_carlo must be between 1 and {limit}')
+    seed = parse_seed(params)
+    if workers is None:
+        workers = getattr(settings, 'MONTE_CARLO_WORKERS', 1)
+    return simulate_portfolios(est.mu, est.cov, n_samples, allow_short=flag(params, 'allow_short'),
+                               risk_free=number(params, 'risk_free') or 0.0, seed=seed,
+                               workers=workers if n_samples >= 1_000_000 else 1)
+
+
+def optimal_portfolio(est, target=None, allow_short=False, risk_free=None):
+    weights = optimize_min_variance(est.mu, est.cov, target_return=target, allow_short=allow_short)
+    weights = weights / weights.sum()
+
+    result = {'symbols': list(est.symbols), 'weights': [float(w) for w in weights],
+              'expected_return': float((weights @ est.mu)),
+              'volatility': float(np.sqrt(max(weights @ est.cov @ weights, 0.0)))}
+
+    if allow_short and risk_free is not None:
+        from .closed_form import ClosedFormFrontier
+        try:
+            tangency = ClosedFormFrontier(est.mu, est.cov).tangency(float(risk_free))
+        except ValueError as e:
+            raise OptimizationError(str(e))
+        result['tangency_weights'] = [float(w) for w in tangency]
+    return result
+
+
+def solve_frontier(est, allow_short=False, engine=None, n_points=FRONTIER_POINTS):
+    # Lazy import plotting helpers so that matplotlib is only required when plotting
+    from .plotting import efficient_frontier, frontier_points
+    try:
+        rets, vols, _ = efficient_frontier(est.mu, est.cov, n_points=n_points, allow_short=allow_short, engine=engine)
+    except ValueError as e:
+        raise OptimizationError(str(e))
+    return frontier_points(rets, vols)
+
+
+def add_frontier(result, make_plot, points, cloud=None):
+    if make_plot == 'points':
+        # Let the client draw the curve instead of rendering a PNG.
+        result['frontier_points'] = points
+    else:
+        from .plotting import plot_frontier
+        filename = plot_frontier([p['return'] for p in points], [p['volatility'] for p in points], cloud=cloud)
+        result['frontier_plot'] = os.path.basename(filename)
+
+
+def cached_result(entry):
+    return {'symbols': entry.symbols, 'weights': entry.weights, 'expected_return': entry.expected_return,
+            'volatility': entry.volatility, **entry.extra, 'cached': True}
+
+
+def run_optimization(params, progress=None):
+    """Run one optimize request described by the API payload ``params``.
+
+    ``progress``, if given, is called with (fraction, message) as stages finish.
+    Results are memoized in analysis.result_cache unless a Monte Carlo cloud
+    is requested; the response then carries ``"cached": true``.
+    """
+    syms = parse_symbols(params.get('symbols'))
+    start = params.get('start')
+    end = params.get('end')
+    target = number(params, 'target')
+    make_plot = plot_option(params)
+    allow_short = flag(params, 'allow_short')
+    risk_free = number(params, 'risk_free')
+    engine = params.get('frontier_engine')
+
+    cov_model, n_factors = cov_options(params)
+    if cov_model == 'factor':
+        n_factors = n_factors or default_n_factors()
+
+    entry = key = normalized = None
+    if result_cache.enabled() and not params.get('monte_carlo'):
+        normalized = result_cache.normalize(syms, params, cov_model, n_factors)
+        key = result_cache.result_key(normalized)
+        entry = result_cache.lookup(key)
+
+    est = None
+
+    def estimates():
+        nonlocal est
+        if est is None:
+            est = get_estimates(syms, start, end, cov_model=cov_model, n_factors=n_factors)
+            if est is None:
+                raise OptimizationError('no price data for given symbols/dates')
+            if progress:
+                progress(0.2, 'estimates ready')
+        return est
+
+    if entry is not None:
+        result = cached_result(entry)
+    else:
+        result = optimal_portfolio(estimates(), target, allow_short, risk_free)
+    if progress:
+        progress(0.4, 'portfolio optimized')
+
+    portfolio = entry.portfolio if entry is not None else None
+    if flag(params, 'save'):
+        name = params.get('name')
+        # A cached result's portfolio is reused unless another name was asked for.
+        if portfolio is None or (name and name != portfolio.name):
+            from portfolios.services import save_portfolios
+            name = name or f"Opt {'+'.join(result['symbols'])} {date.today().isoformat()}"
+            portfolio, = save_portfolios([{'name': name, 'target_return': target, 'symbols': result['symbols'],
+                                           'weights': result['weights']}])
+        result['portfolio_id'] = portfolio.pk
+
+    cloud = None
+    if params.get('monte_carlo'):
+        result['monte_carlo'] = simulate_cloud(estimates(), params)
+        cloud = result['monte_carlo']['points']
+        if progress:
+            progress(0.6, 'random portfolios simulated')
+
+    points = entry.frontier_points if entry is not None else None
+    if make_plot:
+        if points is None:
+            points = solve_frontier(estimates(), allow_short, engine)
+            if progress:
+                progress(0.8, 'frontier solved')
+        add_frontier(result, make_plot, points, cloud)
+
+    if key is not None and (entry is None or (points is not None and entry.frontier_points is None)
+                            or portfolio != entry.portfolio):
+        result_cache.store(key, normalized, result, frontier_points=points, portfolio=portfolio)
+
+    return result
+
+
+def stream_optimization(params):
+    """Yield an optimize request as a sequence of events.
+
+    The optimal portfolio comes first (``{"event": "portfolio", ...}``), then
+    one ``{"event": "point", "index", "return", "volatility"}`` per frontier
+    point as it is solved and finally ``{"event": "done", "points": n}``.
+    Request errors raise OptimizationError before the first event; a frontier
+    failure afterwards is reported as ``{"event": "error", "detail"}``.
+    Closing the generator stops the frontier sweep; only a complete sweep is
+    written to the result cache. ``save``, ``monte_carlo`` and a rendered
+    ``plot`` are not supported here.
+    """
+    if flag(params, 'save') or params.get('monte_carlo') or plot_option(params) not in (True, 'points'):
+        raise OptimizationError('save, monte_carlo and plot are not supported when streaming; use /api/optimize/')
+    syms = parse_symbols(params.get('symbols'))
+    start = params.get('start')
+    end = params.get('end')
+    allow_short = flag(params, 'allow_short')
+    engine = params.get('frontier_engine')
+    n_points = parse_points(params)
+
+    cov_model, n_factors = cov_options(params)
+    if cov_model == 'factor':
+        n_factors = n_factors or default_n_factors()
+
+    entry = key = normalized = None
+    if result_cache.enabled():
+        normalized = result_cache.normalize(syms, params, cov_model, n_factors)
+        key = result_cache.result_key(normalized)
+        entry = result_cache.lookup(key)
+
+    est = None
+    if entry is not None:
+        result = cached_result(entry)
+    else:
+        est = get_estimates(syms, start, end, cov_model=cov_model, n_factors=n_factors)
+        if est is None:
+            raise OptimizationError('no price data for given symbols/dates')
+        result = optimal_portfolio(est, number(params, 'target'), allow_short, number(params, 'risk_free'))
+    yield {'event': 'portfolio', **result}
+
+    # The cache holds the default grid only.
+    if n_points != FRONTIER_POINTS:
+        key = None
+    points = entry.frontier_points if entry is not None and key is not None else None
+    if points is not None:
+        for i, p in enumerate(points):
+            yield {'event': 'point', 'index': i, **p}
+    else:
+        from .frontier import iter_frontier
+        from .plotting import frontier_targets, portfolio_return, portfolio_vol
+        if est is None:
+            est = get_estimates(syms, start, end, cov_model=cov_model, n_factors=n_factors)
+        points = []
+        try:
+            for w in iter_frontier(est.mu, est.cov, frontier_targets(est.mu, n_points), allow_short, engine):
+                if w is None:
+                    continue
+                point = {'volatility': float(portfolio_vol(w, est.cov)), 'return': portfolio_return(w, est.mu)}
+                yield {'event': 'point', 'index': len(points), **point}
+                points.append(point)
+        except ValueError as e:
+            yield {'event': 'error', 'detail': str(e)}
+            return
+        if key is not None:
+            result_cache.store(key, normalized, result, frontier_points=points,
+                               portfolio=entry.portfolio if entry is not None else None)
+    yield {'event': 'done', 'points': len(points)}
+
+
+def _worker_estimates(source, cov_model, n_factors):
+    # Estimates handed over by the parent, or built here from a price source.
+    # Returns (estimates, newly built estimates or None).
+    if source is None or isinstance(source, Estimates):
+        return source, None
+    from .services import price_df_from_source
+    est = build_estimates(price_df_from_source(source), cov_model, n_factors)
+    if est is None:
+        raise OptimizationError('no price data for given symbols/dates')
+    return est, est
+
+
+def optimize_task(source, params, cov_model, n_factors, result=None, points=None):
+    """Numeric stages of an async optimize request; runs in an offload worker.
+
+    Returns (result, frontier points, newly built estimates or None).
+    """
+    est, built = _worker_estimates(source, cov_model, n_factors)
+    allow_short = flag(params, 'allow_short')
+    make_plot = plot_option(params)
+    if result is None:
+        result = optimal_portfolio(est, number(params, 'target'), allow_short, number(params, 'risk_free'))
+    cloud = None
+    if params.get('monte_carlo'):
+        # Already in a worker process: don't fan out to the frontier pool.
+        result['monte_carlo'] = simulate_cloud(est, params, workers=1)
+        cloud = result['monte_carlo']['points']
+    if make_plot:
+        if points is None:
+            points = solve_frontier(est, allow_short, params.get('frontier_engine'))
+        add_frontier(result, make_plot, points, cloud)
+    return result, points, built
+
+
+def frontier_task(source, params, cov_model, n_factors):
+    """Frontier points for an async frontier request; runs in an offload worker."""
+    est, built = _worker_estimates(source, cov_model, n_factors)
+    points = solve_frontier(est, flag(params, 'allow_short'), params.get('frontier_engine'),
+                            parse_points(params))
+    return {'symbols': list(est.symbols), 'frontier_points': points}, built
+
+
+async def _estimate_source(syms, params, versions, cov_model, n_factors):
+    # Cached estimates, or the price source a worker builds them from, and
+    # the estimate cache key.
+    start, end = params.get('start'), params.get('end')
+    key = estimate_key(syms, start, end, versions, cov_model, n_factors)
+    est = await sync_to_async(get_estimate_cache().get)(key)
+    if est is not None:
+        return est, key
+    source = await aprice_source(sorted(set(syms)), start, end)
+    if source[0] == 'rows' and not source[1]:
+        raise OptimizationError('no price data for given symbols/dates')
+    return source, key
+
+
+def _request_options(params):
+    syms = parse_symbols(params.get('symbols'))
+    cov_model, n_factors = cov_options(params)
+    if cov_model == 'factor':
+        n_factors = n_factors or default_n_factors()
+    else:
+        n_factors = None
+    return syms, cov_model, n_factors
+
+
+async def arun_optimization(params):
+    """Async counterpart of run_optimization for the async views.
+
+    Database reads use the async ORM and the numeric stages run on the
+    offload pool (``offload.PoolBusy`` when it is saturated), so the event
+    loop is never blocked. ``save`` is not supported.
+    """
+    if flag(params, 'save'):
+        raise OptimizationError('save is not supported here; use /api/optimize/')
+    syms, cov_model, n_factors = _request_options(params)
+    make_plot = plot_option(params)
+    versions = await astock_versions(syms)
+
+    entry = key = normalized = None
+    if result_cache.enabled() and not params.get('monte_carlo'):
+        normalized = result_cache.normalize(syms, params, cov_model, n_factors)
+        key = result_cache.result_key(normalized, versions)
+        entry = await result_cache.alookup(key)
+
+    result = points = None
+    if entry is not None:
+        result = cached_result(entry)
+        points = entry.frontier_points
+        if not make_plot or (make_plot == 'points' and points is not None):
+            if make_plot:
+                add_frontier(result, make_plot, points)
+            return result
+
+    source = est_key = None
+    if result is None or points is None:
+        source, est_key = await _estimate_source(syms, params, versions, cov_model, n_factors)
+    result, points, built = await offload.run(optimize_task, source, params, cov_model, n_factors, result, points)
+    if built is not None:
+        await sync_to_async(store_estimates)(est_key, built)
+
+    if key is not None and (entry is None or (points is not None and entry.frontier_points is None)):
+        def store():
+            result_cache.store(key, normalized, result, frontier_points=points,
+                               portfolio=entry.portfolio if entry is not None else None)
+        await sync_to_async(store)()
+    return result
+
+
+async def arun_frontier(params):
+    """Frontier points (``points``, default 40) for a universe, computed off the event loop."""
+    syms, cov_model, n_factors = _request_options(params)
+    parse_points(params)
+    versions = await astock_versions(syms)
+    source, est_key = await _estimate_source(syms, params, versions, cov_model, n_factors)
+    result, built = await offload.run(frontier_task, source, params, cov_model, n_factors)
+    if built is not None:
+        await sync_to_async(store_estimates)(est_key, built)
+    return result
+
+
+def _solve_batch_job(est, job):
+    # A repeated ticker would make the sub-covariance singular.
+    syms = list(dict.fromkeys(parse_symbols(job.get('symbols')))) if job.get('symbols') else list(est.symbols)
+    positions = {s: i for i, s in enumerate(est.symbols)}
+    missing = [s for s in syms if s not in positions]
+    if missing:
+        raise OptimizationError(f"no price data for {', '.join(missing)}")
+    # Sub-universe estimates are slices of the union's mean and covariance.
+    idx = np.array([positions[s] for s in syms])
+    mu = est.mu[idx]
+    cov = subset_cov(est.cov, idx)
+    target = number(job, 'target')
+    allow_short = flag(job, 'allow_short')
+    weights = optimize_min_variance(mu, cov, target_return=target, allow_short=allow_short)
+    weights = weights / weights.sum()
+    return {
+        'symbols': syms,
+        'weights': [float(w) for w in weights],
+        'expected_return': float(weights @ mu),
+        'volatility': float(np.sqrt(weights @ cov @ weights)),
+        'target': target,
+        'allow_short': allow_short,
+    }
+
+
+def run_batch_optimization(params, progress=None):
+    """Solve many optimize variants against one loaded universe.
+
+    ``params``: ``start``, ``end``, optional ``universe`` and a ``jobs`` list
+    of ``{name, symbols, target, allow_short}``; a job without symbols uses
+    the whole universe. With ``save`` the results are persisted as
+    portfolios in one bulk write.
+    """
+    jobs = params.get('jobs') or []
+    if not jobs:
+        raise OptimizationError('jobs required')
+    universe = set(parse_symbols(params['universe'])) if params.get('universe') else set()
+    for job in jobs:
+        if job.get('symbols'):
+            universe.update(parse_symbols(job['symbols']))
+    if not universe:
+        raise OptimizationError('symbols required')
+
+    cov_model, n_factors = cov_options(params)
+
+    est = get_estimates(sorted(universe), params.get('start'), params.get('end'), cov_model=cov_model, n_factors=n_factors)
+    if est is None:
+        raise OptimizationError('no price data for given symbols/dates')
+    if progress:
+        progress(0.2, 'estimates ready')
+
+    # Solved one after another: the cvxpy and NumPy solves hold the GIL, so
+    # threads would only contend for it.
+    results = []
+    for job in jobs:
+        try:
+            results.append(_solve_batch_job(est, job))
+        except Exception as e:
+            results.append({'error': str(e)})
+        if progress:
+            progress(0.2 + 0.7 * len(results) / len(jobs), f'solved {len(results)}/{len(jobs)} jobs')
+    for i, (job, res) in enumerate(zip(jobs, results)):
+        res['name'] = job.get('name') or f'Batch {i + 1}'
+
+    if flag(params, 'save'):
+        from portfolios.services import save_portfolios
+        ok = [r for r in results if 'error' not in r]
+        saved = save_portfolios({
+            'name': f"{r['name']} {date.today().isoformat()}",
+            'target_return': r['target'],
+            'symbols': r['symbols'],
+            'weights': r['weights'],
+        } for r in ok)
+        for r, p in zip(ok, saved):
+            r['portfolio_id'] = p.pk
+
+    return {'symbols': list(est.symbols), 'results': results}
+
+
+def run_backtest_request(params, progress=None):
+    """Run a walk-forward backtest described by the API payload ``params``."""
+    from .backtest import run_backtest
+
+    syms = parse_symbols(params.get('symbols'))
+    options = {k: params[k] for k in ('lookback', 'rebalance', 'window', 'cost_bps', 'min_history')
+               if params.get(k) is not None}
+    target = number(params, 'target')
+    if target is not None:
+        options['target'] = target
+    try:
+        result = run_backtest(syms, params.get('start'), params.get('end'),
+                              allow_short=flag(params, 'allow_short'), **options)
+    except (TypeError, ValueError) as e:
+        raise OptimizationError(str(e))
+    if result is None:
+        raise OptimizationError('no price data for given symbols/dates')
+    if progress:
+        progress(1.0, 'backtest finished')
+    return result
@@ -0,0 +1,13 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class PortfolioCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id): each page is one indexed range scan."""
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        self.page_size = getattr(settings, 'PORTFOLIO_PAGE_SIZE', 50)
+        return super().get_page_size(request)
@@ -0,0 +1,134 @@
+"""Process-pool frontier engine.
+
+``mu`` and ``cov`` are copied once into a shared-memory block; tasks only carry
+the block name and their slice of the target grid, so the arrays are never
+pickled per task. Workers attach to the block for the length of a task, build
+one parametric problem for their contiguous chunk of targets and solve it
+warm-started.
+
+The pool is shared by the whole process (``FRONTIER_POOL_SIZE`` workers) and a
+single request never occupies more than ``FRONTIER_MAX_WORKERS_PER_REQUEST``
+of them, so one huge frontier cannot starve concurrent requests.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from . import solvers
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_size():
+    return getattr(settings, 'FRONTIER_POOL_SIZE', None) or os.cpu_count() or 1
+
+
+def worker_budget():
+    return max(1, min(getattr(settings, 'FRONTIER_MAX_WORKERS_PER_REQUEST', 4), pool_size()))
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                context = multiprocessing.get_context(getattr(settings, 'FRONTIER_POOL_START_METHOD', None))
+                _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=context)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+class SharedArrays:
+    """mu and cov packed into one shared-memory block: [mu (n) | cov (n*n)]."""
+
+    def __init__(self, mu, cov):
+        mu = np.asarray(mu, dtype=np.float64).reshape(-1)
+        cov = np.asarray(cov, dtype=np.float64)
+        self.n = len(mu)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(8, 8 * (self.n + self.n * self.n)))
+        buf = np.ndarray((self.n + self.n * self.n,), dtype=np.float64, buffer=self.shm.buf)
+        buf[:self.n] = mu
+        buf[self.n:] = cov.reshape(-1)
+        del buf
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def call_attached(name, n, fn, *args):
+    """Worker side: call ``fn(mu, cov, *args)`` on the arrays of block ``name``.
+
+    The block is detached as soon as ``fn`` returns. Block names are unique
+    per request, so keeping them mapped would never be reused and would pin
+    blocks the parent has already unlinked. ``fn`` must not return views of
+    ``mu`` or ``cov``.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        buf = np.ndarray((n + n * n,), dtype=np.float64, buffer=shm.buf)
+        mu, cov = buf[:n], buf[n:].reshape(n, n)
+        del buf
+        return fn(mu, cov, *args)
+    finally:
+        mu = cov = None
+        try:
+            shm.close()
+        except BufferError:
+            # A traceback still holds the arrays; the mapping is released with it.
+            pass
+
+
+def _solve_chunk(name, n, targets, allow_short):
+    solvers.hold()
+    weights = call_attached(name, n, _solve_targets, targets, allow_short)
+    # The parent writes this worker's solve log entries.
+    return weights, solvers.drain()
+
+
+def _solve_targets(mu, cov, targets, allow_short):
+    from .frontier import parametric_frontier
+    # Copy out of shared memory before handing the arrays to cvxpy, which
+    # keeps references to its constants after the block is detached.
+    return parametric_frontier(mu.copy(), cov.copy(), targets, allow_short=allow_short)
+
+
+def parallel_frontier(mu, cov, targets, allow_short=False, max_workers=None):
+    targets = [float(t) for t in targets]
+    if not targets:
+        return []
+    workers = min(max_workers or worker_budget(), worker_budget(), len(targets))
+    chunks = [c.tolist() for c in np.array_split(np.array(targets), workers)]
+    pool = get_pool()
+    with SharedArrays(mu, cov) as shared:
+        futures = [pool.submit(_solve_chunk, shared.name, shared.n, chunk, allow_short) for chunk in chunks]
+        results = []
+        for future in futures:
+            weights, log = future.result()
+            results.extend(weights)
+            solvers.extend(log)
+    return results
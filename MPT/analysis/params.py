@@ -0,0 +1,54 @@
+"""Parsing of request values shared by the views, the job worker and
+analysis.optimization. Kept free of numpy/pandas so the URLconf can import it.
+
+JSON bodies carry real booleans, but form posts, query strings and command
+kwargs send strings, where ``bool('false')`` is True.
+"""
+
+import math
+
+TRUE_STRINGS = ('true', '1', 'yes', 'on')
+FALSE_STRINGS = ('false', '0', 'no', 'off')
+
+
+class OptimizationError(ValueError):
+    """Invalid request or missing data; the API reports these as 400."""
+
+
+def parse_flag(value, default=False):
+    """``value`` as a bool; None and '' give ``default``. Raises ValueError otherwise."""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TRUE_STRINGS:
+            return True
+        if text in FALSE_STRINGS:
+            return False
+    raise ValueError(f'expected true or false, got {value!r}')
+
+
+def flag(params, name, default=False):
+    """``params[name]`` parsed with parse_flag; invalid values raise OptimizationError."""
+    try:
+        return parse_flag(params.get(name), default)
+    except ValueError:
+        raise OptimizationError(f'{name} must be true or false')
+
+
+def number(params, name):
+    """``params[name]`` as a finite float, None when absent; otherwise OptimizationError."""
+    raw = params.get(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        value = math.nan
+    if isinstance(raw, bool) or not math.isfinite(value):
+        raise OptimizationError(f'{name} must be a number')
+    return value
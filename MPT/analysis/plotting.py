@@ -1,7 +1,15 @@
-import numpy as np
-from datetime import datetime
+import hashlib
 import os
+import threading
+import time
+import numpy as np
 from django.conf import settings
+from .factor_model import FactorCovariance
+from .metrics import stage
+
+
+# Bump when the rendering changes so cached images are regenerated.
+PLOT_VERSION = b'frontier-v1'
 
 
 def portfolio_vol(weights, cov):
@@ -12,43 +20,132 @@ def portfolio_return(weights, mu):
     return float(weights @ mu)
 
 
-def efficient_frontier(mu, cov, optimize_fn, n_points=50, allow_short=False):
+def frontier_targets(mu, n_points=50):
+    mu = np.asarray(mu)
+    return np.linspace(float(mu.min()), float(mu.max()), n_points)
+
+
+@stage('frontier')
+def efficient_frontier(mu, cov, optimize_fn=None, n_points=50, allow_short=False, engine=None):
+    # With an explicit optimize_fn each target is solved independently; otherwise
+    # a frontier engine from analysis.frontier solves the whole grid.
     mu = np.asarray(mu)
-    cov = np.asarray(cov)
-    min_ret, max_ret = float(mu.min()), float(mu.max())
-    target_grid = np.linspace(min_ret, max_ret, n_points)
+    if not isinstance(cov, FactorCovariance):
+        cov = np.asarray(cov)
+    target_grid = frontier_targets(mu, n_points)
     vols, rets, weights_list = [], [], []
 
-    for t in target_grid:
-        try:
-            w = optimize_fn(mu, cov, target_return=float(t), allow_short=allow_short)
-            vols.append(portfolio_vol(w, cov))
-            rets.append(portfolio_return(w, mu))
-            weights_list.append(w)
-        except Exception:
+    if engine is None and optimize_fn is not None:
+        solutions = []
+        for t in target_grid:
+            try:
+                solutions.append(optimize_fn(mu, cov, target_return=float(t), allow_short=allow_short))
+            except Exception:
+                solutions.append(None)
+    else:
+        from .frontier import get_engine, default_engine
+        engine = engine or default_engine(allow_short, len(mu))
+        solutions = get_engine(engine)(mu, cov, target_grid, allow_short=allow_short)
+
+    for w in solutions:
+        if w is None:
             continue
+        vols.append(portfolio_vol(w, cov))
+        rets.append(portfolio_return(w, mu))
+        weights_list.append(w)
     return np.array(rets), np.array(vols), weights_list
 
 
-def plot_frontier(ret_arr, vol_arr, filename=None):
-    # Lazy import matplotlib so Django management commands that don't need plotting still work
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
+def frontier_cache_key(ret_arr, vol_arr, cloud=None):
+    # Round away solver noise so identical requests map to the same image.
+    data = np.round(np.vstack([np.asarray(ret_arr, dtype=float), np.asarray(vol_arr, dtype=float)]), 10)
+    h = hashlib.sha256(PLOT_VERSION + data.tobytes())
+    if cloud is not None:
+        h.update(np.round(np.asarray([cloud['returns'], cloud['volatilities']], dtype=float), 10).tobytes())
+    return h.hexdigest()[:24]
+
+
+def frontier_points(ret_arr, vol_arr):
+    return [{'volatility': float(v), 'return': float(r)} for r, v in zip(ret_arr, vol_arr)]
 
-    plt.figure(figsize=(8,5))
-    plt.plot(vol_arr, ret_arr, '-o', markersize=3)
-    plt.xlabel('Annualized Volatility (Std Dev)')
-    plt.ylabel('Annualized Return')
-    plt.title('Efficient Frontier')
-    plt.grid(True)
 
+def _media_dir():
+    media_dir = getattr(settings, 'MEDIA_ROOT', None) or os.path.join(os.getcwd(), 'media')
+    os.makedirs(media_dir, exist_ok=True)
+    return str(media_dir)
+
+
+def evict_frontier_plots(media_dir=None):
+    """Apply FRONTIER_PLOT_CACHE limits to cached frontier_*.png files.
+
+    Files older than MAX_AGE seconds are removed, then the least recently
+    used files until at most MAX_FILES / MAX_BYTES remain.
+    """
+    conf = getattr(settings, 'FRONTIER_PLOT_CACHE', {})
+    max_files, max_bytes, max_age = conf.get('MAX_FILES'), conf.get('MAX_BYTES'), conf.get('MAX_AGE')
+    media_dir = media_dir or _media_dir()
+    entries = []
+    for name in os.listdir(media_dir):
+        if name.startswith('frontier_') and name.endswith('.png'):
+            path = os.path.join(media_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    entries.sort(reverse=True)
+    now = time.time()
+    kept, total, removed = 0, 0, 0
+    for mtime, size, path in entries:
+        expired = max_age is not None and now - mtime > max_age
+        over = (max_files is not None and kept >= max_files) or (max_bytes is not None and total + size > max_bytes)
+        if expired or over:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            continue
+        kept += 1
+        total += size
+    return removed
+
+
+@stage('plot')
+def plot_frontier(ret_arr, vol_arr, filename=None, cloud=None):
+    # Without an explicit filename the image is cached under a hash of the
+    # frontier data: identical frontiers reuse the existing file. ``cloud``
+    # ({'returns': [...], 'volatilities': [...]}) adds random portfolios
+    # from analysis.montecarlo behind the curve.
     if filename is None:
-        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-        media_dir = getattr(settings, 'MEDIA_ROOT', None) or os.path.join(os.getcwd(), 'media')
-        os.makedirs(media_dir, exist_ok=True)
-        filename = os.path.join(media_dir, f'frontier_{timestamp}.png')
+        media_dir = _media_dir()
+        filename = os.path.join(media_dir, f'frontier_{frontier_cache_key(ret_arr, vol_arr, cloud)}.png')
+        if os.path.exists(filename):
+            os.utime(filename)
+            return filename
+        tmp = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+        _render_frontier(ret_arr, vol_arr, tmp, cloud)
+        os.replace(tmp, filename)
+        evict_frontier_plots(media_dir)
+        return filename
 
-    plt.savefig(filename, bbox_inches='tight')
-    plt.close()
+    _render_frontier(ret_arr, vol_arr, filename, cloud)
     return filename
+
+
+def _render_frontier(ret_arr, vol_arr, filename, cloud=None):
+    # Lazy import matplotlib so Django management commands that don't need plotting still work.
+    # A bare Figure keeps no global pyplot state, so threads of one process can
+    # render concurrently without drawing onto each other's figures.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8,5))
+    ax = fig.add_subplot()
+    if cloud is not None:
+        ax.scatter(cloud['volatilities'], cloud['returns'], s=2, alpha=0.3, color='gray', label='Random portfolios')
+    ax.plot(vol_arr, ret_arr, '-o', markersize=3)
+    ax.set_xlabel('Annualized Volatility (Std Dev)')
+    ax.set_ylabel('Annualized Return')
+    ax.set_title('Efficient Frontier')
+    ax.grid(True)
+    fig.savefig(filename, bbox_inches='tight', format='png')
@@ -0,0 +1,153 @@
+"""Dense primal active-set solver for the min-variance QP.
+
+Solves::
+
+    minimize    w' cov w
+    subject to  sum(w) == 1
+                w >= 0                  (unless allow_short)
+                w @ mu >= target_return (if given)
+
+using only NumPy (Nocedal & Wright, Algorithm 16.3). Bound constraints in the
+working set are handled by fixing those weights at zero, so each iteration
+solves a KKT system over the free assets only. For the 5-50 asset portfolios
+most users build this converges in a few dozen tiny linear solves, which is
+far cheaper than importing and canonicalizing a cvxpy problem.
+"""
+import numpy as np
+
+
+class InfeasibleProblem(RuntimeError):
+    pass
+
+
+def _kkt_solve(G, g, F, mu, use_return):
+    """Step on the free set F: returns (p_F, nu, eta)."""
+    k = len(F)
+    rows = 1 + int(use_return)
+    K = np.zeros((k + rows, k + rows))
+    K[:k, :k] = G[np.ix_(F, F)]
+    K[:k, k] = 1.0
+    K[k, :k] = 1.0
+    if use_return:
+        K[:k, k + 1] = mu[F]
+        K[k + 1, :k] = mu[F]
+    rhs = np.zeros(k + rows)
+    rhs[:k] = -g[F]
+    try:
+        sol = np.linalg.solve(K, rhs)
+    except np.linalg.LinAlgError:
+        sol = np.linalg.lstsq(K, rhs, rcond=None)[0]
+    p_f = sol[:k]
+    nu = -sol[k]
+    eta = -sol[k + 1] if use_return else 0.0
+    return p_f, nu, eta
+
+
+def _start(mu, target_return, x0):
+    n = len(mu)
+    if x0 is not None:
+        x0 = np.asarray(x0, dtype=float)
+        if (x0.shape == (n,) and abs(x0.sum() - 1) < 1e-9 and (x0 >= 0).all()
+                and (target_return is None or x0 @ mu >= target_return)):
+            return x0.copy()
+    x = np.full(n, 1.0 / n)
+    if target_return is None or x @ mu >= target_return:
+        return x
+    k = int(np.argmax(mu))
+    if mu[k] < target_return:
+        raise InfeasibleProblem(f'target return {target_return} exceeds the highest expected return {mu[k]}')
+    # Slide from equal weights toward the best asset just far enough.
+    a = (target_return - x @ mu) / (mu[k] - x @ mu)
+    x *= (1 - a)
+    x[k] += a
+    return x
+
+
+def active_set_min_variance(expected_returns, cov_matrix, target_return=None, allow_short=False,
+                            x0=None, max_iter=None, tol=1e-10):
+    mu = np.asarray(expected_returns, dtype=float).reshape(-1)
+    cov = np.asarray(cov_matrix, dtype=float)
+    n = len(mu)
+    if allow_short:
+        from .closed_form import closed_form_min_variance
+        return closed_form_min_variance(mu, cov, target_return=target_return)
+
+    scale = max(float(np.abs(cov).max()), 1e-300)
+    # A tiny ridge keeps the free-set KKT systems nonsingular when the sample
+    # covariance is rank deficient; it does not move the solution measurably.
+    G = 2.0 * (cov + 1e-12 * scale * np.eye(n))
+    x = _start(mu, None if target_return is None else float(target_return), x0)
+    t = None if target_return is None else float(target_return)
+
+    bounds = set(np.flatnonzero(x <= 0).tolist())
+    if len(bounds) == n:
+        bounds.discard(int(np.argmax(x)))
+    use_return = False
+    max_iter = max_iter or 10 * n + 50
+
+    for _ in range(max_iter):
+        F = [i for i in range(n) if i not in bounds]
+        g = G @ x
+        p_f, nu, eta = _kkt_solve(G, g, F, mu, use_return)
+        p = np.zeros(n)
+        p[F] = p_f
+
+        # On rank-deficient covariances p can stay noisy along flat directions,
+        # so also treat a step with no measurable objective decrease as zero.
+        decrease = -(g @ p + 0.5 * p @ G @ p)
+        if np.abs(p).max() <= tol * max(1.0, np.abs(x).max()) or decrease <= 1e-12 * (x @ g) + 1e-15 * scale:
+            # Stationary on the working set: check the inequality multipliers.
+            grad = G @ x
+            lam_bounds = {i: grad[i] - nu - eta * mu[i] for i in bounds}
+            worst, worst_val = None, -tol * max(1.0, scale)
+            for i, lam in lam_bounds.items():
+                if lam < worst_val:
+                    worst, worst_val = i, lam
+            if use_return and eta < worst_val:
+                use_return = False
+                continue
+            if worst is None:
+                x[list(bounds)] = 0.0
+                return x
+            bounds.discard(worst)
+            continue
+
+        # Step as far as possible along p without leaving the feasible set.
+        alpha, blocking = 1.0, None
+        neg = [i for i in F if p[i] < -tol]
+        for i in neg:
+            a = -x[i] / p[i]
+            if a < alpha:
+                alpha, blocking = a, ('bound', i)
+        if t is not None and not use_return:
+            slope = mu @ p
+            if slope < -tol * max(1.0, np.abs(mu).max()):
+                a = (t - mu @ x) / slope
+                if a < alpha:
+                    alpha, blocking = max(a, 0.0), ('return', None)
+        x = x + alpha * p
+        if blocking is not None:
+            if blocking[0] == 'bound':
+                x[blocking[1]] = 0.0
+                bounds.add(blocking[1])
+            else:
+                use_return = True
+
+    raise RuntimeError('Active-set solver did not converge')
+
+
+def iter_active_set_frontier(mu, cov, targets, allow_short=False):
+    # Sweep the grid warm-starting each point from the previous solution.
+    previous = None
+    for t in targets:
+        try:
+            w = active_set_min_variance(mu, cov, target_return=float(t), allow_short=allow_short, x0=previous)
+        except RuntimeError:
+            w = None
+        if w is not None:
+            previous = w
+        yield w
+
+
+def active_set_frontier(mu, cov, targets, allow_short=False):
+    return list(iter_active_set_frontier(mu, cov, targets, allow_short=allow_short))
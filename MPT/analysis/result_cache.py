@@ -0,0 +1,107 @@
+"""Persistent memoization of optimize results.
+
+A result is stored under a hash of the normalized request (symbols, dates,
+target, shorting and estimator options) together with the ``prices_version``
+of every stock involved. fetch_prices bumps those versions when it writes
+rows, so results computed from older prices simply stop matching and age
+out under the retention policy in ``settings.RESULT_CACHE``::
+
+    RESULT_CACHE = {'ENABLED': True, 'MAX_ENTRIES': 10000, 'MAX_AGE': 30 * 24 * 3600}
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from stocks.models import Stock
+from .models import OptimizationResult
+from .params import flag, number
+
+
+def _conf():
+    return getattr(settings, 'RESULT_CACHE', {})
+
+
+def enabled():
+    return bool(_conf().get('ENABLED', True))
+
+
+def normalize(symbols, params, cov_model='sample', n_factors=None):
+    allow_short = flag(params, 'allow_short')
+    return {
+        'symbols': sorted(set(symbols)),
+        'start': str(params.get('start') or ''),
+        'end': str(params.get('end') or ''),
+        'target': number(params, 'target'),
+        'allow_short': allow_short,
+        # risk_free only changes the result through the tangency portfolio.
+        'risk_free': number(params, 'risk_free') if allow_short else None,
+        'cov_model': cov_model,
+        'n_factors': n_factors,
+        'frontier_engine': params.get('frontier_engine') or None,
+    }
+
+
+def result_key(normalized, versions=None):
+    if versions is None:
+        versions = dict(Stock.objects.filter(symbol__in=normalized['symbols']).values_list('symbol', 'prices_version'))
+    payload = json.dumps([normalized, [versions.get(s) for s in normalized['symbols']]], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def lookup(key):
+    entry = OptimizationResult.objects.filter(key=key).first()
+    if entry is not None:
+        OptimizationResult.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry
+
+
+async def alookup(key):
+    entry = await OptimizationResult.objects.filter(key=key).afirst()
+    if entry is not None:
+        await OptimizationResult.objects.filter(pk=entry.pk).aupdate(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry
+
+
+def store(key, normalized, result, frontier_points=None, portfolio=None):
+    fields = {
+        'params': normalized,
+        'symbols': result['symbols'],
+        'weights': result['weights'],
+        'expected_return': result['expected_return'],
+        'volatility': result['volatility'],
+        'extra': {k: result[k] for k in ('tangency_weights',) if k in result},
+        'frontier_points': frontier_points,
+        'portfolio': portfolio,
+        'last_used_at': timezone.now(),
+    }
+    try:
+        with transaction.atomic():
+            entry, _ = OptimizationResult.objects.update_or_create(key=key, defaults=fields)
+    except IntegrityError:
+        # A concurrent identical request stored it first.
+        return OptimizationResult.objects.filter(key=key).first()
+    prune()
+    return entry
+
+
+def prune():
+    """Drop entries unused for MAX_AGE seconds, then the least recently used past MAX_ENTRIES."""
+    conf = _conf()
+    max_age = conf.get('MAX_AGE', 30 * 24 * 3600)
+    max_entries = conf.get('MAX_ENTRIES', 10000)
+    deleted = 0
+    if max_age:
+        deleted += OptimizationResult.objects.filter(
+            last_used_at__lt=timezone.now() - timedelta(seconds=max_age)).delete()[0]
+    if max_entries:
+        cutoff = (OptimizationResult.objects.order_by('-last_used_at', '-pk')
+                  .values_list('pk', flat=True)[max_entries:max_entries + 1000])
+        stale = list(cutoff)
+        if stale:
+            deleted += OptimizationResult.objects.filter(pk__in=stale).delete()[0]
+    return deleted
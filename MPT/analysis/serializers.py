@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from portfolios.models import Portfolio, PortfolioWeight
+from .models import Job
 
 
 class PortfolioWeightSerializer(serializers.ModelSerializer):
@@ -16,3 +17,10 @@ class PortfolioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Portfolio
         fields = ('id', 'name', 'target_return', 'created_at', 'weights')
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'progress', 'message', 'params', 'result', 'error',
+                  'created_at', 'started_at', 'finished_at')
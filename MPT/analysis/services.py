@@ -1,18 +1,124 @@
+from itertools import islice
+from asgiref.sync import sync_to_async
 import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from stocks.models import Stock, Price
+from stocks.price_store import get_price_store, store_enabled
+from .factor_model import FactorCovariance, pca_factor_covariance
+from .metrics import stage
+from . import solvers
 
-def price_df_from_prices(queryset):
+def price_df_from_prices(queryset, symbols_by_id=None, chunk_size=50000):
     # queryset: Price objects filtered for desired symbols & date range
     # Return a DataFrame with columns = symbols, index = date, values = adjusted_close or close
-    records = []
-    for p in queryset.select_related('stock').order_by('date'):
-        records.append((p.date, p.stock.symbol, p.adjusted_close or p.close))
-    df = pd.DataFrame(records, columns=['date', 'symbol', 'price'])
-    df = df.pivot(index='date', columns='symbol', values='price')
-    return df
+    # Only (stock_id, date, price) tuples are pulled, in chunks, and scattered
+    # straight into a preallocated matrix; no model instances are built.
+    rows = _price_rows(queryset).iterator(chunk_size=chunk_size)
+    ids, dates, prices = [], [], []
+    with stage('price_db'):
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _append_rows((ids, dates, prices), chunk)
+    if not ids:
+        return _empty_price_df()
+    with stage('price_pivot'):
+        return _pivot(ids, dates, prices, symbols_by_id)
 
+def _price_rows(queryset):
+    return queryset.order_by().values_list('stock_id', 'date', Coalesce('adjusted_close', 'close'))
+
+def _append_rows(columns, chunk):
+    # Convert (stock_id, date, price) tuples into one array per column.
+    ids, dates, prices = columns
+    stock_ids, chunk_dates, chunk_prices = zip(*chunk)
+    ids.append(np.fromiter(stock_ids, dtype=np.int64, count=len(chunk)))
+    dates.append(np.array(chunk_dates, dtype='datetime64[D]'))
+    prices.append(np.array(chunk_prices, dtype=np.float64))
+
+def _empty_price_df():
+    return pd.DataFrame(index=pd.DatetimeIndex([], name='date'), columns=pd.Index([], name='symbol'), dtype=float)
+
+def _pivot(ids, dates, prices, symbols_by_id):
+    ids, dates, prices = np.concatenate(ids), np.concatenate(dates), np.concatenate(prices)
+    uniq_dates, date_pos = np.unique(dates, return_inverse=True)
+    uniq_ids, id_pos = np.unique(ids, return_inverse=True)
+    if symbols_by_id is None:
+        symbols_by_id = dict(Stock.objects.filter(pk__in=uniq_ids.tolist()).values_list('id', 'symbol'))
+    symbols = np.array([symbols_by_id[i] for i in uniq_ids.tolist()], dtype=object)
+
+    # Columns ordered by symbol, as DataFrame.pivot used to produce them.
+    order = np.argsort(symbols, kind='stable')
+    col_pos = np.empty_like(order)
+    col_pos[order] = np.arange(len(order))
+    matrix = np.full((len(uniq_dates), len(uniq_ids)), np.nan)
+    matrix[date_pos, col_pos[id_pos]] = prices
+    return pd.DataFrame(matrix, index=pd.DatetimeIndex(uniq_dates, name='date'),
+                        columns=pd.Index(symbols[order], name='symbol'))
+
+def load_price_df(symbols, start=None, end=None):
+    # Serve from the shared memory-mapped store when it holds every requested
+    # symbol; otherwise fall back to building the matrix from the database.
+    if store_enabled():
+        store = get_price_store()
+        if store.has_symbols(symbols):
+            with stage('price_store'):
+                return store.load(symbols, start=start, end=end)
+    symbols_by_id = dict(Stock.objects.filter(symbol__in=symbols).values_list('id', 'symbol'))
+    qs = Price.objects.filter(stock_id__in=list(symbols_by_id))
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    return price_df_from_prices(qs, symbols_by_id=symbols_by_id)
+
+async def aprice_source(symbols, start=None, end=None, stocks_per_query=20):
+    # Async counterpart of load_price_df for async views: gathers what a
+    # worker process needs to build the price matrix (price_df_from_source)
+    # without blocking the event loop. The memory-mapped store is read by
+    # the worker itself; database rows are fetched here with the async ORM,
+    # a few stocks per query so each result set stays bounded.
+    if store_enabled():
+        store = get_price_store()
+        if await sync_to_async(store.has_symbols)(symbols):
+            return ('store', list(symbols), start, end)
+    symbols_by_id = {pk: symbol async for pk, symbol in
+                     Stock.objects.filter(symbol__in=symbols).values_list('id', 'symbol')}
+    qs = Price.objects.all()
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    stock_ids = sorted(symbols_by_id)
+    ids, dates, prices = [], [], []
+    with stage('price_db'):
+        for i in range(0, len(stock_ids), stocks_per_query):
+            # QuerySet.aiterator() would run values_list() queries on the event
+            # loop thread; plain async iteration fetches in a worker thread.
+            chunk = [row async for row in _price_rows(qs.filter(stock_id__in=stock_ids[i:i + stocks_per_query]))]
+            if chunk:
+                _append_rows((ids, dates, prices), chunk)
+    return ('rows', ids, dates, prices, symbols_by_id)
+
+def price_df_from_source(source):
+    # Build the price matrix described by aprice_source.
+    if source[0] == 'store':
+        _, symbols, start, end = source
+        with stage('price_store'):
+            return get_price_store().load(symbols, start=start, end=end)
+    _, ids, dates, prices, symbols_by_id = source
+    if not ids:
+        return _empty_price_df()
+    with stage('price_pivot'):
+        return _pivot(ids, dates, prices, symbols_by_id)
+
+@stage('returns')
 def compute_daily_returns(price_df):
-    return price_df.pct_change().dropna(how='all')
+    # A missing price stays a missing return instead of a padded 0%.
+    return price_df.pct_change(fill_method=None).dropna(how='all')
 
 def annualize_return(daily_mean, periods=252):
     return (1 + daily_mean) ** periods - 1
@@ -20,25 +126,92 @@ def annualize_return(daily_mean, periods=252):
 def annualize_cov(daily_cov, periods=252):
     return daily_cov * periods
 
-# Optimizer using CVXPY. If cvxpy isn't available, we can implement a SciPy fallback.
-def optimize_min_variance(expected_returns, cov_matrix, target_return=None, allow_short=False):
+COV_MODELS = ('sample', 'factor')
+
+def default_n_factors():
+    return getattr(settings, 'FACTOR_MODEL_FACTORS', 10)
+
+def estimate_cov(daily_rets, model='sample', n_factors=None):
+    # Daily covariance: the dense sample matrix, or a PCA factor model
+    # (FactorCovariance) that stays O(n k) for large universes.
+    if model == 'sample':
+        return daily_rets.cov().values
+    if model == 'factor':
+        return pca_factor_covariance(daily_rets.values, n_factors or default_n_factors())
+    raise ValueError(f"Unknown cov_model '{model}'; expected one of {', '.join(COV_MODELS)}")
+
+def subset_cov(cov, idx):
+    # Covariance of the assets at positions idx, keeping factor form.
+    if isinstance(cov, FactorCovariance):
+        return cov.take(idx)
+    return cov[np.ix_(idx, idx)]
+
+def cvxpy_variance(w, cov, psd_wrap=False):
+    # Return (w' cov w expression, extra constraints) for a cvxpy variable w.
+    import cvxpy as cp
+    if isinstance(cov, FactorCovariance):
+        # w' (B F B' + D) w == |L' y|^2 + sum(d w^2) with y = B' w: n*k
+        # constraint entries instead of an n x n quadratic form.
+        y = cp.Variable(cov.n_factors)
+        expr = cp.sum_squares(cov.factor_sqrt().T @ y) + cp.sum_squares(cp.multiply(np.sqrt(cov.specific), w))
+        return expr, [y == cov.loadings.T @ w]
+    cov = np.asarray(cov)
+    return cp.quad_form(w, cp.psd_wrap(cov) if psd_wrap else cov), []
+
+def dense_qp_max_assets():
+    return getattr(settings, 'QP_DENSE_MAX_ASSETS', 50)
+
+def _cvxpy_available():
+    try:
+        import cvxpy  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+def choose_method(n_assets, allow_short=False):
+    # Closed form when shorting is allowed; the built-in active-set QP for
+    # small universes (or when cvxpy is missing); cvxpy otherwise.
+    if allow_short:
+        return 'closed_form'
+    if n_assets <= dense_qp_max_assets() or not _cvxpy_available():
+        return 'active_set'
+    return 'cvxpy'
+
+# Optimizer using CVXPY, the built-in active-set QP, or the analytic solution
+# when short selling is allowed.
+@stage('optimize')
+def optimize_min_variance(expected_returns, cov_matrix, target_return=None, allow_short=False, method='auto',
+                          profile=None):
+    if method == 'auto':
+        method = choose_method(len(expected_returns), allow_short)
+    if method == 'closed_form':
+        if not allow_short:
+            raise ValueError("method='closed_form' requires allow_short=True")
+        from .closed_form import closed_form_min_variance
+        return closed_form_min_variance(expected_returns, cov_matrix, target_return=target_return)
+    if method == 'active_set':
+        from .qp import active_set_min_variance
+        return active_set_min_variance(expected_returns, np.asarray(cov_matrix), target_return=target_return, allow_short=allow_short)
+    if method != 'cvxpy':
+        raise ValueError(f"Unknown optimizer method '{method}'")
+
     try:
         import cvxpy as cp
     except Exception:
-        raise RuntimeError("CVXPY is required for this optimizer. Install cvxpy or use the SciPy fallback.")
+        raise RuntimeError("CVXPY is required for method='cvxpy'. Install cvxpy or use method='active_set'.")
 
     n = len(expected_returns)
     w = cp.Variable(n)
-    objective = cp.quad_form(w, cov_matrix)
-    constraints = [cp.sum(w) == 1]
+    objective, constraints = cvxpy_variance(w, cov_matrix)
+    constraints.append(cp.sum(w) == 1)
     if not allow_short:
         constraints.append(w >= 0)
     if target_return is not None:
         constraints.append(w @ expected_returns >= target_return)
 
     prob = cp.Problem(cp.Minimize(objective), constraints)
-    prob.solve(solver=cp.SCS)  # or cp.OSQP, cp.ECOS if installed
-    if w.value is None:
+    # Picks a solver from the profile in analysis.solvers, with fallback.
+    if solvers.solve(prob, n, profile=profile) is None or w.value is None:
         raise RuntimeError("Optimization failed")
     weights = np.array(w.value).flatten()
-    return weights
\ No newline at end of file
+    return weights
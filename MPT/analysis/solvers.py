@@ -0,0 +1,233 @@
+"""cvxpy solver registry: tolerance profiles, automatic selection, solve log.
+
+A profile names an order of preference and per-solver options::
+
+    SOLVER_PROFILE = 'balanced'   # or 'fast', 'precise'
+
+``solve(problem, n_assets)`` tries the profile's installed solvers in order
+(OSQP first for universes above ``SOLVER_LARGE_ASSETS`` unless the profile
+is 'precise') and falls back to the next one when a solver raises or ends
+with a status the profile does not accept. An infeasible or unbounded
+verdict is the problem's answer, not a solver failure, so it ends the
+search.
+
+Every attempt is recorded (solver, status, iterations, setup/solve time) and
+written to ``SolveLog`` in batches: when ``SOLVE_LOG['BATCH']`` attempts are
+pending, at the end of each request and after each job. Frontier sweeps are
+logged whole or not at all, for a ``SOLVE_LOG['FRONTIER_SAMPLE']`` fraction
+of them. Entries older than ``SOLVE_LOG['MAX_AGE']`` seconds are deleted
+when the log is flushed (at most every ``PRUNE_INTERVAL`` seconds).
+``manage.py solver_stats`` summarizes the log.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .metrics import observe
+
+logger = logging.getLogger(__name__)
+
+OPTIMAL = ('optimal',)
+OPTIMAL_OR_INACCURATE = ('optimal', 'optimal_inaccurate')
+# Statuses that describe the problem; another solver would only repeat them.
+CONCLUSIVE = ('infeasible', 'unbounded', 'infeasible_inaccurate', 'unbounded_inaccurate')
+
+PROFILES = {
+    'fast': {
+        'order': ('OSQP', 'SCS', 'CLARABEL'),
+        'accept': OPTIMAL_OR_INACCURATE,
+        'options': {
+            'OSQP': {'eps_abs': 1e-5, 'eps_rel': 1e-5, 'polish': False},
+            'SCS': {'eps_abs': 1e-5, 'eps_rel': 1e-5},
+            'CLARABEL': {'tol_gap_abs': 1e-6, 'tol_gap_rel': 1e-6, 'tol_feas': 1e-6},
+        },
+    },
+    'balanced': {
+        'order': ('CLARABEL', 'OSQP', 'SCS'),
+        'accept': OPTIMAL_OR_INACCURATE,
+        'options': {
+            'OSQP': {'eps_abs': 1e-7, 'eps_rel': 1e-7, 'polish': True},
+            'SCS': {'eps_abs': 1e-6, 'eps_rel': 1e-6},
+            'CLARABEL': {},
+        },
+    },
+    'precise': {
+        'order': ('CLARABEL', 'SCS', 'OSQP'),
+        'accept': OPTIMAL,
+        'options': {
+            'CLARABEL': {'tol_gap_abs': 1e-10, 'tol_gap_rel': 1e-10, 'tol_feas': 1e-10},
+            'SCS': {'eps_abs': 1e-9, 'eps_rel': 1e-9, 'max_iters': 200_000},
+            'OSQP': {'eps_abs': 1e-9, 'eps_rel': 1e-9, 'polish': True, 'max_iter': 100_000},
+        },
+    },
+}
+
+PRUNE_INTERVAL = 600
+
+_installed = None
+_pending = []
+_lock = threading.Lock()
+# Set in pool workers: entries are returned to the parent instead of written.
+_held = False
+_last_prune = None
+
+
+def installed_solvers():
+    global _installed
+    if _installed is None:
+        import cvxpy as cp
+        _installed = frozenset(cp.installed_solvers())
+    return _installed
+
+
+def get_profile(name=None):
+    name = name or getattr(settings, 'SOLVER_PROFILE', 'balanced')
+    try:
+        return name, PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown solver profile '{name}'. Choose from: {', '.join(PROFILES)}")
+
+
+def candidates(n_assets, profile=None):
+    """Installed solvers of ``profile`` in the order they will be tried."""
+    name, conf = get_profile(profile)
+    order = list(conf['order'])
+    if name != 'precise' and n_assets > getattr(settings, 'SOLVER_LARGE_ASSETS', 500) and 'OSQP' in order:
+        # First-order OSQP scales better than an interior-point method here.
+        order.remove('OSQP')
+        order.insert(0, 'OSQP')
+    available = [s for s in order if s in installed_solvers()]
+    if not available:
+        raise RuntimeError(f"None of the solvers for profile '{name}' are installed: {', '.join(order)}")
+    return available
+
+
+def solve(problem, n_assets, profile=None, context='optimize', warm_start=False, order=None, log=True):
+    """Solve ``problem`` with fallback; return the winning solver or None.
+
+    None means every candidate failed, or one found the problem infeasible
+    or unbounded (``problem.status`` says which).
+
+    ``order`` overrides the candidate list, e.g. to keep the solver that
+    worked for the previous point of a parametric sweep first. With
+    ``log=False`` the attempts are not written to the solve log.
+    """
+    import cvxpy as cp
+
+    name, conf = get_profile(profile)
+    for attempt, solver in enumerate(order or candidates(n_assets, name)):
+        start = time.perf_counter()
+        try:
+            problem.solve(solver=solver, warm_start=warm_start, **conf['options'].get(solver, {}))
+            status = problem.status
+        except (cp.SolverError, ValueError, ArithmeticError) as e:
+            logger.debug('%s failed: %s', solver, e)
+            status = 'error'
+        wall = time.perf_counter() - start
+        stats = problem.solver_stats if status != 'error' else None
+        observe('cvxpy_compile', problem.compilation_time or 0.0)
+        observe('cvxpy_solve', getattr(stats, 'solve_time', None) or 0.0)
+        if log:
+            record({
+                'solver': solver,
+                'profile': name,
+                'context': context,
+                'status': status,
+                'attempt': attempt,
+                'n_assets': n_assets,
+                'iterations': getattr(stats, 'num_iters', None),
+                'setup_time': getattr(stats, 'setup_time', None),
+                'solve_time': getattr(stats, 'solve_time', None),
+                'wall_time': wall,
+            })
+        if status in conf['accept']:
+            return solver
+        if status in CONCLUSIVE:
+            break
+    return None
+
+
+def _conf():
+    return getattr(settings, 'SOLVE_LOG', {})
+
+
+def log_enabled():
+    return bool(_conf().get('ENABLED', True))
+
+
+def sample_frontier():
+    """Whether to log the attempts of a new frontier sweep."""
+    return log_enabled() and random.random() < _conf().get('FRONTIER_SAMPLE', 1.0)
+
+
+def record(entry):
+    if not log_enabled():
+        return
+    with _lock:
+        _pending.append(entry)
+        full = len(_pending) >= _conf().get('BATCH', 200)
+    if full and not _held:
+        flush()
+
+
+def hold():
+    global _held
+    _held = True
+
+
+def drain():
+    """Take the pending entries, e.g. to ship them out of a pool worker."""
+    global _pending
+    with _lock:
+        entries, _pending = _pending, []
+    return entries
+
+
+def extend(entries):
+    with _lock:
+        _pending.extend(entries)
+
+
+def flush():
+    entries = drain()
+    if not entries:
+        return 0
+    from .models import SolveLog
+    try:
+        SolveLog.objects.bulk_create([SolveLog(**e) for e in entries])
+    except DatabaseError:
+        # Telemetry must never fail a solve.
+        logger.warning('could not write %d solve log entries', len(entries), exc_info=True)
+        return 0
+    global _last_prune
+    now = time.monotonic()
+    if _last_prune is None or now - _last_prune >= PRUNE_INTERVAL:
+        _last_prune = now
+        prune()
+    return len(entries)
+
+
+def prune(max_age=None):
+    """Delete entries older than ``max_age`` seconds (default ``SOLVE_LOG['MAX_AGE']``)."""
+    from .models import SolveLog
+    max_age = _conf().get('MAX_AGE', 14 * 24 * 3600) if max_age is None else max_age
+    if not max_age:
+        return 0
+    try:
+        return SolveLog.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=max_age)).delete()[0]
+    except DatabaseError:
+        logger.warning('could not prune the solve log', exc_info=True)
+        return 0
+
+
+@receiver(request_finished)
+def _flush_after_request(**kwargs):
+    flush()
@@ -0,0 +1,72 @@
+"""Streamed responses: NDJSON lines or server-sent events.
+
+``stream_response`` turns a generator of event dicts into a
+``StreamingHttpResponse``. Under ASGI the generator is advanced one event at
+a time in a worker thread from an async iterator, so when the client
+disconnects Django cancels the iterator between events and the generator is
+closed. Under WSGI the server closes the response once a write fails, which
+closes the generator the same way. Either way no further work is done after
+the client has gone.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+NDJSON = 'application/x-ndjson'
+SSE = 'text/event-stream'
+
+_END = object()
+
+
+def stream_format(request):
+    """'sse' when asked for via ``?stream=sse`` or the Accept header, else 'ndjson'."""
+    fmt = request.GET.get('stream')
+    if fmt in ('sse', 'ndjson'):
+        return fmt
+    return 'sse' if SSE in request.headers.get('Accept', '') else 'ndjson'
+
+
+def encode(event, fmt):
+    data = json.dumps(event)
+    if fmt == 'sse':
+        return f"event: {event.get('event', 'message')}\ndata: {data}\n\n"
+    return data + '\n'
+
+
+def _sync_stream(events, fmt, first):
+    try:
+        if first is not None:
+            yield encode(first, fmt)
+        for event in events:
+            yield encode(event, fmt)
+    finally:
+        events.close()
+
+
+async def _async_stream(events, fmt, first):
+    advance = sync_to_async(next)
+    try:
+        if first is not None:
+            yield encode(first, fmt)
+        while True:
+            event = await advance(events, _END)
+            if event is _END:
+                break
+            yield encode(event, fmt)
+    finally:
+        await sync_to_async(events.close)()
+
+
+def stream_response(request, events, fmt, first=None):
+    """Stream ``events``, preceded by ``first`` if the caller already pulled it."""
+    if isinstance(request, ASGIRequest):
+        content = _async_stream(events, fmt, first)
+    else:
+        content = _sync_stream(events, fmt, first)
+    response = StreamingHttpResponse(content, content_type=SSE if fmt == 'sse' else NDJSON)
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
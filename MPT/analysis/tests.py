@@ -1,3 +1,915 @@
-from django.test import TestCase
+import json
+import os
+import signal
+from multiprocessing import shared_memory
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import F
+from django.core.cache import caches
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from stocks.ingest import prices_from_frame, upsert_prices
+from portfolios.models import Portfolio
+from stocks.models import Price, Stock
+from stocks.price_store import PriceStore
+from stocks.synthetic import synthetic_prices
+
+from .qp import active_set_min_variance, InfeasibleProblem
+from .cla import CriticalLine, SingularCovariance, cla_frontier
+from .factor_model import pca_factor_covariance
+from .closed_form import ClosedFormFrontier, closed_form_min_variance
+from .montecarlo import CloudAccumulator, cloud_bounds, draw_weights, score, simulate_portfolios
+from .frontier import ParametricFrontier, parametric_frontier
+from .parallel import SharedArrays, call_attached, parallel_frontier
+from .services import (optimize_min_variance, choose_method, compute_daily_returns, load_price_df,
+                       price_df_from_prices, annualize_return, annualize_cov)
+from .backtest import run_backtest
+from .plotting import efficient_frontier, evict_frontier_plots, plot_frontier
+from .estimates import DjangoEstimateCache, Estimates, get_estimate_cache
+from . import jobs, offload, parallel, plotting, solvers
+from .models import Job, OptimizationResult, SolveLog
+from .optimization import (run_backtest_request, run_batch_optimization, run_optimization, stream_optimization,
+                           OptimizationError)
+from .warmup import warmup
+from .metrics import REGISTRY, Histograms, ServerTimingMiddleware, stage
+
+
+def random_problem(seed, n, days=250):
+    rng = np.random.default_rng(seed)
+    daily = rng.normal(0.0004, 0.01, size=(days, n)) + rng.normal(0, 0.006, size=(days, 1))
+    mu = daily.mean(axis=0) * 252 + rng.normal(0, 0.05, n)
+    cov = np.cov(daily.T) * 252
+    return mu, cov
+
+
+def cvxpy_reference(mu, cov, target=None, allow_short=False):
+    import cvxpy as cp
+    w = cp.Variable(len(mu))
+    constraints = [cp.sum(w) == 1]
+    if not allow_short:
+        constraints.append(w >= 0)
+    if target is not None:
+        constraints.append(w @ mu >= target)
+    prob = cp.Problem(cp.Minimize(cp.quad_form(w, cp.psd_wrap(cov))), constraints)
+    prob.solve(solver=cp.CLARABEL, tol_gap_abs=1e-12, tol_gap_rel=1e-12, tol_feas=1e-12)
+    return prob.value
+
+
+class ActiveSetQPTests(SimpleTestCase):
+    def assertFeasible(self, w, mu, target):
+        self.assertAlmostEqual(w.sum(), 1.0, places=9)
+        self.assertGreaterEqual(w.min(), 0.0)
+        if target is not None:
+            self.assertGreaterEqual(w @ mu, target - 1e-9)
+
+    def test_matches_cvxpy(self):
+        for seed, n in [(0, 3), (1, 5), (2, 12), (3, 25), (4, 50)]:
+            mu, cov = random_problem(seed, n)
+            for target in (None, mu.min(), np.median(mu), np.quantile(mu, 0.9), mu.max()):
+                with self.subTest(n=n, target=target):
+                    w = active_set_min_variance(mu, cov, target_return=target)
+                    self.assertFeasible(w, mu, target)
+                    expected = cvxpy_reference(mu, cov, target)
+                    self.assertLessEqual(abs(w @ cov @ w - expected), 1e-8 * max(expected, 1e-6))
+
+    def test_rank_deficient_covariance(self):
+        # Fewer observations than assets leaves the sample covariance singular.
+        mu, cov = random_problem(5, 40, days=20)
+        target = np.quantile(mu, 0.75)
+        w = active_set_min_variance(mu, cov, target_return=target)
+        self.assertFeasible(w, mu, target)
+        self.assertLessEqual(w @ cov @ w, cvxpy_reference(mu, cov, target) + 1e-9)
+
+    def test_warm_start(self):
+        mu, cov = random_problem(6, 15)
+        cold = active_set_min_variance(mu, cov, target_return=np.median(mu))
+        warm = active_set_min_variance(mu, cov, target_return=np.quantile(mu, 0.6), x0=cold)
+        ref = active_set_min_variance(mu, cov, target_return=np.quantile(mu, 0.6))
+        np.testing.assert_allclose(warm, ref, atol=1e-7)
+
+    def test_infeasible_target(self):
+        with self.assertRaises(InfeasibleProblem):
+            active_set_min_variance(np.array([0.05, 0.1]), np.eye(2) * 0.04, target_return=0.2)
+
+    def test_auto_selects_active_set_for_small_universes(self):
+        self.assertEqual(choose_method(10), 'active_set')
+        self.assertEqual(choose_method(10, allow_short=True), 'closed_form')
+        with self.settings(QP_DENSE_MAX_ASSETS=5):
+            self.assertEqual(choose_method(10), 'cvxpy')
+
+    def test_optimize_min_variance_methods_agree(self):
+        mu, cov = random_problem(7, 8)
+        target = np.quantile(mu, 0.7)
+        a = optimize_min_variance(mu, cov, target_return=target, method='active_set')
+        b = optimize_min_variance(mu, cov, target_return=target, method='cvxpy')
+        self.assertAlmostEqual(a @ cov @ a, b @ cov @ b, places=5)
+
+    def test_frontier_engine(self):
+        mu, cov = random_problem(8, 10)
+        rets, vols, _ = efficient_frontier(mu, cov, n_points=15, engine='active_set')
+        ref_rets, ref_vols, _ = efficient_frontier(mu, cov, n_points=15, engine='cla')
+        self.assertEqual(len(vols), 15)
+        np.testing.assert_allclose(vols, ref_vols, rtol=1e-6)
+
+
+class CriticalLineTests(SimpleTestCase):
+    def test_tied_means(self):
+        problems = [
+            ([0.1, 0.1, 0.1], np.diag([0.04, 0.09, 0.01])),
+            ([0.1, 0.1, 0.05], np.diag([0.09, 0.01, 0.04])),
+            ([0.1, 0.1, 0.05, 0.07], np.diag([0.09, 0.01, 0.04, 0.02])),
+        ]
+        for mu, cov in problems:
+            mu = np.array(mu)
+            line = CriticalLine(mu, cov)
+            for target in np.linspace(mu.min(), mu.max(), 7):
+                with self.subTest(mu=mu, target=target):
+                    w = line.weights_for(target)
+                    ref = active_set_min_variance(mu, cov, target_return=target)
+                    self.assertAlmostEqual(w @ cov @ w, ref @ cov @ ref, places=9)
+
+    def test_rank_deficient_covariance(self):
+        mu, cov = random_problem(9, 30, days=15)
+        with self.assertRaises(SingularCovariance):
+            CriticalLine(mu, cov)
+        # The frontier engine falls back to the active-set QP.
+        targets = np.linspace(mu.min(), mu.max(), 5)
+        for w, target in zip(cla_frontier(mu, cov, targets), targets):
+            self.assertLessEqual(w @ cov @ w, cvxpy_reference(mu, cov, target) + 1e-9)
+
+
+class ParametricFrontierTests(TestCase):
+    def test_matches_independent_solves(self):
+        mu, cov = random_problem(10, 8)
+        targets = np.linspace(mu.min(), mu.max(), 9)
+        for allow_short in (False, True):
+            frontier = ParametricFrontier(mu, cov, allow_short=allow_short)
+            previous = None
+            for target in targets:
+                with self.subTest(allow_short=allow_short, target=target):
+                    w = frontier.solve(target, initial=previous)
+                    previous = w
+                    self.assertAlmostEqual(w.sum(), 1.0, places=6)
+                    self.assertGreaterEqual(w @ mu, target - 1e-6)
+                    expected = cvxpy_reference(mu, cov, target, allow_short=allow_short)
+                    self.assertAlmostEqual(w @ cov @ w, expected, delta=1e-6 * max(expected, 1e-6))
+
+    def test_unreachable_target(self):
+        mu, cov = random_problem(11, 5)
+        got = parametric_frontier(mu, cov, [np.median(mu), mu.max() + 0.05])
+        self.assertIsNotNone(got[0])
+        self.assertIsNone(got[1])
+
+
+class ClosedFormTests(SimpleTestCase):
+    def test_matches_cvxpy_with_shorting(self):
+        for seed, n in [(12, 4), (13, 15), (14, 40)]:
+            mu, cov = random_problem(seed, n)
+            for target in (None, mu.min(), np.median(mu), mu.max(), mu.max() + 0.1):
+                with self.subTest(n=n, target=target):
+                    w = closed_form_min_variance(mu, cov, target)
+                    self.assertAlmostEqual(w.sum(), 1.0, places=9)
+                    if target is not None:
+                        self.assertGreaterEqual(w @ mu, target - 1e-9)
+                    expected = cvxpy_reference(mu, cov, target, allow_short=True)
+                    self.assertAlmostEqual(w @ cov @ w, expected, delta=1e-8 * max(expected, 1e-6))
+
+    def test_tangency_maximizes_sharpe(self):
+        import cvxpy as cp
+        mu, cov = random_problem(15, 10)
+        frontier = ClosedFormFrontier(mu, cov)
+        risk_free = frontier.min_variance_return - 0.02
+        w = frontier.tangency(risk_free)
+        # Max Sharpe as a QP: min y'Cy with (mu - rf)'y == 1, then w = y / sum(y).
+        y = cp.Variable(len(mu))
+        cp.Problem(cp.Minimize(cp.quad_form(y, cp.psd_wrap(cov))), [(mu - risk_free) @ y == 1]).solve(
+            solver=cp.CLARABEL, tol_gap_abs=1e-12, tol_gap_rel=1e-12, tol_feas=1e-12)
+        np.testing.assert_allclose(w, y.value / y.value.sum(), atol=1e-6)
+
+        def sharpe(x):
+            return (x @ mu - risk_free) / np.sqrt(x @ cov @ x)
+        for target in np.linspace(frontier.min_variance_return, mu.max(), 7):
+            self.assertGreaterEqual(sharpe(w), sharpe(frontier.weights_for(target)) - 1e-12)
+        with self.assertRaises(ValueError):
+            frontier.tangency(frontier.min_variance_return)
+
+
+class ParallelFrontierTests(TestCase):
+    def tearDown(self):
+        parallel.shutdown_pool()
+
+    @override_settings(FRONTIER_POOL_SIZE=2)
+    def test_matches_the_serial_sweep(self):
+        mu, cov = random_problem(7, 6)
+        targets = np.linspace(mu.min(), mu.max(), 9)
+        got = parallel_frontier(mu, cov, targets)
+        self.assertEqual(len(got), len(targets))
+        for w, ref in zip(got, parametric_frontier(mu, cov, targets)):
+            np.testing.assert_allclose(w, ref, atol=1e-5)
+
+    def test_task_detaches_the_block(self):
+        mu, cov = random_problem(8, 4)
+        close = shared_memory.SharedMemory.close
+        with SharedArrays(mu, cov) as shared:
+            with mock.patch.object(shared_memory.SharedMemory, 'close', autospec=True, side_effect=close) as closed:
+                total = call_attached(shared.name, shared.n, lambda m, c: float(m.sum() + c.sum()))
+                self.assertEqual(closed.call_count, 1)
+                with self.assertRaises(ZeroDivisionError):
+                    call_attached(shared.name, shared.n, lambda m, c: 1 / 0)
+                self.assertEqual(closed.call_count, 2)
+        self.assertAlmostEqual(total, mu.sum() + cov.sum())
+
+
+class MonteCarloTests(SimpleTestCase):
+    def setUp(self):
+        self.mu, self.cov = random_problem(9, 5)
+
+    def test_weights_are_fully_invested(self):
+        rng = np.random.default_rng(0)
+        long_only = draw_weights(rng, 1000, 5)
+        np.testing.assert_allclose(long_only.sum(axis=1), 1.0)
+        self.assertTrue((long_only >= 0).all())
+        shorted = draw_weights(rng, 1000, 5, allow_short=True, max_short=0.5)
+        np.testing.assert_allclose(shorted.sum(axis=1), 1.0)
+        self.assertTrue((shorted < 0).any())
+        self.assertTrue((np.abs(shorted).sum(axis=1) <= 2 + 1e-9).all())
+        cloud = simulate_portfolios(self.mu, self.cov, 5000, seed=1)
+        for pick in ('min_volatility', 'max_sharpe'):
+            w = np.array(cloud[pick]['weights'])
+            self.assertAlmostEqual(w.sum(), 1.0)
+            self.assertTrue((w >= 0).all())
+
+    def test_same_seed_same_cloud(self):
+        first = simulate_portfolios(self.mu, self.cov, 3000, seed=5)
+        self.assertEqual(first, simulate_portfolios(self.mu, self.cov, 3000, seed=5))
+        self.assertNotEqual(first, simulate_portfolios(self.mu, self.cov, 3000, seed=6))
+        self.assertEqual(first['samples'], 3000)
+        self.assertEqual(sum(map(sum, first['histogram']['counts'])), 3000)
+
+    def test_chunks_and_shards_match_one_chunk(self):
+        weights = draw_weights(np.random.default_rng(2), 3000, 5)
+        rets, vols = score(weights, self.mu, self.cov)
+        bounds = cloud_bounds(self.mu, self.cov)
+        whole = CloudAccumulator(*bounds)
+        whole.update(weights, rets, vols, np.random.default_rng(3))
+        chunked = CloudAccumulator(*bounds)
+        shards = [CloudAccumulator(*bounds) for _ in range(3)]
+        for i, part in enumerate(np.array_split(np.arange(3000), 6)):
+            chunked.update(weights[part], rets[part], vols[part], np.random.default_rng(i))
+            shards[i % 3].update(weights[part], rets[part], vols[part], np.random.default_rng(i))
+        merged = shards[0].merge(shards[1]).merge(shards[2])
+        expected = whole.result()
+        for acc in (chunked, merged):
+            got = acc.result()
+            # Only which points are sampled for plotting depends on the split.
+            for key in ('samples', 'histogram', 'min_volatility', 'max_sharpe'):
+                self.assertEqual(got[key], expected[key])
+            for key in ('mean_return', 'mean_volatility'):
+                self.assertAlmostEqual(got[key], expected[key])
+            self.assertEqual(len(got['points']['returns']), 2000)
+
+    @override_settings(FRONTIER_POOL_SIZE=2, MONTE_CARLO_CHUNK_BYTES=24 * 5 * 500)
+    def test_sharded_run(self):
+        self.addCleanup(parallel.shutdown_pool)
+        sharded = simulate_portfolios(self.mu, self.cov, 4001, seed=4, workers=2)
+        self.assertEqual(sharded, simulate_portfolios(self.mu, self.cov, 4001, seed=4, workers=2))
+        self.assertEqual(sharded['samples'], 4001)
+        self.assertEqual(sum(map(sum, sharded['histogram']['counts'])), 4001)
+
+
+class FactorCovarianceTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        loadings = rng.normal(0, 0.01, size=(80, 3))
+        self.returns = rng.normal(size=(120, 3)) @ loadings.T + rng.normal(0.0005, 0.01, size=(120, 80))
+        self.cov = pca_factor_covariance(self.returns, 5) * 252
+        self.dense = np.asarray(self.cov)
+        self.mu = self.returns.mean(axis=0) * 252
+
+    def test_dense_equivalence(self):
+        x = np.linspace(-1, 1, 80)
+        np.testing.assert_allclose(self.cov @ x, self.dense @ x, atol=1e-12)
+        np.testing.assert_allclose(x @ self.cov, x @ self.dense, atol=1e-12)
+        np.testing.assert_allclose(self.cov.solve(x), np.linalg.solve(self.dense, x), rtol=1e-8)
+        # The diagonal reproduces the sample variances.
+        np.testing.assert_allclose(np.diag(self.dense), self.returns.var(axis=0, ddof=1) * 252, rtol=1e-10)
+        np.testing.assert_allclose(np.asarray(self.cov.take([3, 9])), self.dense[np.ix_([3, 9], [3, 9])])
+
+    def test_factor_formulation_matches_dense(self):
+        target = float(np.quantile(self.mu, 0.7))
+        w = optimize_min_variance(self.mu, self.cov, target_return=target, method='cvxpy')
+        self.assertAlmostEqual(w @ self.dense @ w, cvxpy_reference(self.mu, self.dense, target), places=6)
+        np.testing.assert_allclose(closed_form_min_variance(self.mu, self.cov, target),
+                                   closed_form_min_variance(self.mu, self.dense, target), atol=1e-8)
+
+
+def load_synthetic_prices(symbols, start='2020-01-01', end='2021-01-01'):
+    get_estimate_cache().clear()
+    for symbol, frame in synthetic_prices(symbols, start, end).items():
+        upsert_prices(prices_from_frame(Stock.objects.create(symbol=symbol), frame))
+
+
+
+class RecordingProvider:
+    name = 'recording'
+    max_batch_size = 50
+
+    def __init__(self, frames=None, failures=0):
+        self.calls = []
+        self.frames = frames or {}
+        self.failures = failures
+
+    def fetch(self, symbols, start, end):
+        self.calls.append((tuple(symbols), start, end))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError('rate limited')
+        return {s: self.frames[s] for s in symbols if s in self.frames}
+
+
+class PriceMatrixTests(TestCase):
+    def test_matches_the_pandas_pivot(self):
+        days = pd.bdate_range('2024-01-01', periods=6).date
+        rows = {'BBB': [10.0, 11.0, None, 12.0, 13.0, None], 'AAA': [5.0, None, 6.0, 7.0, None, 8.0],
+                'CCC': [None, None, None, 20.0, 21.0, 22.0]}
+        for symbol, closes in rows.items():
+            stock = Stock.objects.create(symbol=symbol)
+            Price.objects.bulk_create([
+                # Every other row has an adjusted close, which takes precedence.
+                Price(stock=stock, date=day, close=close, adjusted_close=close * 0.9 if i % 2 else None)
+                for i, (day, close) in enumerate(zip(days, closes)) if close is not None])
+        qs = Price.objects.filter(stock__symbol__in=rows)
+        # What price_df_from_prices did before it read flat tuples.
+        records = [(p.date, p.stock.symbol, p.adjusted_close or p.close)
+                   for p in qs.select_related('stock').order_by('date')]
+        expected = pd.DataFrame(records, columns=['date', 'symbol', 'price']).pivot(
+            index='date', columns='symbol', values='price')
+        expected.index = pd.DatetimeIndex(expected.index, name='date')
+        for chunk_size in (2, 50000):
+            with self.subTest(chunk_size=chunk_size):
+                pd.testing.assert_frame_equal(price_df_from_prices(qs, chunk_size=chunk_size), expected,
+                                              check_index_type=False)
+        pd.testing.assert_frame_equal(load_price_df(list(rows)), expected, check_index_type=False)
+        self.assertTrue(price_df_from_prices(Price.objects.none()).empty)
+
+
+@override_settings(PRICE_STORE_ENABLED=False)
+class FetchPricesTests(TestCase):
+    def fetch(self, **options):
+        provider = RecordingProvider()
+        with mock.patch('stocks.management.commands.fetch_prices.get_provider', return_value=provider):
+            call_command('fetch_prices', stdout=StringIO(), **options)
+        return sorted(provider.calls)
+
+    def test_incremental_backfills_before_first_stored_date(self):
+        load_synthetic_prices(['SYNA'], start='2020-01-01', end='2021-01-01')
+        Stock.objects.create(symbol='NEW')
+        calls = self.fetch(symbols='SYNA,NEW', start='2019-01-01', end='2021-06-01', incremental=True)
+        self.assertEqual(calls, [(('NEW',), '2019-01-01', '2021-06-01'),
+                                 (('SYNA',), '2019-01-01', '2020-01-01'),
+                                 (('SYNA',), '2021-01-01', '2021-06-01')])
+        # A window inside the stored range needs no download.
+        self.assertEqual(self.fetch(symbols='SYNA', start='2020-03-01', end='2020-06-01', incremental=True), [])
+
+    def test_empty_backfill_is_not_requested_again(self):
+        load_synthetic_prices(['SYNA'], start='2020-01-01', end='2021-01-01')
+        self.fetch(symbols='SYNA', start='2019-01-01', end='2021-01-01', incremental=True)
+        self.assertEqual(str(Stock.objects.get(symbol='SYNA').backfilled_from), '2019-01-01')
+        self.assertEqual(self.fetch(symbols='SYNA', start='2019-01-01', end='2021-01-01', incremental=True), [])
+        # An earlier start only asks for the part before the last backfill.
+        self.assertEqual(self.fetch(symbols='SYNA', start='2018-01-01', end='2021-01-01', incremental=True),
+                         [(('SYNA',), '2018-01-01', '2019-01-01')])
+
+    def test_provider_errors_are_retried_with_backoff(self):
+        Stock.objects.create(symbol='AAA')
+        provider = RecordingProvider(failures=2)
+        with mock.patch('stocks.management.commands.fetch_prices.get_provider', return_value=provider), \
+                mock.patch('stocks.management.commands.fetch_prices.time.sleep') as sleep:
+            call_command('fetch_prices', symbols='AAA', retries=3, backoff=0.5, stdout=StringIO())
+        self.assertEqual(len(provider.calls), 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+        provider = RecordingProvider(failures=10)
+        with mock.patch('stocks.management.commands.fetch_prices.get_provider', return_value=provider), \
+                mock.patch('stocks.management.commands.fetch_prices.time.sleep') as sleep:
+            with self.assertRaisesMessage(RuntimeError, 'recording failed for AAA: rate limited'):
+                call_command('fetch_prices', symbols='AAA', retries=2, backoff=1, stdout=StringIO())
+        self.assertEqual(len(provider.calls), 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [1, 2])
+
+    def test_flag_strings(self):
+        with mock.patch('analysis.views.call_command') as command:
+            response = self.client.post('/api/fetch-prices/', {'symbols': 'AAA', 'incremental': 'false', 'async': '0'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIs(command.call_args.kwargs['incremental'], False)
+            response = self.client.post('/api/fetch-prices/', {'symbols': 'AAA', 'incremental': 'maybe'})
+            self.assertEqual(response.status_code, 400)
+        with self.assertRaises(OptimizationError):
+            run_optimization({'symbols': 'AAA', 'allow_short': 'sometimes'})
+
+
+# fetch_prices writes from its own thread, which needs committed data.
+@override_settings(PRICE_STORE_ENABLED=False)
+class FetchPricesStoreTests(TransactionTestCase):
+    def test_first_store_append_carries_the_stored_history(self):
+        load_synthetic_prices(['SYNA'], start='2020-01-01', end='2021-01-01')
+        provider = RecordingProvider(synthetic_prices(['SYNA'], '2021-01-01', '2021-02-01'))
+        with tempfile.TemporaryDirectory() as path, \
+                override_settings(PRICE_STORE_ENABLED=True, PRICE_STORE_DIR=path), \
+                mock.patch('stocks.management.commands.fetch_prices.get_provider', return_value=provider):
+            call_command('fetch_prices', symbols='SYNA', start='2021-01-01', end='2021-02-01', stdout=StringIO())
+            stored = PriceStore(path).load(['SYNA'])
+        dates = Price.objects.filter(stock__symbol='SYNA').order_by('date').values_list('date', flat=True)
+        self.assertEqual(len(stored), len(dates))
+        self.assertEqual(stored.index[0].date(), dates[0])
+
+
+class FrontierPlotCacheTests(SimpleTestCase):
+    rets, vols = [0.05, 0.08, 0.12], [0.10, 0.12, 0.18]
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_same_frontier_reuses_the_file(self):
+        with mock.patch('analysis.plotting._render_frontier', wraps=plotting._render_frontier) as render:
+            first = plot_frontier(self.rets, self.vols)
+            # Solver noise below the rounding does not change the key.
+            again = plot_frontier([r + 1e-13 for r in self.rets], self.vols)
+            other = plot_frontier(self.rets, self.vols, cloud={'returns': [0.07], 'volatilities': [0.2]})
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(render.call_count, 2)
+        with open(first, 'rb') as fh:
+            self.assertEqual(fh.read(4), b'\x89PNG')
+
+    def test_eviction_limits(self):
+        now = time.time()
+        for i in range(5):
+            path = os.path.join(self.media.name, f'frontier_{i}.png')
+            with open(path, 'wb') as fh:
+                fh.write(b'x' * 100)
+            os.utime(path, (now - i * 60, now - i * 60))
+        open(os.path.join(self.media.name, 'other.png'), 'wb').close()
+        names = lambda: sorted(os.listdir(self.media.name))
+        with override_settings(FRONTIER_PLOT_CACHE={'MAX_AGE': 150}):
+            self.assertEqual(evict_frontier_plots(), 2)
+        self.assertEqual(names(), ['frontier_0.png', 'frontier_1.png', 'frontier_2.png', 'other.png'])
+        with override_settings(FRONTIER_PLOT_CACHE={'MAX_BYTES': 250}):
+            self.assertEqual(evict_frontier_plots(), 1)
+        self.assertEqual(names(), ['frontier_0.png', 'frontier_1.png', 'other.png'])
+        with override_settings(FRONTIER_PLOT_CACHE={'MAX_FILES': 1}):
+            self.assertEqual(evict_frontier_plots(), 1)
+        self.assertEqual(names(), ['frontier_0.png', 'other.png'])
+
+
+@stage('solve')
+def decorated():
+    return None
+
+
+class TimingTests(SimpleTestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        self.addCleanup(REGISTRY.clear)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histograms = Histograms()
+        histograms.buckets = (0.1, 1.0)
+        for seconds in (0.05, 0.5, 0.7, 2.0):
+            histograms.observe('solve', seconds)
+        self.assertEqual(histograms.render().splitlines()[2:], [
+            'mpt_stage_duration_seconds_bucket{stage="solve",le="0.1"} 1',
+            'mpt_stage_duration_seconds_bucket{stage="solve",le="1"} 3',
+            'mpt_stage_duration_seconds_bucket{stage="solve",le="+Inf"} 4',
+            'mpt_stage_duration_seconds_sum{stage="solve"} 3.250000',
+            'mpt_stage_duration_seconds_count{stage="solve"} 4',
+        ])
+
+    @staticmethod
+    def view(request):
+        with stage('load'):
+            pass
+        for _ in range(2):
+            decorated()
+        return HttpResponse('ok')
+
+    def assertTimed(self, response):
+        names = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(names, ['load', 'solve', 'total'])
+
+    @override_settings(TIMING_ENABLED=True)
+    def test_sync_and_async_requests_get_server_timing(self):
+        request = RequestFactory().get('/')
+        self.assertTimed(ServerTimingMiddleware(self.view)(request))
+
+        async def async_view(request):
+            return await sync_to_async(self.view)(request)
+        self.assertTimed(async_to_sync(ServerTimingMiddleware(async_view))(request))
+
+        text = self.client.get('/api/metrics').content.decode()
+        self.assertIn('mpt_stage_duration_seconds_count{stage="solve"} 4', text)
+        self.assertIn('mpt_stage_duration_seconds_count{stage="load"} 2', text)
+        self.assertIn('mpt_stage_duration_seconds_bucket{stage="request",le="+Inf"} 2', text)
+
+    def test_disabled_by_default(self):
+        response = ServerTimingMiddleware(self.view)(RequestFactory().get('/'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('stage="load"', REGISTRY.render())
+
+
+class DjangoEstimateCacheTests(SimpleTestCase):
+    def test_clear_keeps_other_entries_of_the_alias(self):
+        cache = DjangoEstimateCache()
+        est = Estimates(['A'], np.zeros(1), np.eye(1), 10)
+        caches['default'].set('other-app', 'kept')
+        cache.set('k', est)
+        self.assertEqual(cache.get('k').symbols, ['A'])
+        cache.clear()
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(caches['default'].get('other-app'), 'kept')
+        cache.set('k', est)
+        self.assertIsNotNone(cache.get('k'))
+
+
+class PriceStoreTests(SimpleTestCase):
+    def test_previous_generation_survives_an_append(self):
+        frame = synthetic_prices(['SYNA'], '2020-01-01', '2020-03-01')['SYNA'][['Close']].rename(columns={'Close': 'SYNA'})
+        with tempfile.TemporaryDirectory() as path:
+            store = PriceStore(path)
+            for _ in range(3):
+                generation = store.append(frame)
+            gens = lambda: sorted(n for n in os.listdir(path) if n.startswith('gen-'))
+            # gen-1 was only superseded a moment ago.
+            self.assertEqual(gens(), ['gen-1', 'gen-2', 'gen-3'])
+            with override_settings(PRICE_STORE_GRACE_SECONDS=0):
+                store.append(frame)
+            self.assertEqual(gens(), ['gen-3', 'gen-4'])
+            self.assertEqual(store.generation, generation + 1)
+
+    def test_readers_never_mix_generations(self):
+        prices = synthetic_prices(['SYNA', 'SYNB', 'SYNC'], '2020-01-01', '2021-01-01')
+        frame = pd.DataFrame({symbol: df['Close'] for symbol, df in prices.items()})
+        errors = []
+        with tempfile.TemporaryDirectory() as path:
+            store = PriceStore(path)
+            store.append(frame.iloc[:20])
+
+            def read():
+                try:
+                    for _ in range(200):
+                        df = store.load(['SYNA', 'SYNC'])
+                        assert list(df.columns) == ['SYNA', 'SYNC'] and not df.isna().any().any()
+                except Exception as e:
+                    errors.append(e)
+
+            readers = [threading.Thread(target=read) for _ in range(3)]
+            for reader in readers:
+                reader.start()
+            for end in range(40, len(frame), 20):
+                store.append(frame.iloc[:end])
+            for reader in readers:
+                reader.join()
+        self.assertEqual(errors, [])
+
+
+@override_settings(PRICE_STORE_ENABLED=False)
+class BacktestTests(TestCase):
+    def test_symbol_listed_late_waits_for_a_full_window(self):
+        load_synthetic_prices(['SYNA', 'SYNB', 'SYNC'], start='2019-01-01', end='2021-01-01')
+        Price.objects.filter(stock__symbol='SYNC', date__lt='2020-01-01').delete()
+        result = run_backtest(['SYNA', 'SYNB', 'SYNC'], lookback=60, rebalance=20)
+        rets = compute_daily_returns(load_price_df(['SYNA', 'SYNB', 'SYNC']))
+        listed = rets.index.get_indexer([rets['SYNC'].first_valid_index()])[0]
+        for r in result['rebalances']:
+            pos = rets.index.get_loc(pd.Timestamp(r['date']))
+            with self.subTest(date=r['date']):
+                if pos - 60 < listed:
+                    self.assertEqual(r['weights'][2], 0.0)
+                    # The other two are solved on their own exact window moments.
+                    window = rets.iloc[pos - 60:pos, :2].to_numpy()
+                    ref = active_set_min_variance(annualize_return(window.mean(axis=0)),
+                                                  annualize_cov(np.cov(window.T)))
+                    np.testing.assert_allclose(r['weights'][:2], ref, atol=1e-6)
+                else:
+                    self.assertGreater(r['weights'][2], 0.0)
+
+    def test_gap_in_history_is_missing_not_flat(self):
+        load_synthetic_prices(['SYNA', 'SYNB', 'SYNC'], start='2019-01-01', end='2021-01-01')
+        gap = list(Price.objects.filter(stock__symbol='SYNC', date__gte='2020-06-01')
+                   .order_by('date').values_list('date', flat=True)[:3])
+        Price.objects.filter(stock__symbol='SYNC', date__in=gap).delete()
+        rets = compute_daily_returns(load_price_df(['SYNA', 'SYNB', 'SYNC']))
+        self.assertTrue(rets.loc[pd.Timestamp(gap[0]):pd.Timestamp(gap[-1]), 'SYNC'].isna().all())
+        result = run_backtest(['SYNA', 'SYNB', 'SYNC'], lookback=60, rebalance=20)
+        for r in result['rebalances']:
+            pos = rets.index.get_loc(pd.Timestamp(r['date']))
+            if pos - 60 <= rets.index.get_loc(pd.Timestamp(gap[0])) < pos:
+                self.assertEqual(r['weights'][2], 0.0)
+
+    def test_request_target_is_parsed(self):
+        load_synthetic_prices(['SYNA', 'SYNB'], start='2019-01-01', end='2021-01-01')
+        params = {'symbols': 'SYNA,SYNB', 'lookback': '60', 'rebalance': 'quarterly'}
+        self.assertEqual(run_backtest_request({**params, 'target': '0.01'})['rebalances'],
+                         run_backtest_request({**params, 'target': 0.01})['rebalances'])
+        with self.assertRaises(OptimizationError):
+            run_backtest_request({**params, 'target': 'high'})
+
+@override_settings(PRICE_STORE_ENABLED=False)
+class BatchOptimizeTests(TestCase):
+    def setUp(self):
+        load_synthetic_prices(['SYNA', 'SYNB', 'SYNC'])
+        self.payload = {'start': '2020-01-01', 'end': '2021-01-01', 'jobs': [
+            {'name': 'pair', 'symbols': 'SYNA,SYNB'},
+            {'symbols': ['SYNA', 'syna', 'SYNC'], 'target': '0.02'},
+            {'name': 'missing', 'symbols': 'NOPE'},
+        ]}
+
+    def test_endpoint_slices_the_shared_universe(self):
+        response = self.client.post('/api/optimize/batch/', self.payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        pair, repeated, missing = response.json()['results']
+        single = run_optimization({'symbols': 'SYNA,SYNB', 'start': '2020-01-01', 'end': '2021-01-01', 'plot': False})
+        np.testing.assert_allclose(pair['weights'], single['weights'], atol=1e-5)
+        # A repeated ticker is solved once instead of making the covariance singular.
+        self.assertEqual((repeated['name'], repeated['symbols']), ('Batch 2', ['SYNA', 'SYNC']))
+        self.assertAlmostEqual(sum(repeated['weights']), 1.0)
+        self.assertIn('NOPE', missing['error'])
+        self.assertEqual(Portfolio.objects.count(), 0)
+
+    def test_save_and_command(self):
+        result = run_batch_optimization({**self.payload, 'save': 'true'})
+        saved = [r['portfolio_id'] for r in result['results'] if 'portfolio_id' in r]
+        self.assertEqual(len(saved), 2)
+        self.assertEqual(Portfolio.objects.get(pk=saved[0]).weights.count(), 2)
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as fh:
+            json.dump(self.payload, fh)
+        self.addCleanup(os.remove, fh.name)
+        out = StringIO()
+        call_command('run_optimizer', batch=fh.name, stdout=out)
+        self.assertEqual(Portfolio.objects.count(), 4)
+        self.assertIn('missing:', out.getvalue())
+
+
+@override_settings(PRICE_STORE_ENABLED=False)
+class ResultCacheTests(TestCase):
+    params = {'symbols': 'SYNA,SYNB,SYNC', 'start': '2020-01-01', 'end': '2021-01-01', 'plot': 'points'}
+
+    def setUp(self):
+        load_synthetic_prices(['SYNA', 'SYNB', 'SYNC'])
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = run_optimization(self.params)
+        second = run_optimization(self.params)
+        self.assertNotIn('cached', first)
+        self.assertTrue(second['cached'])
+        self.assertEqual(first['weights'], second['weights'])
+        self.assertEqual(first['frontier_points'], second['frontier_points'])
+
+    def test_new_prices_invalidate(self):
+        run_optimization(self.params)
+        Stock.objects.filter(symbol='SYNA').update(prices_version=F('prices_version') + 1)
+        self.assertNotIn('cached', run_optimization(self.params))
+
+    def test_saved_portfolio_is_reused(self):
+        first = run_optimization({**self.params, 'save': True})
+        second = run_optimization({**self.params, 'save': True})
+        self.assertEqual(first['portfolio_id'], second['portfolio_id'])
+        named = run_optimization({**self.params, 'save': True, 'name': 'Mine'})
+        self.assertNotEqual(named['portfolio_id'], first['portfolio_id'])
+        self.assertEqual(Portfolio.objects.get(pk=named['portfolio_id']).name, 'Mine')
+
+    def test_invalid_numbers_are_request_errors(self):
+        for field in ('target', 'risk_free'):
+            response = self.client.post('/api/optimize/', {**self.params, field: 'abc', 'allow_short': True},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['detail'], f'{field} must be a number')
+        for seed in ('abc', -1, 1.5):
+            response = self.client.post('/api/optimize/', {**self.params, 'monte_carlo': 100, 'seed': seed},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class JobLeaseTests(TestCase):
+    params = {'symbols': ['AAA']}
+
+    def kill_worker(self, job):
+        # The worker died without finishing: its heartbeat stops.
+        stale = timezone.now() - timedelta(seconds=jobs.lease_seconds() + 1)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=stale)
+
+    def test_lost_job_is_requeued_then_failed(self):
+        job, _ = jobs.enqueue(Job.KIND_OPTIMIZE, self.params)
+        self.assertEqual(jobs.claim_next().pk, job.pk)
+        self.kill_worker(job)
+        again, created = jobs.enqueue(Job.KIND_OPTIMIZE, self.params)
+        self.assertEqual((again.pk, again.status, created), (job.pk, Job.QUEUED, False))
+
+        claimed = jobs.claim_next()
+        self.assertEqual(claimed.attempts, 2)
+        self.kill_worker(job)
+        self.assertIsNone(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        fresh, created = jobs.enqueue(Job.KIND_OPTIMIZE, self.params)
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.pk, job.pk)
+
+    def test_symbol_lists_share_a_job(self):
+        job, _ = jobs.enqueue(Job.KIND_OPTIMIZE, {'symbols': 'aapl, msft', 'target': 0.1})
+        for symbols in (['MSFT', 'AAPL'], 'MSFT,aapl,MSFT'):
+            again, created = jobs.enqueue(Job.KIND_OPTIMIZE, {'symbols': symbols, 'target': 0.1})
+            self.assertEqual((again.pk, created), (job.pk, False))
+        batch, _ = jobs.enqueue(Job.KIND_OPTIMIZE_BATCH, {'jobs': [{'symbols': 'b,a'}, {'symbols': ['C']}]})
+        again, created = jobs.enqueue(Job.KIND_OPTIMIZE_BATCH, {'jobs': [{'symbols': ['A', 'B']}, {'symbols': 'c'}]})
+        self.assertEqual((again.pk, created), (batch.pk, False))
+        _, created = jobs.enqueue(Job.KIND_OPTIMIZE, {'symbols': 'AAPL,MSFT', 'target': 0.2})
+        self.assertTrue(created)
+
+    def test_taken_over_worker_does_not_overwrite(self):
+        jobs.enqueue(Job.KIND_OPTIMIZE, self.params)
+        job = jobs.claim_next()
+        self.kill_worker(job)
+        jobs.expire_stale()
+        with mock.patch.dict(jobs.HANDLERS, {Job.KIND_OPTIMIZE: lambda params, progress: {'ok': True}}):
+            finished = jobs.run_job(job)
+        self.assertEqual(finished.status, Job.QUEUED)
+        self.assertIsNone(finished.result)
+
+@override_settings(PRICE_STORE_ENABLED=False)
+class StreamOptimizeTests(TestCase):
+    params = {'symbols': 'SYNA,SYNB,SYNC', 'start': '2020-01-01', 'end': '2021-01-01'}
+
+    def setUp(self):
+        load_synthetic_prices(['SYNA', 'SYNB', 'SYNC'])
+
+    def test_events_match_run_optimization(self):
+        events = list(stream_optimization(self.params))
+        expected = run_optimization({**self.params, 'plot': 'points'})
+        self.assertEqual(events[0]['event'], 'portfolio')
+        self.assertEqual(events[0]['weights'], expected['weights'])
+        points = [{'volatility': e['volatility'], 'return': e['return']} for e in events[1:-1]]
+        self.assertEqual(points, expected['frontier_points'])
+        self.assertEqual(events[-1], {'event': 'done', 'points': len(points)})
+        # The completed stream populated the cache that run_optimization hit.
+        self.assertTrue(expected['cached'])
+
+    def test_closing_stops_without_caching(self):
+        events = stream_optimization(self.params)
+        next(events)
+        next(events)
+        events.close()
+        self.assertFalse(OptimizationResult.objects.exists())
+
+    def test_view_streams_ndjson(self):
+        response = self.client.post('/api/optimize/stream/', {**self.params, 'points': 5}, content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([e['event'] for e in lines], ['portfolio'] + ['point'] * 5 + ['done'])
+        response = self.client.post('/api/optimize/stream/', {'symbols': 'NOPE'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        for unsupported in ({'save': True}, {'monte_carlo': 1000}, {'plot': 'png'}):
+            response = self.client.post('/api/optimize/stream/', {**self.params, **unsupported},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SOLVER_PROFILE='balanced', SOLVE_LOG={'ENABLED': True, 'BATCH': 200})
+class SolverRegistryTests(TestCase):
+    def setUp(self):
+        solvers.drain()
+        self.mu, self.cov = random_problem(4, 60)
+
+    def test_falls_back_and_logs_attempts(self):
+        target = float(np.quantile(self.mu, 0.6))
+        first = solvers.candidates(60)[0]
+        # Starve the preferred solver of iterations so the next one takes over.
+        starved = {'CLARABEL': {'max_iter': 1}, 'OSQP': {'max_iter': 1}, 'SCS': {'max_iters': 1}}[first]
+        with mock.patch.dict(solvers.PROFILES['balanced']['options'], {first: starved}):
+            w = optimize_min_variance(self.mu, self.cov, target_return=target, method='cvxpy')
+        self.assertAlmostEqual(w @ self.cov @ w, cvxpy_reference(self.mu, self.cov, target), places=5)
+        self.assertEqual(solvers.flush(), 2)
+        log = list(SolveLog.objects.order_by('attempt'))
+        self.assertEqual([e.solver for e in log], solvers.candidates(60)[:2])
+        self.assertNotIn(log[0].status, solvers.OPTIMAL_OR_INACCURATE)
+        self.assertEqual(log[1].status, 'optimal')
+        self.assertIsNotNone(log[1].iterations)
+
+    def test_infeasible_problem_is_not_retried(self):
+        import cvxpy as cp
+        w = cp.Variable(len(self.mu))
+        problem = cp.Problem(cp.Minimize(cp.quad_form(w, cp.psd_wrap(self.cov))),
+                             [cp.sum(w) == 1, w >= 0, w @ self.mu >= float(self.mu.max()) + 1])
+        self.assertIsNone(solvers.solve(problem, len(self.mu)))
+        self.assertIn(problem.status, solvers.CONCLUSIVE)
+        self.assertEqual([e['solver'] for e in solvers.drain()], solvers.candidates(len(self.mu))[:1])
+
+    def test_retention_and_frontier_sampling(self):
+        SolveLog.objects.create(solver='OSQP', profile='balanced', context='optimize', status='optimal',
+                                attempt=0, n_assets=3, wall_time=0.1)
+        SolveLog.objects.update(created_at=timezone.now() - timedelta(days=30))
+        with override_settings(SOLVE_LOG={'MAX_AGE': 7 * 24 * 3600}):
+            self.assertEqual(solvers.prune(), 1)
+        mu, cov = random_problem(12, 5)
+        solvers.drain()
+        with override_settings(SOLVE_LOG={'FRONTIER_SAMPLE': 0.0}):
+            efficient_frontier(mu, cov, n_points=5, engine='parametric')
+        self.assertEqual(solvers.drain(), [])
+
+    def test_large_universes_prefer_osqp(self):
+        with override_settings(SOLVER_LARGE_ASSETS=100):
+            self.assertEqual(solvers.candidates(50)[0], 'CLARABEL')
+            self.assertEqual(solvers.candidates(500)[0], 'OSQP')
+            self.assertEqual(solvers.candidates(500, 'precise')[0], 'CLARABEL')
+
+
+
+def kill_current_process():
+    # Runs in an offload worker: die the way an OOM kill would.
+    os.kill(os.getpid(), signal.SIGKILL)
+
+@override_settings(PRICE_STORE_ENABLED=False, OFFLOAD_POOL_SIZE=1, OFFLOAD_QUEUE_SIZE=0)
+class AsyncOptimizeTests(TestCase):
+    params = {'symbols': 'SYNA,SYNB,SYNC', 'start': '2020-01-01', 'end': '2021-01-01', 'plot': 'points'}
+
+    def setUp(self):
+        load_synthetic_prices(['SYNA', 'SYNB', 'SYNC'])
+
+    @classmethod
+    def tearDownClass(cls):
+        offload.shutdown_pool()
+        super().tearDownClass()
+
+    async def test_matches_sync_endpoint(self):
+        response = await self.async_client.post('/api/async/optimize/', self.params, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        frontier = await self.async_client.post('/api/async/frontier/', {**self.params, 'points': 10},
+                                                content_type='application/json')
+        self.assertEqual(len(frontier.json()['frontier_points']), 10)
+        # The async run populated the result cache the sync path reads.
+        expected = await sync_to_async(run_optimization)(self.params)
+        self.assertTrue(expected['cached'])
+        self.assertEqual(result['weights'], expected['weights'])
+        self.assertEqual(result['frontier_points'], expected['frontier_points'])
+
+    async def test_full_pool_returns_429(self):
+        with mock.patch.object(offload, '_in_flight', offload.capacity()):
+            response = await self.async_client.post('/api/async/frontier/', self.params, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    async def test_dead_worker_is_replaced(self):
+        with self.assertRaises(offload.PoolBroken):
+            await offload.run(kill_current_process)
+        # The next call gets a fresh pool.
+        self.assertEqual(await offload.run(abs, -3), 3)
+        with mock.patch('analysis.optimization.arun_frontier', side_effect=offload.PoolBroken):
+            response = await self.async_client.post('/api/async/frontier/', self.params, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
+
+class StartupTests(SimpleTestCase):
+    def test_urlconf_does_not_import_numeric_stack(self):
+        # Raises CommandError if numpy, pandas, cvxpy, ... are imported.
+        call_command('import_audit', fail_on_heavy=True, stdout=StringIO())
+
+    def test_warmup_runs_only_from_the_server_entry_points(self):
+        from django.apps import apps
+        from . import warmup as module
+        with override_settings(WARMUP_ON_STARTUP=True), mock.patch.object(module, 'warmup') as run:
+            apps.get_app_config('analysis').ready()
+            run.assert_not_called()
+            module.warmup_on_startup()
+            run.assert_called_once_with()
+        with mock.patch.object(module, 'warmup') as run:
+            module.warmup_on_startup()
+            run.assert_not_called()
+
+    def test_warmup_solves_template_and_keeps_pending_log(self):
+        solvers.drain()
+        solvers.extend([{'solver': 'OSQP'}])
+        try:
+            timings = warmup(plot=False, pool=False)
+            self.assertEqual(solvers.drain(), [{'solver': 'OSQP'}])
+        finally:
+            solvers.drain()
+        for name in solvers.candidates(3):
+            self.assertIsNotNone(timings[f'solve:{name}'])
+        self.assertIsNotNone(timings['solve:parametric'])
+        self.assertNotIn('plot', timings)
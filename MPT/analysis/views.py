@@ -1,15 +1,28 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ParseError
 from django.core.management import call_command
-from stocks.models import Stock, Price
-from portfolios.models import Portfolio
-from .services import price_df_from_prices, compute_daily_returns, annualize_return, annualize_cov, optimize_min_variance
-from .serializers import PortfolioSerializer
-import os
+from stocks.models import Stock
+from django.db.models import Prefetch
+from portfolios.models import Portfolio, PortfolioWeight
+from .offload import PoolBroken, PoolBusy
+# analysis.optimization pulls in numpy/pandas/scipy; it is imported inside the
+# handlers that need it so loading the URLconf (and the stock and portfolio
+# lists) stays light. `manage.py import_audit` checks this.
+from .jobs import enqueue
+from .models import Job
+from .params import parse_flag
+from .serializers import PortfolioSerializer, JobSerializer
+from .metrics import REGISTRY
+from .pagination import PortfolioCursorPagination
+from .streaming import stream_format, stream_response
 from django.conf import settings
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import json
 from pathlib import Path
 
 
@@ -29,6 +42,21 @@ class StockListCreateAPIView(APIView):
 		return Response({'symbol': stock.symbol, 'name': stock.name, 'created': created})
 
 
+def request_flag(request, name, default=False):
+	try:
+		return parse_flag(request.data.get(name), default)
+	except ValueError:
+		raise ParseError(f'{name} must be true or false')
+
+
+def wants_async(request):
+	return request_flag(request, 'async', getattr(settings, 'JOBS_ASYNC_DEFAULT', False))
+
+
+def job_accepted(job, created):
+	return Response({'job_id': job.pk, 'status': job.status, 'deduplicated': not created}, status=status.HTTP_202_ACCEPTED)
+
+
 class FetchPricesAPIView(APIView):
 	def post(self, request):
 		symbols = request.data.get('symbols')
@@ -36,14 +64,19 @@ class FetchPricesAPIView(APIView):
 		end = request.data.get('end')
 		if not symbols:
 			return Response({'detail': 'symbols required'}, status=status.HTTP_400_BAD_REQUEST)
+		# call_command accepts kwargs matching the add_arguments names
+		# Incremental by default: only the parts of the window before the
+		# first and after the latest stored price are downloaded; pass
+		# incremental=false to re-fetch the whole window.
+		kwargs = {'symbols': symbols, 'incremental': request_flag(request, 'incremental', True)}
+		if start:
+			kwargs['start'] = start
+		if end:
+			kwargs['end'] = end
+		if wants_async(request):
+			return job_accepted(*enqueue(Job.KIND_FETCH_PRICES, kwargs))
 		# use management command to perform fetch (synchronous)
 		try:
-			# call_command accepts kwargs matching the add_arguments names
-			kwargs = {'symbols': symbols}
-			if start:
-				kwargs['start'] = start
-			if end:
-				kwargs['end'] = end
 			call_command('fetch_prices', **kwargs)
 		except Exception as e:
 			# return error message so the frontend can display it
@@ -53,49 +86,131 @@ class FetchPricesAPIView(APIView):
 
 class OptimizeAPIView(APIView):
 	def post(self, request):
-		symbols = request.data.get('symbols')
-		start = request.data.get('start')
-		end = request.data.get('end')
-		target = request.data.get('target')
-		make_plot = request.data.get('plot', True)
-
-		if not symbols:
+		params = {k: v for k, v in request.data.items() if k != 'async'}
+		if not params.get('symbols'):
 			return Response({'detail': 'symbols required'}, status=status.HTTP_400_BAD_REQUEST)
-		syms = [s.strip().upper() for s in symbols.split(',')]
-		qs = Price.objects.filter(stock__symbol__in=syms)
-		if start:
-			qs = qs.filter(date__gte=start)
-		if end:
-			qs = qs.filter(date__lte=end)
+		if wants_async(request):
+			return job_accepted(*enqueue(Job.KIND_OPTIMIZE, params))
+		from .optimization import run_optimization, OptimizationError
+		try:
+			result = run_optimization(params)
+		except OptimizationError as e:
+			return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(result)
 
-		price_df = price_df_from_prices(qs)
-		if price_df.empty:
-			return Response({'detail': 'no price data for given symbols/dates'}, status=status.HTTP_400_BAD_REQUEST)
 
-		daily_rets = compute_daily_returns(price_df)
-		mu_annual = annualize_return(daily_rets.mean())
-		cov_annual = annualize_cov(daily_rets.cov())
+class OptimizeStreamAPIView(APIView):
+	"""Optimize, streaming the portfolio and then each frontier point as NDJSON or SSE."""
+	def post(self, request):
+		params = dict(request.data.items())
+		if not params.get('symbols'):
+			return Response({'detail': 'symbols required'}, status=status.HTTP_400_BAD_REQUEST)
+		from .optimization import stream_optimization, OptimizationError
+		events = stream_optimization(params)
+		# Pull the first event here so request errors still get a 400.
+		try:
+			first = next(events)
+		except OptimizationError as e:
+			return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		return stream_response(request._request, events, stream_format(request), first=first)
 
-		weights = optimize_min_variance(mu_annual.values, cov_annual.values, target_return=target)
-		weights = weights / weights.sum()
 
-		result = {'symbols': list(price_df.columns), 'weights': [float(w) for w in weights], 'expected_return': float((weights @ mu_annual.values))}
+class BatchOptimizeAPIView(APIView):
+	def post(self, request):
+		params = {k: v for k, v in request.data.items() if k != 'async'}
+		if not params.get('jobs'):
+			return Response({'detail': 'jobs required'}, status=status.HTTP_400_BAD_REQUEST)
+		if wants_async(request):
+			return job_accepted(*enqueue(Job.KIND_OPTIMIZE_BATCH, params))
+		from .optimization import run_batch_optimization, OptimizationError
+		try:
+			result = run_batch_optimization(params)
+		except OptimizationError as e:
+			return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(result)
 
-		if make_plot:
-			# Lazy import plotting helpers so that matplotlib is only required when plotting
-			from .plotting import plot_frontier, efficient_frontier
-			rets, vols, w_list = efficient_frontier(mu_annual.values, cov_annual.values, optimize_min_variance, n_points=40)
-			filename = plot_frontier(rets, vols)
-			result['frontier_plot'] = os.path.basename(filename)
 
+class BacktestAPIView(APIView):
+	def post(self, request):
+		params = {k: v for k, v in request.data.items() if k != 'async'}
+		if not params.get('symbols'):
+			return Response({'detail': 'symbols required'}, status=status.HTTP_400_BAD_REQUEST)
+		if wants_async(request):
+			return job_accepted(*enqueue(Job.KIND_BACKTEST, params))
+		from .optimization import run_backtest_request, OptimizationError
+		try:
+			result = run_backtest_request(params)
+		except OptimizationError as e:
+			return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 		return Response(result)
 
 
+async def _offloaded(request, handler):
+	# Shared by the async views: the heavy work runs on analysis.offload's
+	# process pool; a saturated pool is reported as 429, a dead worker as 503.
+	try:
+		params = json.loads(request.body or b'{}')
+	except ValueError:
+		return JsonResponse({'detail': 'invalid JSON body'}, status=400)
+	if not isinstance(params, dict) or not params.get('symbols'):
+		return JsonResponse({'detail': 'symbols required'}, status=400)
+	from .optimization import OptimizationError
+	try:
+		result = await handler(params)
+	except OptimizationError as e:
+		return JsonResponse({'detail': str(e)}, status=400)
+	except PoolBusy:
+		response = JsonResponse({'detail': 'optimizer busy, retry shortly'}, status=429)
+		response['Retry-After'] = '1'
+		return response
+	except PoolBroken:
+		# A worker died mid-request (e.g. out of memory); the pool restarts.
+		response = JsonResponse({'detail': 'optimizer worker failed, retry shortly'}, status=503)
+		response['Retry-After'] = '1'
+		return response
+	return JsonResponse(result)
+
+
+@csrf_exempt
+@require_POST
+async def optimize_async_view(request):
+	"""Same payload and response as /api/optimize/ (without ``save``), served without blocking under ASGI."""
+	from .optimization import arun_optimization
+	return await _offloaded(request, arun_optimization)
+
+
+@csrf_exempt
+@require_POST
+async def frontier_async_view(request):
+	"""Efficient frontier points for ``symbols`` (optional ``points``, ``allow_short``, ``frontier_engine``)."""
+	from .optimization import arun_frontier
+	return await _offloaded(request, arun_frontier)
+
+
+def metrics_view(request):
+	return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class JobDetailAPIView(APIView):
+	def get(self, request, pk):
+		job = get_object_or_404(Job, pk=pk)
+		return Response(JobSerializer(job).data)
+
+
 class PortfolioListAPIView(APIView):
 	def get(self, request):
-		qs = Portfolio.objects.all().order_by('-created_at')
-		serializer = PortfolioSerializer(qs, many=True)
-		return Response(serializer.data)
+		# Two queries per page: the portfolios, then all their weights with
+		# the stock symbol joined in.
+		weights = PortfolioWeight.objects.select_related('stock').only('portfolio_id', 'weight', 'stock__symbol')
+		qs = Portfolio.objects.prefetch_related(Prefetch('weights', queryset=weights))
+		# A plain list unless the client asks for pages, so clients written
+		# against the unpaginated API keep working.
+		if 'cursor' not in request.query_params and 'page_size' not in request.query_params:
+			qs = qs.order_by(*PortfolioCursorPagination.ordering)
+			return Response(PortfolioSerializer(qs, many=True).data)
+		paginator = PortfolioCursorPagination()
+		page = paginator.paginate_queryset(qs, request, view=self)
+		return paginator.get_paginated_response(PortfolioSerializer(page, many=True).data)
 
 
 def index_view(request):
@@ -0,0 +1,131 @@
+"""Preload the numeric stack before a worker takes traffic.
+
+The first optimize request in a fresh process otherwise pays for importing
+numpy/pandas/scipy/cvxpy, for cvxpy canonicalizing its first problem and
+loading each solver, and the first plot for importing matplotlib.
+``warmup()`` does all of that on a 3-asset template problem. It runs from the
+server entry points (``MPT/wsgi.py``, ``MPT/asgi.py``) when
+``WARMUP_ON_STARTUP`` is set, or on demand via ``manage.py warmup``; other
+management commands, the job worker and offload workers never load those
+modules, so they start cold. Solve log entries of the template solves are dropped.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_MU = [0.08, 0.12, 0.10]
+TEMPLATE_COV = [[0.040, 0.006, 0.004],
+                [0.006, 0.090, 0.010],
+                [0.004, 0.010, 0.060]]
+
+
+def _noop():
+    return None
+
+
+@contextmanager
+def _step(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # A failed step only means that part stays cold.
+        logger.warning('warmup step %s failed', name, exc_info=True)
+        timings[name] = None
+    else:
+        timings[name] = time.perf_counter() - start
+
+
+def warmup(plot=None, pool=None):
+    """Run the warmup steps; return ``{step: seconds}`` (None for a failed step).
+
+    ``plot`` and ``pool`` default to ``WARMUP_PLOT`` and
+    ``WARMUP_OFFLOAD_POOL``. The offload pool is never started from inside
+    one of its own workers.
+    """
+    from . import offload, solvers
+
+    if plot is None:
+        plot = getattr(settings, 'WARMUP_PLOT', True)
+    if pool is None:
+        pool = getattr(settings, 'WARMUP_OFFLOAD_POOL', False)
+    timings = {}
+    pending = solvers.drain()
+    start = time.perf_counter()
+
+    with _step(timings, 'import'):
+        import numpy  # noqa: F401
+        import pandas  # noqa: F401
+        import scipy.linalg  # noqa: F401
+        import cvxpy  # noqa: F401
+        from . import optimization  # noqa: F401
+
+    import numpy as np
+    mu, cov = np.array(TEMPLATE_MU), np.array(TEMPLATE_COV)
+    target = float(mu.mean())
+
+    for name in _template_solvers(timings):
+        with _step(timings, f'solve:{name}'):
+            _solve_template(mu, cov, target, name)
+    with _step(timings, 'solve:parametric'):
+        from .frontier import ParametricFrontier
+        frontier = ParametricFrontier(mu, cov)
+        for t in (target, float(mu.max())):
+            frontier.solve(t)
+    with _step(timings, 'solve:active_set'):
+        from .services import optimize_min_variance
+        optimize_min_variance(mu, cov, target_return=target, method='active_set')
+    with _step(timings, 'solve:closed_form'):
+        from .services import optimize_min_variance
+        optimize_min_variance(mu, cov, target_return=target, allow_short=True, method='closed_form')
+
+    if plot:
+        with _step(timings, 'plot'):
+            from .plotting import _render_frontier
+            _render_frontier(mu, np.sqrt(np.diag(cov)), BytesIO())
+    if pool and not offload.in_worker():
+        with _step(timings, 'offload_pool'):
+            executor = offload.get_pool()
+            # One call per worker: each one has to start and set Django up.
+            for future in [executor.submit(_noop) for _ in range(offload.pool_size())]:
+                future.result()
+
+    solvers.drain()
+    solvers.extend(pending)
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def warmup_on_startup():
+    """Called by the WSGI/ASGI modules once the application is loaded."""
+    if getattr(settings, 'WARMUP_ON_STARTUP', False):
+        timings = warmup()
+        logger.info('warmup took %.2fs', timings['total'])
+
+
+def _template_solvers(timings):
+    from . import solvers
+    try:
+        return solvers.candidates(len(TEMPLATE_MU))
+    except Exception:
+        logger.warning('warmup could not list solvers', exc_info=True)
+        timings['solvers'] = None
+        return []
+
+
+def _solve_template(mu, cov, target, solver):
+    import cvxpy as cp
+    from . import solvers
+    from .services import cvxpy_variance
+
+    w = cp.Variable(len(mu))
+    objective, constraints = cvxpy_variance(w, cov)
+    constraints += [cp.sum(w) == 1, w >= 0, w @ mu >= target]
+    problem = cp.Problem(cp.Minimize(objective), constraints)
+    if solvers.solve(problem, len(mu), order=[solver]) is None:
+        raise RuntimeError(f'{solver} did not solve the template problem: {problem.status}')
@@ -1,21 +1,30 @@
+import json
 from datetime import date, timedelta
-import numpy as np
-from django.core.management.base import BaseCommand
-from stocks.models import Stock, Price
-from portfolios.models import Portfolio, PortfolioWeight
-from analysis.services import price_df_from_prices, compute_daily_returns, annualize_return, annualize_cov, optimize_min_variance
+from django.core.management.base import BaseCommand, CommandError
+from portfolios.models import Portfolio
+from analysis import solvers
+from analysis.optimization import run_optimization, run_batch_optimization, OptimizationError
 
 
 class Command(BaseCommand):
     help = "Run optimizer for selected symbols and save a Portfolio."
 
     def add_arguments(self, parser):
-        parser.add_argument('--symbols', type=str, required=True, help='Comma-separated symbols')
+        parser.add_argument('--symbols', type=str, required=False, help='Comma-separated symbols')
         parser.add_argument('--start', type=str, required=False, help='YYYY-MM-DD start date')
         parser.add_argument('--end', type=str, required=False, help='YYYY-MM-DD end date')
         parser.add_argument('--target', type=float, required=False, help='Target annual return (decimal, e.g., 0.12)')
+        parser.add_argument('--cov-model', type=str, default='sample', choices=['sample', 'factor'],
+                            help='Covariance estimator: dense sample covariance or a PCA factor model')
+        parser.add_argument('--n-factors', type=int, required=False, help='Factors for --cov-model factor')
+        parser.add_argument('--batch', type=str, required=False,
+                            help='JSON file with a batch request (same format as /api/optimize/batch/)')
 
     def handle(self, *args, **options):
+        if options.get('batch'):
+            return self.handle_batch(options)
+        if not options.get('symbols'):
+            raise CommandError('--symbols or --batch is required')
         symbols = [s.strip().upper() for s in options['symbols'].split(',')]
         start = options.get('start')
         end = options.get('end')
@@ -26,26 +35,41 @@ class Command(BaseCommand):
         if not start:
             start = (date.today() - timedelta(days=365)).isoformat()
 
-        qs = Price.objects.filter(stock__symbol__in=symbols, date__gte=start, date__lte=end)
-        price_df = price_df_from_prices(qs)
-        if price_df.empty:
-            self.stdout.write(self.style.ERROR("No price data found for given symbols/date range."))
+        # Shares the optimize endpoint's path, including the result cache: a
+        # repeat run over unchanged prices reuses the same portfolio.
+        params = {'symbols': symbols, 'start': start, 'end': end, 'target': options.get('target'),
+                  'cov_model': options['cov_model'], 'n_factors': options.get('n_factors'), 'plot': False,
+                  'save': True, 'name': f"Opt {'+'.join(symbols)} {date.today().isoformat()}"}
+        try:
+            result = run_optimization(params)
+        except OptimizationError as e:
+            self.stdout.write(self.style.ERROR(f"{e}"))
             return
+        finally:
+            solvers.flush()
 
-        daily_rets = compute_daily_returns(price_df)
-        mu_annual = annualize_return(daily_rets.mean())
-        cov_annual = annualize_cov(daily_rets.cov())
+        p = Portfolio.objects.get(pk=result['portfolio_id'])
+        verb = 'Reused' if result.get('cached') else 'Saved'
+        self.stdout.write(self.style.SUCCESS(f"{verb} portfolio {p.name}"))
 
-        target = options.get('target')
-        weights = optimize_min_variance(mu_annual.values, cov_annual.values, target_return=target)
-
-        # Normalize small numerical noise
-        weights = np.array(weights, dtype=float)
-        weights = weights / weights.sum()
-
-        p = Portfolio.objects.create(name=f"Opt {'+'.join(symbols)} {date.today().isoformat()}", target_return=target)
-        for sym, w in zip(price_df.columns, weights):
-            stock = Stock.objects.get(symbol=sym)
-            PortfolioWeight.objects.create(portfolio=p, stock=stock, weight=float(w))
-
-        self.stdout.write(self.style.SUCCESS(f"Saved portfolio {p.name}"))
+    def handle_batch(self, options):
+        with open(options['batch']) as f:
+            params = json.load(f)
+        # Command-line dates override the file, as for single runs.
+        for key in ('start', 'end'):
+            if options.get(key):
+                params[key] = options[key]
+        params.setdefault('end', date.today().isoformat())
+        params.setdefault('start', (date.today() - timedelta(days=365)).isoformat())
+        params['save'] = True
+        try:
+            result = run_batch_optimization(params)
+        except OptimizationError as e:
+            raise CommandError(str(e))
+        finally:
+            solvers.flush()
+        for r in result['results']:
+            if 'error' in r:
+                self.stdout.write(self.style.ERROR(f"{r['name']}: {r['error']}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Saved portfolio {r['name']} (id {r['portfolio_id']})"))
@@ -8,6 +8,9 @@ class Portfolio(models.Model):
     target_return = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['-created_at', '-id'], name='portfolio_created_desc')]
+
     def __str__(self):
         return self.name
 
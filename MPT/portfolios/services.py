@@ -0,0 +1,25 @@
+from django.db import transaction
+from stocks.models import Stock
+from .models import Portfolio, PortfolioWeight
+
+
+def save_portfolios(entries):
+    """Persist many optimized portfolios in one transaction.
+
+    ``entries`` is an iterable of dicts with ``name``, ``target_return``,
+    ``symbols`` and ``weights``. Returns the created Portfolio objects in the
+    same order. Uses one query for the stock ids and one bulk insert each for
+    portfolios and weights.
+    """
+    entries = list(entries)
+    symbols = {s for e in entries for s in e['symbols']}
+    stock_ids = dict(Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'id'))
+    with transaction.atomic():
+        portfolios = Portfolio.objects.bulk_create(
+            [Portfolio(name=e['name'], target_return=e.get('target_return')) for e in entries])
+        PortfolioWeight.objects.bulk_create([
+            PortfolioWeight(portfolio=p, stock_id=stock_ids[sym], weight=float(w))
+            for p, e in zip(portfolios, entries)
+            for sym, w in zip(e['symbols'], e['weights'])
+        ])
+    return portfolios
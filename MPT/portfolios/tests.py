@@ -1,3 +1,61 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from stocks.models import Stock
+from .models import Portfolio, PortfolioWeight
+from .services import save_portfolios
+
+
+def entry(name, symbols):
+    weight = 1 / len(symbols)
+    return {'name': name, 'target_return': 0.1, 'symbols': symbols, 'weights': [weight] * len(symbols)}
+
+
+class SavePortfoliosTests(TestCase):
+    def setUp(self):
+        for symbol in ('AAA', 'BBB', 'CCC'):
+            Stock.objects.create(symbol=symbol)
+
+    def test_saves_portfolios_and_weights_in_order(self):
+        saved = save_portfolios([entry('first', ['AAA', 'BBB']), entry('second', ['CCC'])])
+        self.assertEqual([p.name for p in saved], ['first', 'second'])
+        self.assertTrue(all(p.pk for p in saved))
+        weights = {(w.portfolio.name, w.stock.symbol): w.weight
+                   for w in PortfolioWeight.objects.select_related('portfolio', 'stock')}
+        self.assertEqual(weights, {('first', 'AAA'): 0.5, ('first', 'BBB'): 0.5, ('second', 'CCC'): 1.0})
+        self.assertEqual(saved[0].target_return, 0.1)
+
+    def test_query_count_does_not_grow_with_portfolios(self):
+        with CaptureQueriesContext(connection) as one:
+            save_portfolios([entry('one', ['AAA'])])
+        with self.assertNumQueries(len(one)):
+            save_portfolios([entry(f'p{i}', ['AAA', 'BBB', 'CCC']) for i in range(20)])
+
+
+class PortfolioListTests(TestCase):
+    def setUp(self):
+        for symbol in ('AAA', 'BBB'):
+            Stock.objects.create(symbol=symbol)
+        save_portfolios([entry(f'p{i}', ['AAA', 'BBB']) for i in range(5)])
+        # Newest first, ties on created_at broken by id.
+        self.expected = list(Portfolio.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_default_is_a_plain_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/portfolios/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.json()], self.expected)
+        weights = sorted(response.json()[0]['weights'], key=lambda w: w['stock'])
+        self.assertEqual(weights, [{'stock': 'AAA', 'weight': 0.5}, {'stock': 'BBB', 'weight': 0.5}])
+
+    def test_cursor_pages_cover_every_portfolio_once(self):
+        url, ids = '/api/portfolios/?page_size=2', []
+        while url:
+            with self.assertNumQueries(2):
+                page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            self.assertTrue(all(len(p['weights']) == 2 for p in page['results']))
+            ids += [p['id'] for p in page['results']]
+            url = page['next']
+        self.assertEqual(ids, self.expected)
@@ -0,0 +1,86 @@
+"""Vectorized conversion of provider DataFrames into Price rows."""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from stocks.models import Price
+
+
+# Model field -> accepted provider column names (first match wins).
+COLUMNS = {
+    'open': ('Open',),
+    'high': ('High',),
+    'low': ('Low',),
+    'close': ('Close',),
+    'adjusted_close': ('Adj Close', 'Adj_Close', 'AdjClose'),
+    'volume': ('Volume',),
+}
+UPDATE_FIELDS = list(COLUMNS)
+
+
+def insert_batch_size():
+    return getattr(settings, 'PRICE_INSERT_BATCH_SIZE', 1000)
+
+
+def flatten_columns(df, symbol=None):
+    """Reduce yfinance MultiIndex columns to one level of field names.
+
+    yfinance returns ``(Price, Ticker)`` columns by default and
+    ``(Ticker, Price)`` with ``group_by='ticker'``, even for one symbol.
+    """
+    if not isinstance(df.columns, pd.MultiIndex):
+        return df
+    fields = {name for names in COLUMNS.values() for name in names}
+    for level in range(df.columns.nlevels):
+        values = set(df.columns.get_level_values(level))
+        if symbol is not None and symbol in values:
+            df = df.xs(symbol, axis=1, level=level)
+            return flatten_columns(df)
+    for level in range(df.columns.nlevels):
+        if fields & set(df.columns.get_level_values(level)):
+            df = df.copy()
+            df.columns = df.columns.get_level_values(level)
+            return df.loc[:, ~df.columns.duplicated()]
+    return df
+
+
+def frame_to_columns(df, symbol=None):
+    """Return a frame indexed by ``datetime.date`` with the Price field columns.
+
+    Rows without a close price are dropped since ``Price.close`` is required.
+    """
+    df = flatten_columns(df, symbol)
+    if 'Date' in df.columns:
+        df = df.set_index('Date')
+    index = pd.DatetimeIndex(df.index)
+    data = {}
+    for field, names in COLUMNS.items():
+        name = next((n for n in names if n in df.columns), None)
+        data[field] = pd.to_numeric(df[name], errors='coerce').to_numpy() if name else np.full(len(df), np.nan)
+    out = pd.DataFrame(data, index=index.date)
+    out = out[out['close'].notna()]
+    return out[~out.index.duplicated(keep='last')]
+
+
+def prices_from_frame(stock, df, symbol=None):
+    """Build unsaved Price instances for ``stock`` from a provider frame."""
+    cols = frame_to_columns(df, symbol)
+    volume = cols.pop('volume').round().astype('Int64')
+    # NaN -> None for the whole frame at once, then one tuple per row.
+    values = cols.astype(object).where(cols.notna(), None)
+    values['volume'] = volume.astype(object).where(volume.notna(), None)
+    return [
+        Price(stock=stock, date=d, open=o, high=h, low=lo, close=c, adjusted_close=a, volume=v)
+        for d, (o, h, lo, c, a, v) in zip(values.index, values[UPDATE_FIELDS].itertuples(index=False, name=None))
+    ]
+
+
+def upsert_prices(prices, batch_size=None):
+    """Insert rows, overwriting stored rows for the same (stock, date)."""
+    Price.objects.bulk_create(
+        prices,
+        batch_size=batch_size or insert_batch_size(),
+        update_conflicts=True,
+        unique_fields=['stock', 'date'],
+        update_fields=UPDATE_FIELDS,
+    )
+    return len(prices)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from stocks.models import Stock, Price
+from stocks.price_store import get_price_store
+from analysis.services import price_df_from_prices
+
+
+class Command(BaseCommand):
+    help = 'Load prices from the database into the memory-mapped price store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=str, help='Comma-separated symbols to load (default: all)', required=False)
+        parser.add_argument('--chunk', type=int, default=200, help='Symbols loaded per database query')
+
+    def handle(self, *args, **options):
+        symbols = options.get('symbols')
+        if symbols:
+            symbols = [s.strip().upper() for s in symbols.split(',')]
+        else:
+            symbols = list(Stock.objects.order_by('symbol').values_list('symbol', flat=True))
+
+        store = get_price_store()
+        chunk = max(1, options['chunk'])
+        generation = store.generation
+        for i in range(0, len(symbols), chunk):
+            batch = symbols[i:i + chunk]
+            df = price_df_from_prices(Price.objects.filter(stock__symbol__in=batch))
+            if df.empty:
+                continue
+            generation = store.append(df)
+            self.stdout.write(f'Loaded {len(df.columns)} symbols ({i + len(batch)}/{len(symbols)})')
+
+        self.stdout.write(self.style.SUCCESS(f'Price store at {store.path} is at generation {generation}'))
@@ -1,17 +1,40 @@
-import yfinance as yf
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Max, Min, Q
 from stocks.models import Stock, Price
+from stocks.price_store import get_price_store, store_enabled
+from stocks.providers import get_provider
+from stocks.ingest import prices_from_frame, upsert_prices
+from analysis.metrics import stage
+from analysis.services import price_df_from_prices
 from datetime import datetime, timedelta
 import pandas as pd
 
 class Command(BaseCommand):
     help = 'Fetch historical prices for stocks in DB'
+    # progress_callback(fraction, message) is only available via call_command.
+    stealth_options = ('progress_callback',)
 
     def add_arguments(self, parser):
         parser.add_argument('--start', type=str, help='YYYY-MM-DD start date', required=False)
         parser.add_argument('--end', type=str, help='YYYY-MM-DD end date', required=False)
         parser.add_argument('--symbols', type=str, help='Comma-separated symbols to fetch', required=False)
+        parser.add_argument('--provider', type=str, help='Price provider (default: settings.PRICE_PROVIDER)', required=False)
+        parser.add_argument('--batch-size', type=int, help='Symbols per download request (default: provider limit)', required=False)
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent download threads')
+        parser.add_argument('--retries', type=int, default=3, help='Retries per batch before giving up')
+        parser.add_argument('--backoff', type=float, default=1.0, help='Initial retry delay in seconds (doubles each retry)')
+        parser.add_argument('--insert-batch-size', type=int, required=False,
+                            help='Rows per upsert statement (default: settings.PRICE_INSERT_BATCH_SIZE)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Skip dates already stored for each stock: only fetch the part of '
+                                 '--start..--end before its first and after its latest stored price')
 
+    @stage('fetch_prices')
     def handle(self, *args, **options):
         end = options.get('end') or datetime.today().strftime('%Y-%m-%d')
         start = options.get('start') or (datetime.today() - timedelta(days=365)).strftime('%Y-%m-%d')
@@ -21,79 +44,144 @@ class Command(BaseCommand):
             stocks = Stock.objects.filter(symbol__in=symbols)
         else:
             stocks = Stock.objects.all()
+        stocks = {s.symbol: s for s in stocks}
 
-        for stock in stocks:
-            try:
-                df = yf.download(stock.symbol, start=start, end=end, progress=False)
-            except Exception as e:
-                # propagate exception so callers (API) can see it
-                raise RuntimeError(f'yfinance failed for {stock.symbol}: {e}')
-
-            if df is None or df.empty:
-                self.stdout.write(self.style.WARNING(f'No data for {stock.symbol}'))
-                continue
+        provider = get_provider(options.get('provider'))
+        batch_size = max(1, options.get('batch_size') or provider.max_batch_size)
+        # Symbols that share a download window are requested together.
+        windows = {}
+        if options.get('incremental'):
+            wanted = self._incremental_windows(stocks, start, end)
+        else:
+            wanted = [(s, start, end) for s in stocks]
+        for symbol, window_start, window_end in wanted:
+            windows.setdefault((window_start, window_end), []).append(symbol)
+        batches = []
+        for window, names in sorted(windows.items()):
+            names.sort()
+            batches += [(window, names[i:i + batch_size]) for i in range(0, len(names), batch_size)]
 
-            # Ensure index is a DatetimeIndex and iterate rows safely
-            df = df.reset_index()
-            prices = []
-            for row in df.itertuples(index=False):
-                # row fields: Date, Open, High, Low, Close, Adj Close, Volume (depending on yfinance)
-                try:
-                    date_val = getattr(row, 'Date')
-                except Exception:
-                    date_val = row[0]
+        # Downloads run on a bounded thread pool while a single writer thread
+        # drains finished frames into the database, so network and DB I/O overlap.
+        pending = queue.Queue(maxsize=max(2, 2 * options['workers']))
+        fetched = {}
+        writer_errors = []
+        writer = threading.Thread(target=self._writer, daemon=True,
+                                  args=(pending, fetched, writer_errors, options.get('insert_batch_size')))
+        writer.start()
+        progress = options.get('progress_callback')
+        done, total = 0, sum(len(batch) for _, batch in batches)
+        # Symbols whose download from --start completed, whatever it returned.
+        backfilled = []
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+                futures = {pool.submit(self._download, provider, batch, batch_start, batch_end, options['retries'],
+                                       options['backoff']): (batch_start, batch)
+                           for (batch_start, batch_end), batch in batches}
+                for future in as_completed(futures):
+                    frames = future.result()
+                    batch_start, batch = futures[future]
+                    if batch_start == start:
+                        backfilled += batch
+                    for symbol in batch:
+                        df = frames.get(symbol)
+                        if df is None or df.empty:
+                            self.stdout.write(self.style.WARNING(f'No data for {symbol}'))
+                            continue
+                        pending.put((stocks[symbol], df))
+                    done += len(batch)
+                    if progress:
+                        progress(done / total, f'downloaded {done}/{total} symbols')
+                    if writer_errors:
+                        break
+        finally:
+            pending.put(None)
+            writer.join()
+        if writer_errors:
+            raise writer_errors[0]
+        if backfilled:
+            Stock.objects.filter(symbol__in=backfilled).filter(
+                Q(backfilled_from__isnull=True) | Q(backfilled_from__gt=start)).update(backfilled_from=start)
 
-                def get_field(obj, name, idx):
-                    try:
-                        return getattr(obj, name)
-                    except Exception:
-                        try:
-                            return obj[idx]
-                        except Exception:
-                            return None
+        if store_enabled() and fetched:
+            store = get_price_store()
+            frame = pd.DataFrame(fetched)
+            frame.index = pd.DatetimeIndex(frame.index, name='date')
+            # The store would serve a symbol's first append as its whole
+            # history, so a symbol it has never held gets everything stored
+            # in the database, not just the window downloaded now.
+            new = [s for s in frame.columns if not store.has_symbols([s])]
+            if new:
+                frame = price_df_from_prices(Price.objects.filter(stock__symbol__in=new)).combine_first(frame)
+            generation = store.append(frame)
+            self.stdout.write(self.style.SUCCESS(f'Price store updated to generation {generation}'))
 
-                open_v = get_field(row, 'Open', 1)
-                high_v = get_field(row, 'High', 2)
-                low_v = get_field(row, 'Low', 3)
-                close_v = get_field(row, 'Close', 4)
-                adj_v = get_field(row, 'Adj Close', 5) or get_field(row, 'Adj_Close', 5)
-                vol_v = get_field(row, 'Volume', 6)
+    def _incremental_windows(self, stocks, start, end):
+        # (symbol, start, end) windows not covered by stored prices: before
+        # the first stored date (a backfill) and after the latest one. One
+        # aggregate query for the stored range of every stock. A backfill
+        # stops at backfilled_from when that is earlier: the provider had
+        # nothing from there to the first stored price.
+        stored = {stock_id: (first, last) for stock_id, first, last in
+                  Price.objects.filter(stock__in=stocks.values()).values('stock_id')
+                  .annotate(first=Min('date'), last=Max('date')).values_list('stock_id', 'first', 'last')}
+        windows = []
+        for symbol, stock in stocks.items():
+            if stock.pk not in stored:
+                windows.append((symbol, start, end))
+                continue
+            first, last = stored[stock.pk]
+            if stock.backfilled_from is not None:
+                first = min(first, stock.backfilled_from)
+            after = (last + timedelta(days=1)).isoformat()
+            gaps = [(start, min(first.isoformat(), end)), (max(after, start), end)]
+            gaps = [(s, e) for s, e in gaps if s < e]
+            if not gaps:
+                self.stdout.write(f'{symbol} is up to date')
+            windows += [(symbol, s, e) for s, e in gaps]
+        return windows
 
-                # Normalize NaN -> None, and safe int conversion for volume
-                if pd.isna(open_v):
-                    open_v = None
-                if pd.isna(high_v):
-                    high_v = None
-                if pd.isna(low_v):
-                    low_v = None
-                if pd.isna(close_v):
-                    close_v = None
-                if pd.isna(adj_v):
-                    adj_v = None
+    @stage('fetch_download')
+    def _download(self, provider, batch, start, end, retries, backoff):
+        for attempt in range(retries + 1):
+            try:
+                return provider.fetch(batch, start, end)
+            except Exception as e:
+                if attempt == retries:
+                    # propagate exception so callers (API) can see it
+                    raise RuntimeError(f"{provider.name} failed for {', '.join(batch)}: {e}")
+                time.sleep(backoff * 2 ** attempt)
 
-                if vol_v is None or (isinstance(vol_v, float) and pd.isna(vol_v)):
-                    vol_int = None
-                else:
-                    try:
-                        vol_int = int(vol_v)
-                    except Exception:
-                        vol_int = None
+    def _writer(self, pending, fetched, errors, batch_size):
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                if errors:
+                    continue
+                stock, df = item
+                try:
+                    series = self._write_prices(stock, df, batch_size)
+                    # A backfill and a tail window of the same stock both land here.
+                    previous = fetched.get(stock.symbol)
+                    fetched[stock.symbol] = series if previous is None else series.combine_first(previous)
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            connection.close()
 
-                prices.append(Price(
-                    stock=stock,
-                    date=date_val.date() if hasattr(date_val, 'date') else date_val,
-                    open=open_v,
-                    high=high_v,
-                    low=low_v,
-                    close=close_v,
-                    adjusted_close=adj_v,
-                    volume=vol_int
-                ))
+    @stage('fetch_write')
+    def _write_prices(self, stock, df, batch_size):
+        prices = prices_from_frame(stock, df, stock.symbol)
+        try:
+            upsert_prices(prices, batch_size=batch_size)
+        except Exception as e:
+            raise RuntimeError(f'DB bulk insert failed for {stock.symbol}: {e}')
 
-            # Bulk create; optionally handle existing duplicates
-            try:
-                Price.objects.bulk_create(prices, ignore_conflicts=True)
-            except Exception as e:
-                raise RuntimeError(f'DB bulk insert failed for {stock.symbol}: {e}')
+        if prices:
+            Stock.objects.filter(pk=stock.pk).update(prices_version=F('prices_version') + 1)
 
-            self.stdout.write(self.style.SUCCESS(f'Imported {len(prices)} rows for {stock.symbol}'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(prices)} rows for {stock.symbol}'))
+        return pd.Series({p.date: p.adjusted_close if p.adjusted_close is not None else p.close for p in prices},
+                         dtype=float)
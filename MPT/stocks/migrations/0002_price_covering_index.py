@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['stock', 'date', 'adjusted_close', 'close'], name='price_stock_date_cover'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0002_price_covering_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='prices_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
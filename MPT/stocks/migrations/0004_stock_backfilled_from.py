@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0003_stock_prices_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='backfilled_from',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -4,6 +4,13 @@ class Stock(models.Model):
     symbol = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=200, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by fetch_prices whenever rows are written for this stock; used to
+    # invalidate cached estimates that depend on its price history.
+    prices_version = models.PositiveIntegerField(default=0)
+    # Earliest --start fetch_prices has downloaded this stock from. The
+    # provider has nothing between it and the first stored price (IPOs,
+    # leading holidays), so an incremental fetch does not re-request that gap.
+    backfilled_from = models.DateField(null=True, blank=True)
 
     def __str__(self):
         return self.symbol
@@ -21,6 +28,11 @@ class Price(models.Model):
     class Meta:
         unique_together = ('stock', 'date')
         ordering = ['-date']
+        indexes = [
+            # Covers the (stock_id, date, coalesce(adjusted_close, close)) bulk
+            # load so it stays an index-only range scan on SQLite and Postgres.
+            models.Index(fields=['stock', 'date', 'adjusted_close', 'close'], name='price_stock_date_cover'),
+        ]
     
     def __str__(self):
         return f"{self.stock.symbol} {self.date}"
@@ -0,0 +1,253 @@
+"""Columnar, memory-mapped price store.
+
+The store keeps one contiguous float64 matrix of prices laid out symbol-major
+(``values[symbol, date]``) together with sorted date and symbol index arrays.
+Every worker process maps the matrix read-only, so the operating system page
+cache holds a single copy no matter how many workers are running.
+
+Writers never modify a published generation in place: ``append`` writes a new
+``gen-<n>`` directory and atomically swaps ``manifest.json`` to point at it.
+Readers notice the new generation on their next ``load`` and remap; a
+``load`` works on one Snapshot throughout, so it never mixes generations. The
+generation just replaced is kept so a reader that read the old manifest can
+still open its files; older ones are deleted by a later ``append`` once they
+have been superseded for ``PRICE_STORE_GRACE_SECONDS``.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are expected to be serialized externally
+    fcntl = None
+
+
+MANIFEST = 'manifest.json'
+
+# One mapped generation. It is built whole and published with a single
+# assignment, so a reader that takes it once never mixes two generations.
+Snapshot = namedtuple('Snapshot', ['generation', 'dates', 'symbols', 'values', 'positions'])
+
+
+def store_dir():
+    return getattr(settings, 'PRICE_STORE_DIR', None) or os.path.join(settings.BASE_DIR, 'price_store')
+
+
+def store_enabled():
+    return getattr(settings, 'PRICE_STORE_ENABLED', False)
+
+
+def grace_seconds():
+    return getattr(settings, 'PRICE_STORE_GRACE_SECONDS', 300)
+
+
+class PriceStore:
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._snapshot = None
+
+    # -- reading -----------------------------------------------------------
+
+    def _read_manifest(self):
+        with open(os.path.join(self.path, MANIFEST)) as fh:
+            return json.load(fh)
+
+    def _refresh(self):
+        """Return the current Snapshot, remapping if a writer has published a
+        new generation; None when the store is empty."""
+        manifest_path = os.path.join(self.path, MANIFEST)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            self._snapshot = None
+            return None
+        snapshot = self._snapshot
+        if mtime == self._manifest_mtime and snapshot is not None:
+            return snapshot
+        with self._lock:
+            manifest = self._read_manifest()
+            snapshot = self._snapshot
+            if snapshot is None or manifest['generation'] != snapshot.generation:
+                snapshot = self._map(manifest)
+                self._snapshot = snapshot
+            self._manifest_mtime = mtime
+        return snapshot
+
+    def _map(self, manifest):
+        gen_dir = os.path.join(self.path, f"gen-{manifest['generation']}")
+        n_symbols, n_dates = manifest['shape']
+        dates = np.load(os.path.join(gen_dir, 'dates.npy'))
+        symbols = np.load(os.path.join(gen_dir, 'symbols.npy'))
+        if n_symbols and n_dates:
+            values = np.memmap(os.path.join(gen_dir, 'values.f64'), dtype=np.float64,
+                               mode='r', shape=(n_symbols, n_dates))
+        else:
+            values = np.empty((n_symbols, n_dates), dtype=np.float64)
+        positions = {str(sym): i for i, sym in enumerate(symbols)}
+        return Snapshot(manifest['generation'], dates, symbols, values, positions)
+
+    @property
+    def generation(self):
+        snapshot = self._refresh()
+        return snapshot.generation if snapshot else None
+
+    def symbols(self):
+        snapshot = self._refresh()
+        if snapshot is None:
+            return []
+        return [str(s) for s in snapshot.symbols]
+
+    def has_symbols(self, symbols):
+        snapshot = self._refresh()
+        if snapshot is None:
+            return False
+        return all(s in snapshot.positions for s in symbols)
+
+    def load(self, symbols, start=None, end=None):
+        """Return a date x symbol DataFrame backed by the mapped matrix.
+
+        A date range is always a view. The symbol selection is a view when the
+        requested symbols occupy a contiguous run of the store (e.g. the whole
+        universe); an arbitrary subset is gathered into a matrix holding only
+        the requested columns. Dates on which none of the symbols has a price
+        are dropped, matching ``price_df_from_prices``.
+        """
+        snap = self._refresh()
+        if snap is None:
+            raise LookupError('price store is empty')
+        missing = [s for s in symbols if s not in snap.positions]
+        if missing:
+            raise KeyError(f"symbols not in price store: {', '.join(missing)}")
+
+        lo, hi = 0, len(snap.dates)
+        if start:
+            lo = int(np.searchsorted(snap.dates, np.datetime64(str(start), 'D'), side='left'))
+        if end:
+            hi = int(np.searchsorted(snap.dates, np.datetime64(str(end), 'D'), side='right'))
+
+        ordered = sorted(set(symbols))
+        pos = np.array([snap.positions[s] for s in ordered], dtype=np.intp)
+        if len(pos) and pos[-1] - pos[0] == len(pos) - 1:
+            block = snap.values[pos[0]:pos[-1] + 1, lo:hi]
+        else:
+            block = snap.values[pos, lo:hi]
+
+        index = pd.DatetimeIndex(snap.dates[lo:hi], name='date')
+        columns = pd.Index(ordered, name='symbol')
+        df = pd.DataFrame(block.T, index=index, columns=columns, copy=False)
+        present = ~np.isnan(block).all(axis=0)
+        if not present.all():
+            df = df[present]
+        return df
+
+    # -- writing -----------------------------------------------------------
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'w') as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def append(self, frame):
+        """Merge a date x symbol price frame into the store.
+
+        New symbols and dates extend the matrix; overlapping cells are
+        overwritten with the incoming values (NaNs in ``frame`` never erase a
+        stored price).
+        """
+        if frame is None or frame.empty:
+            return self.generation
+        frame = frame.copy()
+        frame.index = pd.DatetimeIndex(frame.index).values.astype('datetime64[D]')
+        frame.columns = [str(c) for c in frame.columns]
+
+        with self._write_lock():
+            self._manifest_mtime = None
+            snap = self._refresh()
+            if snap is not None:
+                old_dates, old_symbols, old_values = snap.dates, snap.symbols, snap.values
+                generation = snap.generation + 1
+            else:
+                old_dates = np.array([], dtype='datetime64[D]')
+                old_symbols = np.array([], dtype=str)
+                old_values = np.empty((0, 0), dtype=np.float64)
+                generation = 1
+
+            dates = np.union1d(old_dates, frame.index.values)
+            symbols = np.union1d(old_symbols.astype(str), np.array(frame.columns, dtype=str))
+
+            gen_dir = os.path.join(self.path, f'gen-{generation}')
+            os.makedirs(gen_dir, exist_ok=True)
+            values = np.memmap(os.path.join(gen_dir, 'values.f64'), dtype=np.float64, mode='w+',
+                               shape=(len(symbols), len(dates)))
+            values[:] = np.nan
+            if old_values.size:
+                rows = np.searchsorted(symbols, old_symbols.astype(str))
+                cols = np.searchsorted(dates, old_dates)
+                values[np.ix_(rows, cols)] = old_values
+            rows = np.searchsorted(symbols, np.array(frame.columns, dtype=str))
+            cols = np.searchsorted(dates, frame.index.values)
+            incoming = frame.to_numpy(dtype=np.float64).T
+            current = values[np.ix_(rows, cols)]
+            values[np.ix_(rows, cols)] = np.where(np.isnan(incoming), current, incoming)
+            values.flush()
+            del values
+
+            np.save(os.path.join(gen_dir, 'dates.npy'), dates)
+            np.save(os.path.join(gen_dir, 'symbols.npy'), symbols)
+            tmp = os.path.join(self.path, MANIFEST + '.tmp')
+            with open(tmp, 'w') as fh:
+                json.dump({'generation': generation, 'shape': [len(symbols), len(dates)]}, fh)
+            os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+            self._delete_old_generations(generation)
+        return generation
+
+    def _delete_old_generations(self, current):
+        # Readers that already mapped a generation keep their open file
+        # handles (on POSIX the data stays valid until they remap), but one
+        # that read the previous manifest may not have opened the files yet.
+        # So the previous generation always survives, and older ones only
+        # once their successor has been published for the grace period.
+        now = time.time()
+        for name in os.listdir(self.path):
+            if not name.startswith('gen-') or not name[4:].isdigit():
+                continue
+            n = int(name[4:])
+            if n >= current - 1:
+                continue
+            try:
+                superseded_at = os.stat(os.path.join(self.path, f'gen-{n + 1}')).st_mtime
+            except FileNotFoundError:
+                superseded_at = 0
+            if now - superseded_at >= grace_seconds():
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+_stores = {}
+
+
+def get_price_store(path=None):
+    """Return the process-wide store for ``path`` (defaults to ``PRICE_STORE_DIR``)."""
+    path = str(path or store_dir())
+    store = _stores.get(path)
+    if store is None:
+        store = _stores.setdefault(path, PriceStore(path))
+    return store
@@ -0,0 +1,97 @@
+"""Price data providers used by the fetch_prices command.
+
+A provider downloads daily OHLCV history for a batch of symbols and returns
+one DataFrame per symbol, indexed by date, with yfinance-style columns
+(``Open``, ``High``, ``Low``, ``Close``, ``Adj Close``, ``Volume``). Symbols
+without data are simply left out of the result.
+
+``settings.PRICE_PROVIDER`` names the default provider (``'yfinance'``,
+``'local'``, ``'synthetic'`` or a dotted path to a ``PriceProvider`` subclass) and
+``settings.PRICE_PROVIDER_OPTIONS`` is passed to its constructor.
+"""
+import os
+
+import pandas as pd
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class PriceProvider:
+    name = 'provider'
+    # Largest number of symbols requested in one fetch() call.
+    max_batch_size = 50
+
+    def fetch(self, symbols, start, end):
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    name = 'yfinance'
+    max_batch_size = 50
+
+    def __init__(self, **download_kwargs):
+        self.download_kwargs = download_kwargs
+
+    def fetch(self, symbols, start, end):
+        import yfinance as yf
+
+        symbols = list(symbols)
+        # fetch_prices runs its own thread pool, so disable yfinance's.
+        df = yf.download(symbols, start=start, end=end, progress=False, group_by='ticker', threads=False,
+                         **self.download_kwargs)
+        if df is None or df.empty:
+            return {}
+        frames = {}
+        if isinstance(df.columns, pd.MultiIndex):
+            tickers = set(df.columns.get_level_values(0))
+            for symbol in symbols:
+                if symbol in tickers:
+                    frames[symbol] = df[symbol]
+        else:
+            frames[symbols[0]] = df
+        return {s: f.dropna(how='all') for s, f in frames.items() if not f.dropna(how='all').empty}
+
+
+class LocalFileProvider(PriceProvider):
+    """Reads ``<SYMBOL>.csv`` files from a directory, for offline use and tests.
+
+    Each file needs a ``Date`` column plus any of the OHLCV columns. Like
+    yfinance, ``start`` is inclusive and ``end`` exclusive.
+    """
+    name = 'local'
+    max_batch_size = 500
+
+    def __init__(self, path=None):
+        self.path = str(path or os.path.join(settings.BASE_DIR, 'price_data'))
+
+    def fetch(self, symbols, start, end):
+        frames = {}
+        for symbol in symbols:
+            filename = os.path.join(self.path, f'{symbol}.csv')
+            if not os.path.exists(filename):
+                continue
+            df = pd.read_csv(filename, parse_dates=['Date'], index_col='Date').sort_index()
+            if start:
+                df = df[df.index >= pd.Timestamp(start)]
+            if end:
+                df = df[df.index < pd.Timestamp(end)]
+            if not df.empty:
+                frames[symbol] = df
+        return frames
+
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'local': LocalFileProvider,
+    'synthetic': 'stocks.synthetic.SyntheticProvider',
+}
+
+
+def get_provider(name=None, **options):
+    name = name or getattr(settings, 'PRICE_PROVIDER', 'yfinance')
+    if not options and name == getattr(settings, 'PRICE_PROVIDER', 'yfinance'):
+        options = dict(getattr(settings, 'PRICE_PROVIDER_OPTIONS', {}))
+    cls = PROVIDERS.get(name, name)
+    if isinstance(cls, str):
+        cls = import_string(cls)
+    return cls(**options)
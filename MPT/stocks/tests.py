@@ -1,3 +1,63 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
 from django.test import TestCase
 
-# Create your tests here.
+from .ingest import flatten_columns, prices_from_frame, upsert_prices
+from .models import Price, Stock
+
+
+def ohlcv(base, days=3):
+    index = pd.DatetimeIndex(pd.bdate_range('2024-01-01', periods=days), name='Date')
+    close = base + np.arange(days, dtype=float)
+    return pd.DataFrame({'Open': close - 0.5, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Adj Close': close * 0.9, 'Volume': [1000.0 * (i + 1) for i in range(days)]}, index=index)
+
+
+def multi(frames, ticker_first):
+    # yfinance's layout: (Price, Ticker) by default, (Ticker, Price) with group_by='ticker'.
+    df = pd.concat(frames, axis=1)
+    return df if ticker_first else df.swaplevel(axis=1).sort_index(axis=1)
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol='AAA')
+
+    def assertRows(self, prices, base):
+        self.assertEqual([p.date for p in prices], [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)])
+        self.assertEqual([p.close for p in prices], [base, base + 1, base + 2])
+        self.assertAlmostEqual(prices[0].adjusted_close, base * 0.9)
+        self.assertEqual(prices[0].volume, 1000)
+
+    def test_field_ticker_and_ticker_field_columns(self):
+        frames = {'AAA': ohlcv(10.0), 'BBB': ohlcv(50.0)}
+        for ticker_first in (False, True):
+            with self.subTest(ticker_first=ticker_first):
+                df = multi(frames, ticker_first)
+                self.assertRows(prices_from_frame(self.stock, df, 'AAA'), 10.0)
+                self.assertRows(prices_from_frame(self.stock, df, 'BBB'), 50.0)
+
+    def test_single_ticker_frames(self):
+        self.assertRows(prices_from_frame(self.stock, ohlcv(10.0)), 10.0)
+        # One ticker still comes back with MultiIndex columns, whichever symbol is asked for.
+        for ticker_first in (False, True):
+            df = multi({'AAA': ohlcv(10.0)}, ticker_first)
+            self.assertEqual(sorted(flatten_columns(df).columns), sorted(ohlcv(10.0).columns))
+            self.assertRows(prices_from_frame(self.stock, df), 10.0)
+
+    def test_rows_without_close_are_dropped(self):
+        df = ohlcv(10.0)
+        df.iloc[1, df.columns.get_loc('Close')] = np.nan
+        df.iloc[2, df.columns.get_loc('Volume')] = np.nan
+        prices = prices_from_frame(self.stock, df)
+        self.assertEqual([p.date for p in prices], [date(2024, 1, 1), date(2024, 1, 3)])
+        self.assertIsNone(prices[1].volume)
+
+    def test_upsert_overwrites_existing_rows(self):
+        Price.objects.create(stock=self.stock, date=date(2024, 1, 2), close=1.0, volume=1)
+        self.assertEqual(upsert_prices(prices_from_frame(self.stock, ohlcv(10.0))), 3)
+        rows = list(Price.objects.filter(stock=self.stock).order_by('date').values_list('date', 'close', 'volume'))
+        self.assertEqual(rows, [(date(2024, 1, 1), 10.0, 1000), (date(2024, 1, 2), 11.0, 2000),
+                                (date(2024, 1, 3), 12.0, 3000)])
@@ -3,12 +3,17 @@ import axios from 'axios'
 
 export default function SavedPortfolios(){
   const [list, setList] = useState([])
+  const [next, setNext] = useState(null)
 
-  const load = async ()=>{
+  // With page_size the API returns cursor-paginated pages: {next, previous, results}.
+  const first = '/api/portfolios/?page_size=50'
+  const load = async (url=first)=>{
     try{
-      const r = await axios.get('/api/portfolios/')
-      setList(r.data)
-    }catch(e){ setList([]) }
+      const r = await axios.get(url)
+      const page = Array.isArray(r.data) ? {results: r.data, next: null} : r.data
+      setList(prev => url === first ? page.results : [...prev, ...page.results])
+      setNext(page.next)
+    }catch(e){ if(url === first) setList([]) }
   }
 
   useEffect(()=>{ load() },[])
@@ -30,6 +35,7 @@ export default function SavedPortfolios(){
           </table>
         </div>
       ))}
+      {next && <button className="btn btn-outline-secondary btn-sm" onClick={()=>load(next)}>Load more</button>}
     </div>
   )
 }